@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+import numpy as np
+
+from instrumentos import etapa, contar
+
+# Arquivo de arestas: cabeçalho de 64 bytes, vértices float64 (V, 2) e registros de 16 bytes
+# (peso float64, u int32, v int32), tudo little-endian. Cada aresta aparece uma vez, com u < v
+MAGICO = b'ARESTAS1'
+TAMANHO_CABECALHO = 64
+TIPO_ARESTA = np.dtype([('peso', '<f8'), ('u', '<i4'), ('v', '<i4')])
+
+def _cabecalho(n_vertices, n_arestas):
+    return (MAGICO + np.array([n_vertices, n_arestas], dtype='<i8').tobytes()).ljust(TAMANHO_CABECALHO, b'\0')
+
+# =====================================================
+# Leitura e escrita
+# =====================================================
+
+def gravar_arestas(arquivo, pontos, blocos):
+    """Grava os vértices e os blocos `(i, j, pesos)` (de `grafo.arestas_em_fluxo`) à medida que chegam.
+
+    Só um bloco fica em memória por vez. O número de arestas vai para o
+    cabeçalho no fim; devolve esse número.
+    """
+    coords = np.ascontiguousarray(pontos, dtype='<f8').reshape(-1, 2)
+    if len(coords) >= 2**31:
+        raise ValueError("Vértices demais para ids int32")
+    total = 0
+    with open(arquivo, 'wb') as f:
+        f.write(b'\0' * TAMANHO_CABECALHO)
+        f.write(coords.tobytes())
+        for i, j, pesos in blocos:
+            registros = np.empty(len(pesos), dtype=TIPO_ARESTA)
+            registros['peso'], registros['u'], registros['v'] = pesos, np.minimum(i, j), np.maximum(i, j)
+            f.write(registros.tobytes())
+            total += len(registros)
+        f.seek(0)
+        f.write(_cabecalho(len(coords), total))
+    return total
+
+def abrir_arestas(arquivo):
+    """`(coords, arestas)` do arquivo como memmaps, em O(1): nada é lido até ser usado."""
+    with open(arquivo, 'rb') as f:
+        cabecalho = f.read(TAMANHO_CABECALHO)
+    if len(cabecalho) < TAMANHO_CABECALHO or cabecalho[:len(MAGICO)] != MAGICO:
+        raise ValueError("Arquivo de arestas inválido")
+    n_vertices, n_arestas = np.frombuffer(cabecalho, dtype='<i8', count=2, offset=8).tolist()
+    inicio_arestas = TAMANHO_CABECALHO + 16 * n_vertices
+    if os.path.getsize(arquivo) < inicio_arestas + TIPO_ARESTA.itemsize * n_arestas:
+        raise ValueError("Arquivo de arestas truncado")
+
+    coords = np.memmap(arquivo, dtype='<f8', mode='r', offset=TAMANHO_CABECALHO,
+                       shape=(n_vertices, 2)) if n_vertices else np.zeros((0, 2))
+    arestas = np.memmap(arquivo, dtype=TIPO_ARESTA, mode='r', offset=inicio_arestas,
+                        shape=(n_arestas,)) if n_arestas else np.zeros(0, dtype=TIPO_ARESTA)
+    return coords, arestas
+
+# =====================================================
+# Ordenação externa
+# =====================================================
+
+def _ordenados(registros):
+    # Ordem (peso, u, v): a mesma do kruskal em memória, desempate total
+    return registros[np.lexsort((registros['v'], registros['u'], registros['peso']))]
+
+def _intercalar(trechos, f, por_trecho):
+    # Intercala os arquivos de trechos ordenados em `f`; metade da memória para as janelas,
+    # metade para a saída de cada rodada
+    fontes = [np.memmap(nome, dtype=TIPO_ARESTA, mode='r') for nome in trechos if os.path.getsize(nome)]
+    janela = max(1, por_trecho // (2 * max(1, len(fontes))))
+    posicoes = [0] * len(fontes)
+    while True:
+        vivas = [k for k, fonte in enumerate(fontes) if posicoes[k] < len(fonte)]
+        if not vivas:
+            break
+        janelas = {k: fontes[k][posicoes[k]:posicoes[k] + janela] for k in vivas}
+        # Janelas que não chegam ao fim do trecho limitam o que pode sair nesta rodada
+        limites = [janelas[k][-1] for k in vivas if posicoes[k] + janela < len(fontes[k])]
+        if limites:
+            limite = _ordenados(np.array(limites))[0]
+            quantos = {k: int(np.searchsorted(janelas[k], limite, side='right')) for k in vivas}
+        else:
+            quantos = {k: len(janelas[k]) for k in vivas}
+        saida = np.concatenate([np.asarray(janelas[k][:quantos[k]]) for k in vivas])
+        f.write(_ordenados(saida).tobytes())
+        for k in vivas:
+            posicoes[k] += quantos[k]
+
+def _novo_trecho(diretorio):
+    descritor, nome = tempfile.mkstemp(suffix='.trecho', dir=diretorio)
+    return nome, os.fdopen(descritor, 'wb')
+
+def ordenar_arestas(origem, destino, memoria_bytes=64 << 20, diretorio=None, max_trechos=64):
+    """Grava em `destino` as arestas de `origem` ordenadas por (peso, u, v), sem carregá-las todas.
+
+    Ordenação externa: trechos de até `memoria_bytes` são ordenados em
+    memória e gravados em arquivos temporários (em `diretorio`, ou ao lado
+    de `destino`) e depois intercalados, no máximo `max_trechos` por vez
+    (com mais, em várias passadas), lendo uma janela de cada trecho. A
+    intercalação é feita em blocos de arrays: tudo o que não passa da menor
+    última chave entre as janelas já pode sair.
+    """
+    coords, arestas = abrir_arestas(origem)
+    por_trecho = max(1, memoria_bytes // TIPO_ARESTA.itemsize)
+    diretorio = diretorio or os.path.dirname(os.path.abspath(destino))
+
+    trechos = []
+    try:
+        with etapa('ordenar_trechos'):
+            for a in range(0, len(arestas), por_trecho):
+                nome, f = _novo_trecho(diretorio)
+                trechos.append(nome)
+                with f:
+                    f.write(_ordenados(np.array(arestas[a:a + por_trecho])).tobytes())
+            contar(trechos=len(trechos))
+
+        with etapa('intercalar'):
+            passadas = 1
+            while len(trechos) > max_trechos:
+                grupos = [trechos[k:k + max_trechos] for k in range(0, len(trechos), max_trechos)]
+                trechos = []
+                for grupo in grupos:
+                    nome, f = _novo_trecho(diretorio)
+                    trechos.append(nome)
+                    with f:
+                        _intercalar(grupo, f, por_trecho)
+                    for antigo in grupo:
+                        os.remove(antigo)
+                passadas += 1
+            with open(destino, 'wb') as f:
+                f.write(_cabecalho(len(coords), len(arestas)))
+                f.write(np.ascontiguousarray(coords, dtype='<f8').tobytes())
+                _intercalar(trechos, f, por_trecho)
+            contar(passadas=passadas)
+    finally:
+        for nome in trechos:
+            if os.path.exists(nome):
+                os.remove(nome)
+
+def arestas_ordenadas(arquivo, bloco=1 << 20):
+    """Gera as arestas do arquivo já ordenado em blocos de registros (peso, u, v)."""
+    _, arestas = abrir_arestas(arquivo)
+    for a in range(0, len(arestas), bloco):
+        yield np.array(arestas[a:a + bloco])
+
+if __name__ == "__main__":
+    from mapa import ler_mapa
+    from grafo import pontos_visibilidade, arestas_em_fluxo
+    from arvore import kruskal_externo
+
+    parser = argparse.ArgumentParser(description="Grafo de visibilidade em disco e MST por Kruskal externo")
+    parser.add_argument('mapa')
+    parser.add_argument('--arquivo', help="arquivo de arestas gerado (padrão: <mapa>.arestas)")
+    parser.add_argument('--metodo', default='vetorizado', help="método de visibilidade (ver grafo.METODOS)")
+    parser.add_argument('--memoria', type=float, default=64, help="MiB para os trechos da ordenação externa")
+    args = parser.parse_args()
+    arquivo = args.arquivo or os.path.splitext(args.mapa)[0] + '.arestas'
+
+    q_start, q_goal, obstaculos = ler_mapa(args.mapa)
+    pontos = pontos_visibilidade(q_start, q_goal, obstaculos)
+    inicio = time.perf_counter()
+    total = gravar_arestas(arquivo, pontos, arestas_em_fluxo(pontos, obstaculos, args.metodo))
+    print(f"{total} arestas de {len(pontos)} vértices gravadas em {arquivo} "
+          f"({os.path.getsize(arquivo) / 2**20:.1f} MiB, {time.perf_counter() - inicio:.2f} s)", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    mst, total_peso, visitado = kruskal_externo(arquivo, q_start, memoria_bytes=int(args.memoria * 2**20))
+    print(f"MST: {len(mst)} arestas, peso {total_peso:.2f}, {len(visitado)}/{len(pontos)} vértices "
+          f"({time.perf_counter() - inicio:.2f} s)", file=sys.stderr)
@@ -1,11 +1,18 @@
+import os
 import heapq
 import math
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
+import tempfile
+import numpy as np
+
+import instrumentos
+from indice import IndiceVertices
+from compacto import GrafoCompacto
+from arestas import abrir_arestas, ordenar_arestas, arestas_ordenadas
 
 def prim(grafo, inicio):
+    if isinstance(grafo, GrafoCompacto):
+        return prim_compacto(grafo, inicio)
+
     visitado = set()
     mst = []
     pq = []  # fila de prioridade (peso, origem, destino)
@@ -19,6 +26,7 @@ def prim(grafo, inicio):
 
     # Iniciar do vértice fornecido
     adicionar_arestas(inicio)
+    empurrados = len(pq)
 
     # Construir a MST
     while pq:
@@ -26,12 +34,376 @@ def prim(grafo, inicio):
         if v not in visitado:
             mst.append((u, v, peso))
             total_peso += peso
+            antes = len(pq)
             adicionar_arestas(v)
+            empurrados += len(pq) - antes
 
+    # O heap termina vazio: cada entrada empurrada também saiu
+    if instrumentos.ativo:
+        instrumentos.contar(heap_pushes=empurrados, heap_pops=empurrados)
     return mst, total_peso, visitado
 
+def prim_compacto(grafo, inicio):
+    # Mesmo algoritmo sobre ids inteiros e as listas CSR; só o resultado volta a ser tuplas
+    if inicio not in grafo:
+        return [], 0.0, {inicio}
+    vertices = grafo.vertices
+    indptr, indices, pesos = grafo.indptr.tolist(), grafo.indices.tolist(), grafo.pesos.tolist()
+    visitado = [False] * len(vertices)
+    mst = []
+    pq = []
+    total_peso = 0.0
+
+    def adicionar_arestas(v):
+        visitado[v] = True
+        a, b = indptr[v], indptr[v + 1]
+        for viz, peso in zip(indices[a:b], pesos[a:b]):
+            if not visitado[viz]:
+                heapq.heappush(pq, (peso, v, viz))
+
+    adicionar_arestas(grafo.id(inicio))
+    empurrados = len(pq)
+
+    while pq:
+        peso, u, v = heapq.heappop(pq)
+        if not visitado[v]:
+            mst.append((vertices[u], vertices[v], peso))
+            total_peso += peso
+            antes = len(pq)
+            adicionar_arestas(v)
+            empurrados += len(pq) - antes
+
+    if instrumentos.ativo:
+        instrumentos.contar(heap_pushes=empurrados, heap_pops=empurrados)
+    return mst, total_peso, {vertices[i] for i, ok in enumerate(visitado) if ok}
+
+# =====================================================
+# Outros algoritmos de MST
+# =====================================================
+
+METODOS_MST = ('auto', 'heap', 'denso', 'kruskal')
+
+# Custo estimado de cada algoritmo, em segundos (medido com benchmarks/mst.py): o Prim denso paga um
+# argmin sobre V vértices por passo; o Kruskal, uma ordenação e uma união-busca por aresta
+CUSTO_PASSO_DENSO = 4e-6
+CUSTO_VERTICE_DENSO = 3e-10
+CUSTO_ARESTA_KRUSKAL = 2.5e-7
+
+def arvore_geradora_minima(grafo, inicio, metodo='auto'):
+    """MST da componente de `inicio` pelo algoritmo escolhido; mesmo retorno de `prim`.
+
+    `metodo`: 'heap' (o `prim` original), 'denso' (Prim com array de chaves,
+    O(V²) sem heap), 'kruskal' (arestas ordenadas de uma vez + união-busca)
+    ou 'auto', que escolhe pela densidade do grafo (arestas por vértice).
+    Todos dão o mesmo peso total; com pesos empatados, a árvore pode variar
+    entre eles. Como no `prim`, um `inicio` fora do grafo dá a árvore vazia
+    `([], 0.0, {inicio})`.
+    """
+    if metodo not in METODOS_MST:
+        raise ValueError(f"Método de MST desconhecido: {metodo} (use um de {METODOS_MST})")
+    if metodo == 'auto':
+        metodo = escolher_metodo_mst(grafo)
+    if metodo == 'denso':
+        return prim_denso(grafo, inicio)
+    if metodo == 'kruskal':
+        return kruskal(grafo, inicio)
+    return prim(grafo, inicio)
+
+def escolher_metodo_mst(grafo):
+    # O heap do `prim` perdeu para um dos dois em todas as densidades medidas: fica só como opção explícita
+    if isinstance(grafo, GrafoCompacto):
+        n, m = len(grafo), grafo.num_arestas
+    else:
+        n, m = len(grafo), sum(len(adj) for adj in grafo.values()) // 2
+    custo_denso = n * (CUSTO_PASSO_DENSO + CUSTO_VERTICE_DENSO * n)
+    custo_kruskal = m * CUSTO_ARESTA_KRUSKAL
+    return 'denso' if custo_denso < custo_kruskal else 'kruskal'
+
+def _compacto(grafo):
+    return grafo if isinstance(grafo, GrafoCompacto) else GrafoCompacto.de_dicionario(grafo)
+
+def prim_denso(grafo, inicio):
+    # Prim com a menor aresta de cada vértice de fora num array: V passos de argmin, nenhuma entrada velha em heap
+    g = _compacto(grafo)
+    if inicio not in g:
+        return [], 0.0, {inicio}
+    vertices = g.vertices
+    n = len(g)
+    chave = np.full(n, np.inf)   # inf também para quem já está na árvore
+    pai = np.full(n, -1, dtype=np.int64)
+    dentro = np.zeros(n, dtype=bool)
+    mst = []
+    total_peso = 0.0
+
+    v = g.id(inicio)
+    peso = 0.0
+    while True:
+        dentro[v] = True
+        chave[v] = np.inf
+        if pai[v] >= 0:
+            mst.append((vertices[pai[v]], vertices[v], peso))
+            total_peso += peso
+
+        a, b = g.indptr[v], g.indptr[v + 1]
+        viz, pesos = g.indices[a:b], g.pesos[a:b]
+        melhora = ~dentro[viz] & (pesos < chave[viz])
+        chave[viz[melhora]] = pesos[melhora]
+        pai[viz[melhora]] = v
+
+        v = int(np.argmin(chave))
+        peso = float(chave[v])
+        if peso == np.inf:
+            break
+
+    if instrumentos.ativo:
+        instrumentos.contar(passos_argmin=len(mst) + 1)
+    return mst, total_peso, {vertices[i] for i in np.flatnonzero(dentro).tolist()}
+
+def kruskal(grafo, inicio):
+    # Todas as arestas ordenadas numa única chamada ao NumPy; o laço só faz união-busca
+    g = _compacto(grafo)
+    if inicio not in g:
+        return [], 0.0, {inicio}
+    vertices = g.vertices
+    n = len(g)
+    origem = np.repeat(np.arange(n), np.diff(g.indptr))
+    unica = origem < g.indices
+    u, v, w = origem[unica], g.indices[unica].astype(np.int64), g.pesos[unica]
+    ordem = np.lexsort((v, u, w))
+
+    conjuntos = UniaoBusca(n)
+    aceitas = []
+    for i, j, peso in zip(u[ordem].tolist(), v[ordem].tolist(), w[ordem].tolist()):
+        if conjuntos.unir(i, j):
+            aceitas.append((i, j, peso))
+            if len(aceitas) == n - 1:
+                break
+
+    if instrumentos.ativo:
+        instrumentos.contar(arestas_ordenadas=len(ordem), unioes=len(aceitas))
+
+    # Só a árvore da componente de `inicio`, como no Prim
+    raiz = conjuntos.encontrar(g.id(inicio))
+    mst = [(vertices[i], vertices[j], peso) for i, j, peso in aceitas if conjuntos.encontrar(i) == raiz]
+    visitado = {vertices[i] for i in range(n) if conjuntos.encontrar(i) == raiz}
+    return mst, sum(peso for _, _, peso in mst), visitado
+
+def kruskal_externo(arquivo, inicio=None, memoria_bytes=64 << 20, ordenado=False):
+    """Kruskal sobre um arquivo de arestas (`arestas.gravar_arestas`), sem o grafo em memória.
+
+    As arestas passam por uma ordenação externa (`arestas.ordenar_arestas`,
+    num arquivo temporário ao lado de `arquivo`; dispensada com
+    `ordenado=True`) e são lidas em blocos pela união-busca. A memória fica
+    em O(V) (união-busca e árvore) mais os blocos. Devolve `(mst,
+    total_peso, visitado)` como `kruskal`: a árvore da componente de
+    `inicio` (vazia se `inicio` não for vértice do arquivo) ou, sem
+    `inicio`, a floresta de todas as componentes.
+    """
+    coords, _ = abrir_arestas(arquivo)
+    vertices = [tuple(v) for v in np.asarray(coords).tolist()]
+    n = len(vertices)
+    if inicio is not None:
+        ids = {v: i for i, v in enumerate(vertices)}
+        if tuple(inicio) not in ids:
+            # Como o `kruskal`, e sem ordenar nada
+            return [], 0.0, {inicio}
+
+    ordenadas = arquivo
+    if not ordenado:
+        descritor, ordenadas = tempfile.mkstemp(suffix='.arestas', dir=os.path.dirname(os.path.abspath(arquivo)))
+        os.close(descritor)
+    try:
+        if not ordenado:
+            ordenar_arestas(arquivo, ordenadas, memoria_bytes)
+        conjuntos = UniaoBusca(n)
+        aceitas = []
+        lidas = 0
+        for bloco in arestas_ordenadas(ordenadas, max(1, memoria_bytes // 16)):
+            lidas += len(bloco)
+            for i, j, peso in zip(bloco['u'].tolist(), bloco['v'].tolist(), bloco['peso'].tolist()):
+                if conjuntos.unir(i, j):
+                    aceitas.append((i, j, peso))
+                    if len(aceitas) == n - 1:
+                        break
+            if len(aceitas) == n - 1:
+                break
+    finally:
+        if not ordenado:
+            os.remove(ordenadas)
+
+    if instrumentos.ativo:
+        instrumentos.contar(arestas_ordenadas=lidas, unioes=len(aceitas))
+
+    if inicio is None:
+        mst = [(vertices[i], vertices[j], peso) for i, j, peso in aceitas]
+        return mst, sum(peso for _, _, peso in mst), set(vertices)
+    raiz = conjuntos.encontrar(ids[tuple(inicio)])
+    mst = [(vertices[i], vertices[j], peso) for i, j, peso in aceitas if conjuntos.encontrar(i) == raiz]
+    visitado = {vertices[i] for i in range(n) if conjuntos.encontrar(i) == raiz}
+    return mst, sum(peso for _, _, peso in mst), visitado
+
+def floresta_geradora_minima(grafo):
+    """MST de todas as componentes de uma vez (Borůvka): `(floresta, total_peso, componentes)`.
+
+    `floresta` lista as arestas (u, v, peso) de todas as árvores e
+    `componentes[v]` é o rótulo (0, 1, ...) da componente de cada vértice.
+    Cada rodada escolhe, para todas as componentes ao mesmo tempo, a aresta
+    mais leve que sai delas e contrai as escolhidas; são no máximo log2(V)
+    rodadas, cada uma feita em poucas operações de arrays.
+    """
+    g = _compacto(grafo)
+    vertices = g.vertices
+    n = len(g)
+    origem = np.repeat(np.arange(n), np.diff(g.indptr))
+    unica = origem < g.indices
+    u, v, w = origem[unica], g.indices[unica].astype(np.int64), g.pesos[unica]
+
+    # Posição na ordem (peso, u, v): desempate total, então as escolhas nunca fecham ciclo
+    posicao = np.empty(len(w), dtype=np.int64)
+    posicao[np.lexsort((v, u, w))] = np.arange(len(w))
+
+    componente = np.arange(n)
+    nenhuma = len(w)
+    onde = np.empty(len(w), dtype=np.int64)
+    fu, fv, fw = [], [], []
+    while True:
+        # Arestas internas a uma componente nunca mais servem
+        cu, cv = componente[u], componente[v]
+        externa = cu != cv
+        u, v, w, posicao, cu, cv = u[externa], v[externa], w[externa], posicao[externa], cu[externa], cv[externa]
+        if not len(u):
+            break
+
+        # Aresta mais leve que sai de cada componente, pela posição na ordem
+        melhor = np.full(n, nenhuma, dtype=np.int64)
+        np.minimum.at(melhor, cu, posicao)
+        np.minimum.at(melhor, cv, posicao)
+        ativas = np.flatnonzero(melhor < nenhuma)
+        onde[posicao] = np.arange(len(posicao))
+        k = onde[melhor[ativas]]
+
+        # Cada componente aponta para a do outro lado da sua aresta; duas que se escolheram
+        # mutuamente formam um ciclo de tamanho 2, quebrado deixando o menor rótulo como raiz
+        pai = np.arange(n)
+        pai[ativas] = np.where(cu[k] == ativas, cv[k], cu[k])
+        mutuo = (pai[pai] == np.arange(n)) & (np.arange(n) < pai)
+        pai[mutuo] = np.flatnonzero(mutuo)
+        while True:
+            proximo = pai[pai]
+            if np.array_equal(proximo, pai):
+                break
+            pai = proximo
+
+        k = np.unique(k)
+        fu.append(u[k])
+        fv.append(v[k])
+        fw.append(w[k])
+        componente = pai[componente]
+
+    fu, fv, fw = (np.concatenate(x).tolist() if x else [] for x in (fu, fv, fw))
+    floresta = [(vertices[a], vertices[b], peso) for a, b, peso in zip(fu, fv, fw)]
+    _, rotulos = np.unique(componente, return_inverse=True)
+    componentes = {vertices[i]: r for i, r in enumerate(rotulos.tolist())}
+    return floresta, sum(fw), componentes
+
+class UniaoBusca:
+    """Conjuntos disjuntos sobre 0..n-1, com compressão de caminho e união por tamanho."""
+
+    def __init__(self, n):
+        self.pai = list(range(n))
+        self.tamanho = [1] * n
+
+    def encontrar(self, x):
+        pai = self.pai
+        raiz = x
+        while pai[raiz] != raiz:
+            raiz = pai[raiz]
+        while pai[x] != raiz:
+            pai[x], x = raiz, pai[x]
+        return raiz
+
+    @classmethod
+    def de_rotulos(cls, rotulos):
+        """Conjuntos já formados: `rotulos[i]` é a raiz do conjunto de i (e cada raiz é rótulo de si mesma)."""
+        conjuntos = cls(0)
+        conjuntos.pai = list(rotulos)
+        conjuntos.tamanho = np.bincount(rotulos, minlength=len(rotulos)).tolist()
+        return conjuntos
+
+    def adicionar(self):
+        """Novo elemento, sozinho num conjunto; devolve o número dele."""
+        self.pai.append(len(self.pai))
+        self.tamanho.append(1)
+        return len(self.pai) - 1
+
+    def unir(self, a, b):
+        """Junta os conjuntos de `a` e `b`; False se já eram o mesmo."""
+        a, b = self.encontrar(a), self.encontrar(b)
+        if a == b:
+            return False
+        if self.tamanho[a] < self.tamanho[b]:
+            a, b = b, a
+        self.pai[b] = a
+        self.tamanho[a] += self.tamanho[b]
+        return True
+
+class IndiceAlcance:
+    """Componentes conexas do grafo de visibilidade, para responder "há caminho?" em O(1).
+
+    Os rótulos saem de `GrafoCompacto.componentes` e viram uma união-busca,
+    então arestas novas (`adicionar_aresta`) só juntam conjuntos. Obstáculos
+    novos podem partir componentes, o que a união-busca não desfaz: nesse
+    caso reconstrua o índice a partir do grafo atualizado (é uma passada
+    vetorizada sobre as arestas).
+
+    Pontos fora do grafo são levados ao vértice mais próximo que enxergam
+    (com `obstaculos`) ou ao mais próximo (sem eles).
+    """
+
+    def __init__(self, grafo, obstaculos=None):
+        g = _compacto(grafo)
+        self.ids = dict(g.ids)
+        self.conjuntos = UniaoBusca.de_rotulos(g.componentes().tolist())
+        self.obstaculos = obstaculos
+        self.proximidade = IndiceVertices(g.vertices, obstaculos) if len(g) else None
+
+    def _id(self, p):
+        p = tuple(p)
+        if p in self.ids:
+            return self.ids[p]
+        if self.proximidade is None:
+            return None
+        v = self.proximidade.mais_proximo(p, visivel=self.proximidade.obstaculos is not None)
+        return None if v is None else self.ids[v]
+
+    def componente(self, p):
+        """Rótulo da componente de `p` (ou do vértice a que ele se liga), ou None se ele não enxerga nenhum."""
+        i = self._id(p)
+        return None if i is None else self.conjuntos.encontrar(i)
+
+    def conectados(self, a, b):
+        """Se existe caminho de `a` a `b` pelo grafo."""
+        ca, cb = self.componente(a), self.componente(b)
+        return ca is not None and ca == cb
+
+    def adicionar_aresta(self, u, v):
+        """Registra uma aresta nova (vértices novos entram no índice)."""
+        for p in (u, v):
+            p = tuple(p)
+            if p not in self.ids:
+                self.ids[p] = self.conjuntos.adicionar()
+                if self.proximidade is None:
+                    self.proximidade = IndiceVertices([p], self.obstaculos)
+                else:
+                    self.proximidade.adicionar(p)
+        self.conjuntos.unir(self.ids[tuple(u)], self.ids[tuple(v)])
+
+
+def validar_mst(grafo, mst, vertices_alcancados, componentes=None):
+    # Com `componentes` (rótulos de floresta_geradora_minima), cada árvore da floresta é validada em separado
+    if componentes is not None:
+        return _validar_floresta(grafo, mst, componentes)
 
-def validar_mst(grafo, mst, vertices_alcancados):
     total_vertices = len(grafo)
     vertices_na_mst = len(vertices_alcancados)
     arestas_esperadas = vertices_na_mst - 1 if vertices_na_mst > 0 else 0
@@ -49,7 +421,46 @@ def validar_mst(grafo, mst, vertices_alcancados):
     return resultado
 
 
-def estatisticas_mst(mst):
+def _validar_floresta(grafo, floresta, componentes):
+    vertices_por = {}
+    for rotulo in componentes.values():
+        vertices_por[rotulo] = vertices_por.get(rotulo, 0) + 1
+    arestas_por = dict.fromkeys(vertices_por, 0)
+    for u, _, _ in floresta:
+        arestas_por[componentes[u]] += 1
+
+    por_componente = {
+        rotulo: {
+            'vertices': n,
+            'arestas': arestas_por[rotulo],
+            'valida': arestas_por[rotulo] == n - 1,
+        }
+        for rotulo, n in vertices_por.items()
+    }
+    total_vertices = len(grafo)
+    return {
+        'valida': all(c['valida'] for c in por_componente.values()) and len(componentes) == total_vertices,
+        'total_vertices': total_vertices,
+        'vertices_alcancados': len(componentes),
+        'arestas_na_mst': len(floresta),
+        'arestas_esperadas': len(componentes) - len(por_componente),
+        'grafo_conexo': len(por_componente) == 1,
+        'componentes_desconexos': total_vertices - len(componentes),
+        'num_componentes': len(por_componente),
+        'por_componente': por_componente
+    }
+
+
+def estatisticas_mst(mst, componentes=None):
+    if componentes is not None:
+        # Mesmas estatísticas para a floresta toda e para a árvore de cada componente
+        por_rotulo = {rotulo: [] for rotulo in set(componentes.values())}
+        for aresta in mst:
+            por_rotulo[componentes[aresta[0]]].append(aresta)
+        resultado = estatisticas_mst(mst)
+        resultado['por_componente'] = {rotulo: estatisticas_mst(arestas) for rotulo, arestas in por_rotulo.items()}
+        return resultado
+
     if not mst:
         return {
             'peso_total': 0,
@@ -81,6 +492,10 @@ def verticeMaisProximo(ponto, arvore):
     if not (isinstance(ponto, (tuple, list)) and len(ponto) == 2):
         raise ValueError("Ponto deve ser tupla/lista de 2 floats")
 
+    # índice pronto: busca só nas células vizinhas
+    if isinstance(arvore, IndiceVertices):
+        return arvore.mais_proximo(ponto)
+
     # extrair vértices
     if isinstance(arvore, dict):
         vertices = list(arvore.keys())
@@ -0,0 +1,191 @@
+"""Teste de carga do servidor residente: muitos clientes concorrentes pedindo caminhos.
+
+Uso: python benchmarks/carga.py MAPA [--consultas q.txt] [--total 2000] [--clientes 16]
+                                [--socket /tmp/plan.sock | --porta 8765] [--externo] [--trocar 0.5]
+                                [--saida resultado.json]
+
+Sem `--externo`, sobe um `servidor.py` num subprocesso, carrega MAPA e o
+derruba no fim. Cada cliente é uma conexão com um pedido por vez; as
+consultas vêm de `--consultas` (formato de `lote.py`) ou são sorteadas na
+caixa do mapa. Com `--trocar S`, o mapa é recarregado a cada S segundos
+durante a carga, para medir a latência enquanto há trocas. Saem a vazão e
+os percentis de latência vistos pelo cliente e os medidos pelo servidor.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from mapa import ler_mapa
+from lote import ler_consultas
+
+
+class Conexao:
+    """Uma conexão assíncrona com o servidor, um pedido por vez."""
+
+    def __init__(self, leitor, escritor):
+        self.leitor, self.escritor = leitor, escritor
+        self._proximo = 0
+
+    @classmethod
+    async def abrir(cls, socket_unix, porta):
+        if socket_unix:
+            return cls(*await asyncio.open_unix_connection(socket_unix, limit=1 << 26))
+        return cls(*await asyncio.open_connection('127.0.0.1', porta, limit=1 << 26))
+
+    async def pedir(self, op, **campos):
+        self._proximo += 1
+        self.escritor.write((json.dumps({'op': op, 'id': self._proximo, **campos}) + '\n').encode())
+        await self.escritor.drain()
+        resposta = json.loads(await self.leitor.readline())
+        if not resposta.get('ok'):
+            raise RuntimeError(resposta.get('erro'))
+        return resposta
+
+    async def fechar(self):
+        self.escritor.close()
+        await self.escritor.wait_closed()
+
+
+def consultas_sorteadas(obstaculos, total, semente=0):
+    pontos = np.array([v for obst in obstaculos for v in obst])
+    (x0, y0), (x1, y1) = pontos.min(axis=0), pontos.max(axis=0)
+    rng = random.Random(semente)
+    for _ in range(total):
+        yield (rng.uniform(x0, x1), rng.uniform(y0, y1)), (rng.uniform(x0, x1), rng.uniform(y0, y1))
+
+
+def percentis(segundos):
+    ms = np.array(segundos) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99]).tolist()
+    return {'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': float(ms.max())}
+
+
+async def carga(args, consultas):
+    fila = asyncio.Queue()
+    for consulta in consultas:
+        fila.put_nowait(consulta)
+    latencias = []
+    encontrados = 0
+
+    async def cliente():
+        nonlocal encontrados
+        conexao = await Conexao.abrir(args.socket, args.porta)
+        try:
+            while not fila.empty():
+                inicio, fim = fila.get_nowait()
+                t = time.perf_counter()
+                resposta = await conexao.pedir('caminho', mapa='carga', inicio=list(inicio), fim=list(fim))
+                latencias.append(time.perf_counter() - t)
+                encontrados += resposta['encontrado']
+        finally:
+            await conexao.fechar()
+
+    trocas = []
+
+    async def trocador(conexao):
+        while True:
+            await asyncio.sleep(args.trocar)
+            t = time.perf_counter()
+            await conexao.pedir('carregar', mapa='carga', arquivo=os.path.abspath(args.mapa))
+            trocas.append(time.perf_counter() - t)
+
+    controle = await Conexao.abrir(args.socket, args.porta)
+    await controle.pedir('carregar', mapa='carga', arquivo=os.path.abspath(args.mapa))
+    tarefa_trocas = asyncio.create_task(trocador(controle)) if args.trocar else None
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(args.clientes)))
+    tempo = time.perf_counter() - inicio
+
+    if tarefa_trocas is not None:
+        tarefa_trocas.cancel()
+        await asyncio.gather(tarefa_trocas, return_exceptions=True)
+    servidor = (await controle.pedir('estatisticas'))['latencias']
+    await controle.fechar()
+
+    return {'consultas': len(latencias), 'encontrados': encontrados, 'clientes': args.clientes,
+            'tempo_s': tempo, 'consultas_por_s': len(latencias) / tempo,
+            'cliente': percentis(latencias), 'trocas': len(trocas),
+            'troca_media_s': sum(trocas) / len(trocas) if trocas else None,
+            'servidor': servidor}
+
+
+async def esperar_socket(args, processo, limite=60):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError("O servidor terminou antes de abrir o socket")
+        try:
+            conexao = await Conexao.abrir(args.socket, args.porta)
+            await conexao.pedir('ping')
+            return conexao
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError("O servidor não abriu o socket a tempo")
+
+
+async def principal(args, consultas):
+    if args.externo:
+        return await carga(args, consultas)
+    endereco = ['--socket', args.socket] if args.socket else ['--porta', str(args.porta)]
+    processo = subprocess.Popen([sys.executable, os.path.join(RAIZ, 'servidor.py'), *endereco])
+    try:
+        conexao = await esperar_socket(args, processo)
+        await conexao.fechar()
+        resultado = await carga(args, consultas)
+        conexao = await Conexao.abrir(args.socket, args.porta)
+        await conexao.pedir('encerrar')
+        await conexao.fechar()
+        processo.wait(timeout=30)
+        return resultado
+    finally:
+        if processo.poll() is None:
+            processo.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mapa')
+    parser.add_argument('--consultas', help="arquivo de consultas (formato de lote.py); sem ele, sorteia")
+    parser.add_argument('--total', type=int, default=2000)
+    parser.add_argument('--clientes', type=int, default=16)
+    endereco = parser.add_mutually_exclusive_group()
+    endereco.add_argument('--socket')
+    endereco.add_argument('--porta', type=int)
+    parser.add_argument('--externo', action='store_true', help="usa um servidor já no ar em vez de subir um")
+    parser.add_argument('--trocar', type=float, help="recarrega o mapa a cada TROCAR segundos durante a carga")
+    parser.add_argument('--saida')
+    args = parser.parse_args()
+    if args.socket is None and args.porta is None:
+        args.socket = os.path.join(tempfile.gettempdir(), f"planejamento-{os.getpid()}.sock")
+
+    if args.consultas:
+        with open(args.consultas) as f:
+            consultas = [(inicio, fim) for _, inicio, fim in ler_consultas(f)][:args.total]
+    else:
+        _, _, obstaculos = ler_mapa(args.mapa)
+        consultas = list(consultas_sorteadas(obstaculos, args.total))
+
+    resultado = asyncio.run(principal(args, consultas))
+    c = resultado['cliente']
+    print(f"{resultado['consultas']} consultas, {resultado['clientes']} clientes: "
+          f"{resultado['consultas_por_s']:.1f} consultas/s  p50 {c['p50_ms']:.1f} ms  "
+          f"p90 {c['p90_ms']:.1f} ms  p99 {c['p99_ms']:.1f} ms  max {c['max_ms']:.1f} ms"
+          + (f"  ({resultado['trocas']} trocas de mapa)" if resultado['trocas'] else ""), file=sys.stderr)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
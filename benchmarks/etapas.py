@@ -0,0 +1,162 @@
+"""Tempo e pico de memória de cada etapa do pipeline em mapas sintéticos de vários tamanhos.
+
+Uso: python benchmarks/etapas.py [--tipos convexo,armazem] [--obstaculos 10,100,400] [--vertices 6]
+                                 [--metodo M] [--repeticoes 3] [--sem-plots] [--saida resultado.json]
+                                 [--comparar base.json]
+
+Cada etapa (ler_mapa, grafo_visibilidade, prim, verticeMaisProximo,
+buscarCaminho e os três plots, com backend Agg) roda `--repeticoes` vezes
+para o tempo (fica o menor) e mais uma vez sob tracemalloc para o pico de
+memória alocada pelo Python e pelo NumPy. O resultado sai em JSON, no
+arquivo de `--saida` ou na saída padrão; com `--comparar`, a tabela mostra
+também a razão de tempo contra um JSON de outra execução (outro commit).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gerador import gerar_mapa, salvar_mapa, TIPOS
+from mapa import ler_mapa
+from grafo import grafo_visibilidade, METODOS
+from arvore import prim, verticeMaisProximo
+from caminho import buscarCaminho
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import plots
+
+
+def etapas(arquivo, metodo, com_plots):
+    """Lista de (nome, função): cada função recebe o estado das etapas anteriores e grava o seu."""
+    def carregar(e):
+        e['q_start'], e['q_goal'], e['obstaculos'] = ler_mapa(arquivo)
+
+    def construir(e):
+        e['grafo'] = grafo_visibilidade(e['q_start'], e['q_goal'], e['obstaculos'], metodo=metodo)
+
+    def arvore(e):
+        e['mst'], _, e['visitado'] = prim(e['grafo'], e['q_start'])
+
+    def mais_proximos(e):
+        e['v_inicio'] = verticeMaisProximo(e['q_start'], e['mst'])
+        e['v_fim'] = verticeMaisProximo(e['q_goal'], e['mst'])
+
+    def caminho(e):
+        e['caminho'], _ = buscarCaminho(e['v_inicio'], e['v_fim'], e['mst'])
+
+    lista = [('ler_mapa', carregar), ('grafo_visibilidade', construir), ('prim', arvore),
+             ('verticeMaisProximo', mais_proximos), ('buscarCaminho', caminho)]
+    if com_plots:
+        def plot(funcao, *chaves):
+            def executar(e):
+                funcao(*(e[c] for c in chaves))
+                plt.close('all')
+            return executar
+        lista += [('plotar_grafo', plot(plots.plotar_grafo, 'grafo', 'obstaculos', 'q_start', 'q_goal')),
+                  ('plotar_mst', plot(plots.plotar_mst, 'mst', 'obstaculos', 'q_start', 'q_goal')),
+                  ('plotar_caminho', plot(plots.plotar_caminho, 'caminho', 'obstaculos', 'q_start', 'q_goal', 'grafo'))]
+    return lista
+
+
+def medir(arquivo, metodo, repeticoes, com_plots):
+    estado = {}
+    resultado = {}
+    for nome, funcao in etapas(arquivo, metodo, com_plots):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao(estado)
+            tempos.append(time.perf_counter() - inicio)
+
+        tracemalloc.start()
+        funcao(estado)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultado[nome] = {'tempo_s': min(tempos), 'pico_bytes': pico}
+    return estado, resultado
+
+
+def ambiente():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'plataforma': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def imprimir(registro, base):
+    anterior = {}
+    for r in (base or {}).get('resultados', []):
+        anterior[(r['tipo'], r['obstaculos'], r['vertices_por_obstaculo'])] = r['etapas']
+    antes = anterior.get((registro['tipo'], registro['obstaculos'], registro['vertices_por_obstaculo']), {})
+
+    print(f"\n{registro['tipo']}: {registro['obstaculos']} obstáculos, {registro['vertices']} vértices, "
+          f"{registro['arestas']} arestas", file=sys.stderr)
+    for nome, m in registro['etapas'].items():
+        linha = f"  {nome:<20} {m['tempo_s'] * 1000:10.1f} ms  {m['pico_bytes'] / 2**20:8.1f} MiB"
+        if nome in antes:
+            linha += f"  {m['tempo_s'] / max(antes[nome]['tempo_s'], 1e-9):6.2f}x do base"
+        print(linha, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tipos', default='convexo,nao_convexo,armazem,desordenado')
+    parser.add_argument('--obstaculos', default='10,50,200')
+    parser.add_argument('--vertices', type=int, default=6)
+    parser.add_argument('--metodo', choices=METODOS, default='vetorizado')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-plots', action='store_true')
+    parser.add_argument('--saida')
+    parser.add_argument('--comparar')
+    args = parser.parse_args()
+
+    tipos = args.tipos.split(',')
+    for tipo in tipos:
+        if tipo not in TIPOS:
+            parser.error(f"tipo desconhecido: {tipo}")
+    base = None
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+
+    # buscarCaminho é uma DFS recursiva: a profundidade chega ao número de vértices da árvore
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100_000))
+    # plt.show() com Agg só avisa que não há janela
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+
+    relatorio = {'ambiente': ambiente(), 'metodo': args.metodo, 'repeticoes': args.repeticoes, 'resultados': []}
+    with tempfile.TemporaryDirectory() as diretorio:
+        for tipo in tipos:
+            for n in map(int, args.obstaculos.split(',')):
+                arquivo = os.path.join(diretorio, f"{tipo}_{n}.txt")
+                q_start, q_goal, obstaculos = gerar_mapa(tipo, n, args.vertices, args.semente)
+                salvar_mapa(arquivo, q_start, q_goal, obstaculos)
+
+                estado, resultado = medir(arquivo, args.metodo, args.repeticoes, not args.sem_plots)
+                registro = {'tipo': tipo, 'obstaculos': n, 'vertices_por_obstaculo': args.vertices,
+                            'semente': args.semente, 'vertices': len(estado['grafo']),
+                            'arestas': sum(map(len, estado['grafo'].values())) // 2,
+                            'tamanho_arquivo': os.path.getsize(arquivo), 'etapas': resultado}
+                relatorio['resultados'].append(registro)
+                imprimir(registro, base)
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
@@ -0,0 +1,66 @@
+"""Tempo de importação de cada módulo e quais dependências pesadas ele puxa.
+
+Uso: python benchmarks/importacao.py [--modulos grafo,arvore,caminho] [--repeticoes 5] [--saida resultado.json]
+
+Cada módulo é importado num processo novo (`python -X importtime`), e o
+tempo é o acumulado do próprio módulo, o menor das repetições. O núcleo do
+planejamento (grafo, arvore, caminho, ...) não pode carregar matplotlib nem
+Tk: se carregar, o script termina com código 1, para servir de verificação.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NUCLEO = ('geometria', 'compacto', 'indice', 'grafo', 'arvore', 'caminho', 'mapa', 'cache', 'instrumentos',
+          'preprocessamento', 'hierarquico', 'arestas')
+PESADOS = ('numpy', 'shapely', 'matplotlib', 'tkinter', 'PIL')
+PROIBIDOS_NO_NUCLEO = ('matplotlib', 'tkinter')
+
+
+def medir(modulo):
+    """(tempo_ms, pesados carregados) de `import modulo` num interpretador novo."""
+    codigo = f"import sys, {modulo}; print(','.join(p for p in {PESADOS!r} if p in sys.modules))"
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ,
+                              capture_output=True, text=True, check=True)
+    # Linhas "import time: self [us] | cumulative | nome": a de nível zero do módulo pedido tem o total
+    total = None
+    for linha in processo.stderr.splitlines():
+        partes = linha.split('|')
+        if len(partes) == 3 and partes[2].rstrip() == f" {modulo}":
+            total = int(partes[1]) / 1000
+    carregados = [p for p in processo.stdout.strip().split(',') if p]
+    return total, carregados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modulos', default=','.join(NUCLEO + ('plots',)))
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--saida')
+    args = parser.parse_args()
+
+    resultados = {}
+    violacoes = []
+    for modulo in args.modulos.split(','):
+        tempos = []
+        for _ in range(args.repeticoes):
+            tempo, carregados = medir(modulo)
+            tempos.append(tempo)
+        resultados[modulo] = {'tempo_ms': min(tempos), 'carregados': carregados}
+        proibidos = [p for p in carregados if modulo in NUCLEO and p in PROIBIDOS_NO_NUCLEO]
+        if proibidos:
+            violacoes.append(modulo)
+        print(f"{modulo:<14} {min(tempos):8.1f} ms  {', '.join(carregados) or '-':<36}"
+              + (f"  PROIBIDO: {', '.join(proibidos)}" if proibidos else ""), file=sys.stderr)
+
+    texto = json.dumps({'python': sys.version.split()[0], 'modulos': resultados}, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+    sys.exit(1 if violacoes else 0)
@@ -0,0 +1,72 @@
+"""Tempo de cada algoritmo de MST conforme a densidade do grafo.
+
+Uso: python benchmarks/mst.py [--vertices 500,2000] [--densidades 0.01,0.05,0.2,0.5,1.0] [--mapa ARQUIVO]
+
+Sem --mapa, os grafos são geométricos aleatórios: pontos uniformes no
+quadrado unitário, ligados quando a distância fica abaixo do raio que dá a
+densidade pedida (1.0 = grafo completo, como um mapa quase sem obstáculos).
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapa import ler_mapa
+from grafo import grafo_visibilidade
+from compacto import GrafoCompacto
+from arvore import arvore_geradora_minima, escolher_metodo_mst
+
+
+def grafo_geometrico(n, densidade, semente=0):
+    rng = np.random.default_rng(semente)
+    pontos = rng.random((n, 2))
+    i, j = np.triu_indices(n, 1)
+    d = np.hypot(*(pontos[i] - pontos[j]).T)
+    # Raio = quantil das distâncias: a fração `densidade` dos pares mais próximos vira aresta
+    raio = np.quantile(d, min(densidade, 1.0))
+    perto = d <= raio
+    pares = list(zip(i[perto].tolist(), j[perto].tolist(), d[perto].tolist()))
+    return GrafoCompacto.de_pares([tuple(p) for p in pontos.tolist()], pares)
+
+
+def medir(grafo, inicio):
+    tempos = {}
+    total = None
+    for metodo in ('heap', 'denso', 'kruskal'):
+        t = time.perf_counter()
+        _, peso, _ = arvore_geradora_minima(grafo, inicio, metodo)
+        tempos[metodo] = time.perf_counter() - t
+        if total is not None and abs(peso - total) > 1e-9 * max(1.0, total):
+            raise AssertionError(f"{metodo}: peso {peso} diferente de {total}")
+        total = peso
+    return tempos
+
+
+def imprimir(rotulo, grafo, tempos):
+    n, m = len(grafo), grafo.num_arestas
+    densidade = m / max(1, n * (n - 1) // 2)
+    vencedor = min(tempos, key=tempos.get)
+    print(f"{rotulo:<22} V={n:<6} E={m:<9} densidade={densidade:5.3f}  "
+          + "  ".join(f"{k}={v * 1000:8.1f} ms" for k, v in tempos.items())
+          + f"  melhor={vencedor:<8} auto={escolher_metodo_mst(grafo)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mapa')
+    parser.add_argument('--vertices', default='500,2000')
+    parser.add_argument('--densidades', default='0.01,0.05,0.2,0.5,1.0')
+    args = parser.parse_args()
+
+    if args.mapa:
+        q_start, q_goal, obstaculos = ler_mapa(args.mapa)
+        grafo = grafo_visibilidade(q_start, q_goal, obstaculos, metodo='vetorizado', compacto=True)
+        imprimir(os.path.basename(args.mapa), grafo, medir(grafo, q_start))
+    else:
+        for n in map(int, args.vertices.split(',')):
+            for densidade in map(float, args.densidades.split(',')):
+                grafo = grafo_geometrico(n, densidade)
+                imprimir(f"geométrico {densidade}", grafo, medir(grafo, grafo.vertices[0]))
@@ -0,0 +1,48 @@
+"""Tempo de construção do grafo de visibilidade com 1..N workers.
+
+Uso: python benchmarks/paralelo.py [--mapa ARQUIVO | --grade N] [--metodo M] [--workers 1,2,4,8]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapa import ler_mapa
+from grafo import grafo_visibilidade, METODOS
+
+
+def mapa_grade(n):
+    # n x n obstáculos quadrados, com pequenas variações para evitar colinearidades
+    obstaculos = []
+    for i in range(n):
+        for j in range(n):
+            x, y = i * 10 + 2 + (j % 3) * 0.37, j * 10 + 2 + (i % 5) * 0.23
+            obstaculos.append([(x, y), (x + 5, y + 0.4), (x + 4.6, y + 5), (x - 0.3, y + 4.5)])
+    return (0.0, 0.0), (n * 10.0, n * 10.0), obstaculos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mapa')
+    parser.add_argument('--grade', type=int, default=12)
+    parser.add_argument('--metodo', choices=METODOS, default='vetorizado')
+    parser.add_argument('--workers', default='1,2,4,8')
+    args = parser.parse_args()
+
+    q_start, q_goal, obstaculos = ler_mapa(args.mapa) if args.mapa else mapa_grade(args.grade)
+    print(f"{len(obstaculos)} obstáculos, {sum(map(len, obstaculos)) + 2} vértices, "
+          f"método {args.metodo}, {os.cpu_count()} CPUs")
+
+    base = None
+    referencia = None
+    for workers in map(int, args.workers.split(',')):
+        inicio = time.perf_counter()
+        G = grafo_visibilidade(q_start, q_goal, obstaculos, metodo=args.metodo, workers=workers)
+        tempo = time.perf_counter() - inicio
+        base = base or tempo
+        referencia = referencia or G
+        arestas = sum(len(viz) for viz in G.values()) // 2
+        print(f"workers={workers:<3} {tempo:8.2f} s  speedup {base / tempo:5.2f}x  "
+              f"{arestas} arestas  {'igual' if G == referencia else 'DIFERENTE'}")
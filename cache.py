@@ -0,0 +1,176 @@
+import os
+import hashlib
+import inspect
+import tempfile
+import time
+import zipfile
+import numpy as np
+
+from instrumentos import etapa
+from compacto import GrafoCompacto
+from grafo import grafo_visibilidade
+from arvore import arvore_geradora_minima
+
+# Muda quando o conteúdo dos arquivos do cache muda de formato: entradas antigas deixam de casar
+VERSAO = 1
+
+# Parâmetros de `grafo_visibilidade` que não mudam o grafo (só o modo de calcular): ficam fora da chave
+NEUTROS = ('debug', 'workers')
+_PADROES = {nome: p.default for nome, p in inspect.signature(grafo_visibilidade).parameters.items()
+            if p.default is not inspect.Parameter.empty}
+
+def diretorio_padrao():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'grafos_visibilidade')
+
+class CacheGrafos:
+    """Cache em disco de grafos de visibilidade e MSTs já construídos.
+
+    A chave é um hash do conteúdo do mapa (pontos inicial e objetivo e as
+    coordenadas de cada obstáculo) e dos parâmetros de construção; cada
+    entrada é um `.npz` com o grafo em forma CSR e a MST em ids. Entradas
+    são gravadas num arquivo temporário e renomeadas (atômico), então vários
+    processos podem ler e gravar o mesmo diretório ao mesmo tempo. Quando o
+    total passa de `limite_bytes`, as entradas usadas há mais tempo saem.
+    """
+
+    def __init__(self, diretorio=None, limite_bytes=1 << 30):
+        self.diretorio = diretorio or diretorio_padrao()
+        self.limite_bytes = limite_bytes
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def chave(self, q_start, q_goal, obstaculos, **parametros):
+        """Hash hexadecimal do mapa e dos parâmetros (normalizados por `parametros_da_chave`)."""
+        h = hashlib.sha256(f"v{VERSAO}".encode())
+        h.update(np.asarray(q_start, dtype='<f8').tobytes())
+        h.update(np.asarray(q_goal, dtype='<f8').tobytes())
+        h.update(np.int64(len(obstaculos)).tobytes())
+        for obst in obstaculos:
+            coords = np.asarray(obst, dtype='<f8')
+            h.update(np.int64(len(coords)).tobytes())
+            h.update(coords.tobytes())
+        h.update(repr(sorted(parametros_da_chave(parametros).items())).encode())
+        return h.hexdigest()
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + '.npz')
+
+    def carregar(self, chave):
+        """`(grafo, mst, total_peso, visitado)` da entrada, ou None se não estiver no cache."""
+        arquivo = self._arquivo(chave)
+        try:
+            with np.load(arquivo, allow_pickle=False) as dados:
+                grafo = GrafoCompacto(dados['coords'], dados['indptr'], dados['indices'], dados['pesos'])
+                mst_u, mst_v, mst_peso = dados['mst_u'].tolist(), dados['mst_v'].tolist(), dados['mst_peso'].tolist()
+                visitado = np.flatnonzero(dados['visitado']).tolist()
+                total_peso = float(dados['total_peso'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Entrada corrompida (ou de outro formato): descartar e reconstruir
+            self._remover(arquivo)
+            return None
+
+        # Marca de uso para o LRU
+        try:
+            os.utime(arquivo)
+        except OSError:
+            pass
+
+        vertices = grafo.vertices
+        mst = [(vertices[u], vertices[v], peso) for u, v, peso in zip(mst_u, mst_v, mst_peso)]
+        return grafo, mst, total_peso, {vertices[i] for i in visitado}
+
+    def salvar(self, chave, grafo, mst, total_peso, visitado):
+        """Grava uma entrada (o grafo como `GrafoCompacto`) e aplica o limite de tamanho."""
+        ids = grafo.ids
+        visitados = np.zeros(len(grafo), dtype=bool)
+        visitados[[ids[v] for v in visitado]] = True
+
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f,
+                         coords=grafo.coords, indptr=grafo.indptr, indices=grafo.indices, pesos=grafo.pesos,
+                         mst_u=np.array([ids[u] for u, _, _ in mst], dtype=np.int64),
+                         mst_v=np.array([ids[v] for _, v, _ in mst], dtype=np.int64),
+                         mst_peso=np.array([peso for _, _, peso in mst], dtype=float),
+                         total_peso=np.float64(total_peso),
+                         visitado=visitados)
+            os.replace(temporario, self._arquivo(chave))
+        except BaseException:
+            self._remover(temporario)
+            raise
+        self.limpar()
+
+    def obter(self, q_start, q_goal, obstaculos, **parametros):
+        """Grafo e MST do mapa, do cache ou construídos agora (e guardados).
+
+        `parametros` vão para `grafo_visibilidade` e fazem parte da chave.
+        Devolve `(grafo, mst, total_peso, visitado, do_cache)`, com o grafo
+        como `GrafoCompacto` e a MST como em `prim`, a partir de `q_start`
+        (algoritmo escolhido por `arvore_geradora_minima`).
+        """
+        chave = self.chave(q_start, q_goal, obstaculos, **parametros)
+        with etapa('cache_carregar'):
+            entrada = self.carregar(chave)
+        if entrada is not None:
+            return (*entrada, True)
+
+        grafo, mst, total_peso, visitado = construir_grafo_e_mst(q_start, q_goal, obstaculos, **parametros)
+        with etapa('cache_salvar'):
+            self.salvar(chave, grafo, mst, total_peso, visitado)
+        return grafo, mst, total_peso, visitado, False
+
+    def limpar(self):
+        """Remove as entradas usadas há mais tempo até o total caber em `limite_bytes`."""
+        entradas = []
+        agora = time.time()
+        for nome in os.listdir(self.diretorio):
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:
+                continue
+            if nome.endswith('.tmp') and agora - info.st_mtime > 3600:
+                # Temporário de um processo que morreu no meio da gravação
+                self._remover(os.path.join(self.diretorio, nome))
+            elif nome.endswith('.npz'):
+                entradas.append((info.st_mtime, info.st_size, nome))
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, nome in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            self._remover(os.path.join(self.diretorio, nome))
+            total -= tamanho
+
+    def _remover(self, arquivo):
+        # Outro processo pode ter removido antes
+        try:
+            os.remove(arquivo)
+        except FileNotFoundError:
+            pass
+
+def parametros_da_chave(parametros):
+    """Só os parâmetros que mudam o resultado: sem os de `NEUTROS` e sem os iguais ao padrão.
+
+    Assim `metodo='pares'` passado explicitamente cai na mesma entrada que
+    nenhum `metodo`, e `workers=4` na mesma que `workers=1`. Números valem
+    pelo valor (`5` e `5.0` são a mesma chave).
+    """
+    normalizados = {}
+    for nome, valor in parametros.items():
+        if nome in NEUTROS or (nome in _PADROES and valor == _PADROES[nome]):
+            continue
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            valor = float(valor)
+        normalizados[nome] = valor
+    return normalizados
+
+def construir_grafo_e_mst(q_start, q_goal, obstaculos, **parametros):
+    """Grafo (`GrafoCompacto`) e MST do mapa, sem cache: `(grafo, mst, total_peso, visitado)`."""
+    with etapa('grafo_visibilidade'):
+        grafo = grafo_visibilidade(q_start, q_goal, obstaculos, compacto=True, **parametros)
+    with etapa('mst'):
+        mst, total_peso, visitado = arvore_geradora_minima(grafo, tuple(q_start))
+    return grafo, mst, total_peso, visitado
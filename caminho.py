@@ -1,8 +1,10 @@
 import math
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
+import heapq
+import numpy as np
+from collections import OrderedDict
+
+import instrumentos
+from compacto import GrafoCompacto
 
 def construir_adjacencia(arvore):
     adj = {}
@@ -59,6 +61,308 @@ def buscarCaminho(v_inicio, v_fim, arvore):
     else:
         return None, 0
 
+class MotorCaminhos:
+    """Menores caminhos (A* ou Dijkstra) sobre um grafo montado uma única vez.
+
+    `grafo` é o dicionário de adjacência de `grafo_visibilidade`, uma lista
+    de arestas (como a MST) ou um `GrafoCompacto`; as buscas rodam sobre a
+    forma compacta, com ids inteiros e listas CSR. Origens que se
+    repetem ganham uma árvore de menores caminhos completa, guardada em
+    cache (as `max_arvores` mais recentes), e passam a ser respondidas sem
+    busca nenhuma. Só as `max_arvores` últimas origens vistas uma vez são
+    lembradas, então a memória não cresce com o número de origens.
+
+    A heurística do A* é a distância euclidiana, admissível porque o peso de
+    cada aresta é o comprimento do segmento.
+    """
+
+    def __init__(self, grafo, max_arvores=64):
+        if not isinstance(grafo, GrafoCompacto):
+            if not isinstance(grafo, dict):
+                grafo = construir_adjacencia(grafo)
+            grafo = GrafoCompacto.de_dicionario(grafo)
+        self.grafo = grafo
+        self.vertices = grafo.vertices
+        self.indice = grafo.ids
+        self._indptr, self._indices, self._pesos = grafo.indptr.tolist(), grafo.indices.tolist(), grafo.pesos.tolist()
+        self.max_arvores = max_arvores
+        self._arvores = OrderedDict()
+        self._vistas = OrderedDict()
+
+    def buscar(self, v_inicio, v_fim, metodo='astar'):
+        """Menor caminho de `v_inicio` a `v_fim`: `(caminho, distancia)`, ou `(None, 0)` se não houver."""
+        if metodo not in ('astar', 'dijkstra'):
+            raise ValueError(f"Método de busca desconhecido: {metodo!r}")
+        if v_inicio not in self.indice or v_fim not in self.indice:
+            return None, 0
+        s, t = self.indice[v_inicio], self.indice[v_fim]
+
+        # Origem repetida: a árvore completa dela responde esta e as próximas consultas
+        if s in self._arvores or self._vistas.pop(s, False):
+            dist, pai = self._arvore(s)
+            if dist[t] == math.inf:
+                return None, 0
+            return self._montar(pai, t), dist[t]
+
+        self._vistas[s] = True
+        if len(self._vistas) > self.max_arvores:
+            self._vistas.popitem(last=False)
+        if metodo == 'dijkstra':
+            return self._buscar(s, t, lambda i: 0.0)
+        alvo = self.vertices[t]
+        return self._buscar(s, t, lambda i: math.dist(self.vertices[i], alvo))
+
+    def buscar_pontos(self, inicio, fim, saidas, chegadas):
+        """Menor caminho entre dois pontos quaisquer, ligados ao grafo pelo que cada um enxerga.
+
+        `saidas` e `chegadas` são {id: distância} dos vértices visíveis de
+        `inicio` e de `fim`. Devolve `(caminho, distancia)`, com os dois
+        pontos nas pontas, ou `(None, 0)`. A visibilidade direta entre
+        `inicio` e `fim` fica por conta de quem chama.
+        """
+        h = lambda i: math.dist(self.vertices[i], fim)
+        dist, pai = {}, {}
+        pq = []
+        for v, d in saidas.items():
+            if d < dist.get(v, math.inf):
+                dist[v], pai[v] = d, -1
+                heapq.heappush(pq, (d + h(v), d, v))
+
+        melhor, ultimo = math.inf, None
+        fechados = set()
+        while pq:
+            f, d, u = heapq.heappop(pq)
+            # Heurística consistente: nada que ainda está no heap chega em `fim` por menos que f
+            if f >= melhor:
+                break
+            if u in fechados:
+                continue
+            fechados.add(u)
+            if u in chegadas and d + chegadas[u] < melhor:
+                melhor, ultimo = d + chegadas[u], u
+            a, b = self._indptr[u], self._indptr[u + 1]
+            for v, peso in zip(self._indices[a:b], self._pesos[a:b]):
+                nd = d + peso
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pai[v] = u
+                    heapq.heappush(pq, (nd + h(v), nd, v))
+        if instrumentos.ativo:
+            instrumentos.contar(vertices_expandidos=len(fechados))
+        if ultimo is None:
+            return None, 0
+
+        caminho = [tuple(inicio)] + self._montar(pai, ultimo) + [tuple(fim)]
+        # Pontas que já são vértices do grafo não aparecem duas vezes
+        caminho = [p for k, p in enumerate(caminho) if k == 0 or p != caminho[k - 1]]
+        return caminho, melhor
+
+    def distancias(self, origem):
+        """Distância de `origem` até cada vértice alcançável."""
+        dist, _ = self._arvore(self.indice[origem])
+        return {self.vertices[i]: d for i, d in enumerate(dist) if d < math.inf}
+
+    def _buscar(self, s, t, h):
+        dist = {s: 0.0}
+        pai = {s: -1}
+        fechados = set()
+        pq = [(h(s), 0.0, s)]
+        while pq:
+            _, d, u = heapq.heappop(pq)
+            if u in fechados:
+                continue
+            if u == t:
+                if instrumentos.ativo:
+                    instrumentos.contar(vertices_expandidos=len(fechados))
+                return self._montar(pai, t), d
+            fechados.add(u)
+            a, b = self._indptr[u], self._indptr[u + 1]
+            for v, peso in zip(self._indices[a:b], self._pesos[a:b]):
+                nd = d + peso
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pai[v] = u
+                    heapq.heappush(pq, (nd + h(v), nd, v))
+        if instrumentos.ativo:
+            instrumentos.contar(vertices_expandidos=len(fechados))
+        return None, 0
+
+    def _arvore(self, s):
+        # Dijkstra completo a partir de s, reaproveitado enquanto estiver no cache
+        if s in self._arvores:
+            self._arvores.move_to_end(s)
+            return self._arvores[s]
+
+        dist = [math.inf] * len(self.vertices)
+        pai = [-1] * len(self.vertices)
+        dist[s] = 0.0
+        pq = [(0.0, s)]
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d > dist[u]:
+                continue
+            a, b = self._indptr[u], self._indptr[u + 1]
+            for v, peso in zip(self._indices[a:b], self._pesos[a:b]):
+                nd = d + peso
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pai[v] = u
+                    heapq.heappush(pq, (nd, v))
+
+        self._arvores[s] = (dist, pai)
+        if len(self._arvores) > self.max_arvores:
+            self._arvores.popitem(last=False)
+        return dist, pai
+
+    def _montar(self, pai, t):
+        caminho = []
+        while t != -1:
+            caminho.append(self.vertices[t])
+            t = pai[t]
+        caminho.reverse()
+        return caminho
+
+class IndiceCaminhosArvore:
+    """Caminhos e distâncias entre vértices de uma árvore (ou floresta) fixa.
+
+    A árvore é enraizada uma única vez: profundidade, distância até a raiz e
+    ancestrais em saltos de 2^k (binary lifting). Daí a distância entre u e
+    v sai do ancestral comum mais baixo em O(log n), e o caminho em
+    O(log n + tamanho do caminho). Vértices em componentes diferentes, ou
+    fora da árvore, não têm caminho: distância `math.inf`, caminho
+    `(None, 0)`, como em `buscarCaminho`.
+    """
+
+    def __init__(self, arvore, raiz=None):
+        adj = arvore if isinstance(arvore, dict) else construir_adjacencia(arvore)
+        if raiz is not None and raiz not in adj:
+            # Raiz sem arestas (árvore de um vértice só) continua sendo vértice do índice
+            adj = {**adj, raiz: []}
+        self.vertices = list(adj)
+        self.indice = {v: i for i, v in enumerate(self.vertices)}
+        n = len(self.vertices)
+
+        pai = [-1] * n
+        profundidade = [0] * n
+        dist = [0.0] * n
+        componente = [-1] * n
+        raizes = [self.indice[raiz]] if raiz in self.indice else []
+        raizes += range(n)
+        for r in raizes:
+            if componente[r] != -1:
+                continue
+            # Busca em largura iterativa: sem limite de recursão em árvores profundas
+            componente[r] = r
+            pai[r] = r
+            fila = [r]
+            for u in fila:
+                for w, peso in adj[self.vertices[u]]:
+                    j = self.indice[w]
+                    if componente[j] == -1:
+                        componente[j] = r
+                        pai[j] = u
+                        profundidade[j] = profundidade[u] + 1
+                        dist[j] = dist[u] + peso
+                        fila.append(j)
+
+        self.pai = pai
+        self.profundidade = profundidade
+        self.dist_raiz = dist
+        self.componente = componente
+
+        # saltos[k][v]: ancestral 2^k níveis acima de v (a raiz aponta para si mesma)
+        niveis = max(1, max(profundidade, default=0).bit_length())
+        saltos = np.empty((niveis, n), dtype=np.int64)
+        if n:
+            saltos[0] = pai
+        for k in range(1, niveis):
+            saltos[k] = saltos[k - 1][saltos[k - 1]]
+        self.saltos = saltos
+        self._saltos = saltos.tolist()
+
+    def _posicao(self, v):
+        # -1 para vértices fora da árvore
+        return self.indice.get(v, -1)
+
+    def _lca(self, a, b):
+        prof = self.profundidade
+        if prof[a] < prof[b]:
+            a, b = b, a
+        diferenca = prof[a] - prof[b]
+        k = 0
+        while diferenca:
+            if diferenca & 1:
+                a = self._saltos[k][a]
+            diferenca >>= 1
+            k += 1
+        if a == b:
+            return a
+        for nivel in reversed(self._saltos):
+            if nivel[a] != nivel[b]:
+                a, b = nivel[a], nivel[b]
+        return self.pai[a]
+
+    def distancia(self, u, v):
+        """Distância entre `u` e `v` pela árvore."""
+        a, b = self._posicao(u), self._posicao(v)
+        if a < 0 or b < 0 or self.componente[a] != self.componente[b]:
+            return math.inf
+        c = self._lca(a, b)
+        return self.dist_raiz[a] + self.dist_raiz[b] - 2 * self.dist_raiz[c]
+
+    def caminho(self, u, v):
+        """Caminho de `u` a `v` pela árvore, no formato `(caminho, distancia)` de `buscarCaminho`."""
+        a, b = self._posicao(u), self._posicao(v)
+        if a < 0 or b < 0 or self.componente[a] != self.componente[b]:
+            return None, 0
+        c = self._lca(a, b)
+
+        ida, volta = [], []
+        while a != c:
+            ida.append(self.vertices[a])
+            a = self.pai[a]
+        while b != c:
+            volta.append(self.vertices[b])
+            b = self.pai[b]
+        caminho = ida + [self.vertices[c]] + volta[::-1]
+        return caminho, self.dist_raiz[self.indice[u]] + self.dist_raiz[self.indice[v]] - 2 * self.dist_raiz[c]
+
+    def distancias(self, pares):
+        """Distâncias de muitos pares (u, v) de uma vez, como array NumPy."""
+        if not pares:
+            return np.zeros(0)
+        a = np.array([self._posicao(u) for u, _ in pares], dtype=np.int64)
+        b = np.array([self._posicao(v) for _, v in pares], dtype=np.int64)
+        fora = (a < 0) | (b < 0)
+        if fora.all():
+            return np.full(len(pares), math.inf)
+        a[fora] = b[fora] = 0
+        prof = np.asarray(self.profundidade)
+        dist = np.asarray(self.dist_raiz)
+        comp = np.asarray(self.componente)
+
+        # Todos os pares sobem juntos: primeiro até a mesma profundidade, depois até abaixo do LCA
+        troca = prof[a] < prof[b]
+        a, b = np.where(troca, b, a), np.where(troca, a, b)
+        x, y = a.copy(), b.copy()
+        diferenca = prof[x] - prof[y]
+        for k in range(len(self.saltos)):
+            sobe = (diferenca >> k) & 1 == 1
+            x[sobe] = self.saltos[k][x[sobe]]
+        for k in reversed(range(len(self.saltos))):
+            sobe = self.saltos[k][x] != self.saltos[k][y]
+            x[sobe] = self.saltos[k][x[sobe]]
+            y[sobe] = self.saltos[k][y[sobe]]
+        lca = np.where(x == y, x, self.saltos[0][x])
+
+        resultado = dist[a] + dist[b] - 2 * dist[lca]
+        resultado[(comp[a] != comp[b]) | fora] = math.inf
+        return resultado
+
+    def caminhos(self, pares):
+        """`caminho(u, v)` para cada par."""
+        return [self.caminho(u, v) for u, v in pares]
+
 def estatisticas_caminho(caminho, distancia):
     if not caminho or len(caminho) < 2:
         return {
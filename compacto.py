@@ -0,0 +1,138 @@
+import numpy as np
+
+class GrafoCompacto:
+    """Grafo de visibilidade em arrays CSR, com vértices numerados de 0 a V-1.
+
+    `coords` (V, 2) guarda as coordenadas; os vizinhos do vértice i são
+    `indices[indptr[i]:indptr[i + 1]]`, com os pesos na mesma fatia de
+    `pesos`. Cada aresta aparece nas duas direções, como no dicionário de
+    adjacência, mas sem uma tupla por entrada.
+
+    Os vértices são numerados na ordem lexicográfica das coordenadas, a
+    mesma ordem das tuplas: desempates por vértice (como no heap de `prim`)
+    saem iguais nas duas representações.
+    """
+
+    def __init__(self, coords, indptr, indices, pesos):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        tipo = np.int32 if len(self.coords) < 2**31 else np.int64
+        self.indices = np.asarray(indices, dtype=tipo)
+        self.pesos = np.asarray(pesos, dtype=float)
+        self._vertices = None
+        self._ids = None
+
+    @classmethod
+    def de_pares(cls, pontos, pares):
+        """A partir dos pontos e dos pares (i, j, dist) devolvidos por `pares_visiveis`."""
+        coords = np.array(pontos, dtype=float).reshape(-1, 2)
+        n = len(coords)
+        ordem = np.lexsort((coords[:, 1], coords[:, 0]))
+        novo = np.empty(n, dtype=np.int64)
+        novo[ordem] = np.arange(n)
+
+        if pares:
+            i, j, d = (np.array(coluna) for coluna in zip(*pares))
+            i, j = novo[i.astype(np.int64)], novo[j.astype(np.int64)]
+        else:
+            i = j = np.zeros(0, dtype=np.int64)
+            d = np.zeros(0)
+        origem = np.concatenate([i, j])
+        destino = np.concatenate([j, i])
+        pesos = np.concatenate([d, d]).astype(float)
+
+        # Ordenar por origem (e destino, para uma ordem estável dos vizinhos) e contar as arestas de cada vértice
+        ordem_arestas = np.lexsort((destino, origem))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origem, minlength=n), out=indptr[1:])
+        return cls(coords[ordem], indptr, destino[ordem_arestas], pesos[ordem_arestas])
+
+    @classmethod
+    def de_dicionario(cls, G):
+        """A partir do dicionário de adjacência de `grafo_visibilidade`."""
+        pontos = list(G)
+        indice = {v: i for i, v in enumerate(pontos)}
+        pares = [(indice[u], indice[w], peso) for u in pontos for w, peso in G[u] if indice[u] < indice[w]]
+        return cls.de_pares(pontos, pares)
+
+    def para_dicionario(self):
+        """De volta ao dicionário de adjacência {vértice: [(vizinho, peso), ...]}."""
+        vertices = self.vertices
+        indptr, indices, pesos = self.indptr.tolist(), self.indices.tolist(), self.pesos.tolist()
+        return {v: [(vertices[j], pesos[k]) for k, j in enumerate(indices[indptr[i]:indptr[i + 1]], indptr[i])]
+                for i, v in enumerate(vertices)}
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def num_arestas(self):
+        return len(self.indices) // 2
+
+    @property
+    def vertices(self):
+        """Coordenadas como lista de tuplas, na ordem dos ids."""
+        if self._vertices is None:
+            self._vertices = [tuple(v) for v in self.coords.tolist()]
+        return self._vertices
+
+    @property
+    def ids(self):
+        """Dicionário coordenadas -> id, montado na primeira consulta."""
+        if self._ids is None:
+            self._ids = {p: i for i, p in enumerate(self.vertices)}
+        return self._ids
+
+    def id(self, v):
+        """Id do vértice de coordenadas `v` (KeyError se não existir)."""
+        return self.ids[tuple(v)]
+
+    def __contains__(self, v):
+        try:
+            self.id(v)
+        except KeyError:
+            return False
+        return True
+
+    def vizinhos(self, i):
+        """(ids, pesos) dos vizinhos do vértice `i`."""
+        a, b = self.indptr[i], self.indptr[i + 1]
+        return self.indices[a:b], self.pesos[a:b]
+
+    def alcancaveis(self, inicio):
+        """Máscara booleana dos vértices alcançáveis a partir do id `inicio` (busca em largura por camadas)."""
+        visitado = np.zeros(len(self), dtype=bool)
+        visitado[inicio] = True
+        fronteira = np.array([inicio], dtype=np.int64)
+        while len(fronteira):
+            # Todas as listas de vizinhos da camada de uma vez
+            inicios = self.indptr[fronteira]
+            quantos = self.indptr[fronteira + 1] - inicios
+            deslocamento = np.repeat(inicios - np.cumsum(quantos) + quantos, quantos)
+            vizinhos = self.indices[np.arange(quantos.sum()) + deslocamento]
+            vizinhos = np.unique(vizinhos[~visitado[vizinhos]])
+            visitado[vizinhos] = True
+            fronteira = vizinhos.astype(np.int64)
+        return visitado
+
+    def componentes(self):
+        """Rótulo da componente conexa de cada vértice (o menor id dela), sem percorrer vértice a vértice.
+
+        Cada rodada pendura a raiz maior de cada aresta entre componentes na
+        menor e achata os ponteiros; arestas que ficaram internas saem.
+        """
+        rotulo = np.arange(len(self))
+        u = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        v = self.indices.astype(np.int64)
+        while True:
+            ru, rv = rotulo[u], rotulo[v]
+            externa = ru != rv
+            if not externa.any():
+                return rotulo
+            u, v, ru, rv = u[externa], v[externa], ru[externa], rv[externa]
+            np.minimum.at(rotulo, np.maximum(ru, rv), np.minimum(ru, rv))
+            while True:
+                proximo = rotulo[rotulo]
+                if np.array_equal(proximo, rotulo):
+                    break
+                rotulo = proximo
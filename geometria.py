@@ -1,19 +1,218 @@
 import math
-from shapely.geometry import Point, Polygon, LineString
+from fractions import Fraction
+import numpy as np
+
+import instrumentos
+
+def _shapely():
+    # Carregado no primeiro teste com polígonos: quem só usa o grafo pronto (MST, caminhos) não paga a importação
+    import shapely
+    import shapely.geometry
+    return shapely
 
 def dist(p1, p2):
     return math.hypot(p2[0] - p1[0], p2[1] - p1[1])
 
 def ponto_dentro_poligono(p, poligono):
-    return Polygon(poligono).covers(Point(p))
+    geometria = _shapely().geometry
+    return geometria.Polygon(poligono).covers(geometria.Point(p))
 
 def intersecao(p1, q1, p2, q2):
+    LineString = _shapely().geometry.LineString
     return LineString([p1, q1]).intersects(LineString([p2, q2]))
 
+# Limite de erro relativo do determinante de orientação em ponto flutuante ((3 + 16ε)ε, Shewchuk)
+ERRO_ORIENTACAO = 3.3306690738754716e-16
+
+def orientacao(p, q, r):
+    # > 0: r à esquerda de p->q, < 0: à direita, 0: colineares.
+    # O sinal é exato (como nos predicados do shapely/GEOS): se o determinante
+    # em ponto flutuante é pequeno demais para ser confiável, recalcula com frações
+    esquerdo = (q[0] - p[0]) * (r[1] - p[1])
+    direito = (q[1] - p[1]) * (r[0] - p[0])
+    det = esquerdo - direito
+    limite = ERRO_ORIENTACAO * (abs(esquerdo) + abs(direito))
+    if abs(det) > limite or limite == 0 or r == q or r == p or p == q:
+        return det
+    return float(_orientacao_exata(p, q, r))
+
+def _orientacao_exata(p, q, r):
+    px, py = Fraction(p[0]), Fraction(p[1])
+    det = (Fraction(q[0]) - px) * (Fraction(r[1]) - py) - (Fraction(q[1]) - py) * (Fraction(r[0]) - px)
+    return (det > 0) - (det < 0)
+
+def cruza_propriamente(p1, q1, p2, q2):
+    # Os segmentos se cruzam num ponto interior aos dois (toques não contam)
+    o1 = orientacao(p1, q1, p2)
+    o2 = orientacao(p1, q1, q2)
+    o3 = orientacao(p2, q2, p1)
+    o4 = orientacao(p2, q2, q1)
+    return ((o1 > 0 > o2) or (o1 < 0 < o2)) and ((o3 > 0 > o4) or (o3 < 0 < o4))
+
+def entra_no_interior(v, cone, alvo):
+    """Diz se o segmento que sai de `v` em direção a `alvo` entra no interior do polígono.
+
+    `cone` é o par (anterior, próximo) de vizinhos de `v` no contorno,
+    orientado no sentido anti-horário (interior à esquerda).
+    """
+    ant, prox = cone
+    c = orientacao(v, prox, ant)
+    c1 = orientacao(v, prox, alvo)
+    c2 = orientacao(v, alvo, ant)
+    if c > 0:
+        # Vértice convexo
+        return c1 > 0 and c2 > 0
+    if c < 0:
+        # Vértice reflexo: fora apenas no cone complementar (fechado)
+        return c1 > 0 or c2 > 0
+    if (prox[0] - v[0]) * (ant[0] - v[0]) + (prox[1] - v[1]) * (ant[1] - v[1]) < 0:
+        # Vértice raso (180°): o interior é o semiplano à esquerda
+        return c1 > 0
+    return False
+
+def anti_horario(poligono):
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(poligono, poligono[1:] + poligono[:1]):
+        area += x1 * y2 - x2 * y1
+    return poligono if area >= 0 else poligono[::-1]
+
+
+class ConjuntoObstaculos:
+    """Obstáculos de um mapa, preparados uma única vez para os testes de visibilidade.
+
+    Guarda os polígonos já construídos e preparados e uma STRtree com as suas
+    caixas envolventes. Itera como a lista original de obstáculos, então pode
+    ser usado no lugar dela (ex.: nas funções de `plots`).
+    """
+
+    def __init__(self, obstaculos):
+        shapely = _shapely()
+        self._ponto, self._linha = shapely.geometry.Point, shapely.geometry.LineString
+        self.obstaculos = [list(obst) for obst in obstaculos]
+        self.poligonos = [pol for pol in map(shapely.geometry.Polygon, self.obstaculos) if not pol.is_empty]
+        for pol in self.poligonos:
+            shapely.prepare(pol)
+        self.arvore = shapely.STRtree(self.poligonos)
+        self._empacotados = None
+        self._disjuntos = None
+
+    def __setstate__(self, estado):
+        # Vindo de outro processo (ex.: o `Planejador` montado no pool do servidor): a preparação
+        # dos polígonos não passa pelo pickle e é refeita aqui
+        self.__dict__.update(estado)
+        shapely = _shapely()
+        for pol in self.poligonos:
+            shapely.prepare(pol)
+
+    def __iter__(self):
+        return iter(self.obstaculos)
+
+    def __len__(self):
+        return len(self.obstaculos)
+
+    def __getitem__(self, i):
+        return self.obstaculos[i]
+
+    def candidatos(self, geometria):
+        # Só os polígonos cuja caixa envolvente toca a geometria
+        return [self.poligonos[i] for i in self.arvore.query(geometria)]
+
+    def arestas(self):
+        arestas = []
+        for obst in self.obstaculos:
+            for a, b in zip(obst, obst[1:] + obst[:1]):
+                if a != b:
+                    arestas.append((a, b))
+        return arestas
+
+    def cones(self, pontos):
+        """Cones interiores e pontos bloqueados, para os testes locais de visibilidade.
+
+        Devolve `(cones, bloqueados)`: `cones[p]` lista os pares (anterior,
+        próximo) de cada polígono em cujo contorno `p` está (como vértice ou
+        no meio de uma aresta); `bloqueados` são os pontos estritamente
+        dentro de algum obstáculo.
+        """
+        cones = {}
+        for obst in self.obstaculos:
+            anel = anti_horario(obst)
+            for k, v in enumerate(anel):
+                cones.setdefault(v, []).append((anel[k - 1], anel[(k + 1) % len(anel)]))
+
+        bloqueados = set()
+        for p in pontos:
+            dentro, extras = self.contato(p)
+            if dentro:
+                bloqueados.add(p)
+            if extras:
+                cones.setdefault(p, []).extend(extras)
+        return cones, bloqueados
+
+    def contato(self, p):
+        """Situação de um ponto avulso: `(dentro, cones)`.
+
+        `dentro` indica se `p` está estritamente dentro de algum obstáculo;
+        `cones` são os cones rasos das arestas em cujo meio `p` está.
+        """
+        ponto = self._ponto(p)
+        dentro = False
+        cones = []
+        for k in self.arvore.query(ponto):
+            pol = self.poligonos[k]
+            if pol.contains(ponto):
+                dentro = True
+            elif pol.touches(ponto):
+                anel = anti_horario(list(pol.exterior.coords)[:-1])
+                if p in anel:
+                    continue
+                for a, b in zip(anel, anel[1:] + anel[:1]):
+                    if orientacao(a, b, p) == 0 and min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) \
+                            and min(a[1], b[1]) <= p[1] <= max(a[1], b[1]):
+                        cones.append((a, b))
+        return dentro, cones
+
+    def disjuntos(self):
+        """Diz se os obstáculos são válidos e nenhum par se sobrepõe (tocar-se pode).
+
+        É o que a varredura rotacional supõe: arestas que nunca se cruzam.
+        """
+        if self._disjuntos is None:
+            shapely = _shapely()
+            poligonos = np.array(self.poligonos, dtype=object)
+            i, j = self.arvore.query(poligonos, predicate='intersects')
+            i, j = i[i < j], j[i < j]
+            # Interiores com algum ponto em comum (DE-9IM), o que inclui um obstáculo dentro do outro
+            sobrepostos = shapely.relate_pattern(poligonos[i], poligonos[j], 'T********')
+            self._disjuntos = all(pol.is_valid for pol in self.poligonos) and not sobrepostos.any()
+        return self._disjuntos
+
+    def empacotados(self):
+        # Arrays NumPy para o kernel vetorizado, montados na primeira vez que forem pedidos
+        if self._empacotados is None:
+            self._empacotados = ObstaculosEmpacotados(self.obstaculos)
+        return self._empacotados
+
+    def linha_livre(self, p1, p2):
+        linha = self._linha([p1, p2])
+        candidatos = self.candidatos(linha)
+        if instrumentos.ativo:
+            instrumentos.contar(pares_testados=1, testes_intersecao=len(candidatos))
+        for pol in candidatos:
+            if pol.intersects(linha) and not pol.touches(linha):
+                return False
+        return True
+
+
 def linha_livre(p1, p2, obstaculos):
-    linha = LineString([p1, p2])
+    if isinstance(obstaculos, ConjuntoObstaculos):
+        return obstaculos.linha_livre(p1, p2)
+
+    geometria = _shapely().geometry
+    linha = geometria.LineString([p1, p2])
+    if instrumentos.ativo:
+        instrumentos.contar(pares_testados=1, testes_intersecao=len(obstaculos))
     for obst in obstaculos:
-        pol = Polygon(obst)
+        pol = geometria.Polygon(obst)
         if pol.is_empty:
             continue
 
@@ -22,3 +221,178 @@ def linha_livre(p1, p2, obstaculos):
             return False
 
     return True
+
+
+# =====================================================
+# Kernel vetorizado (NumPy)
+# =====================================================
+
+class ObstaculosEmpacotados:
+    """Contornos dos obstáculos em arrays contíguos, completados até o maior polígono.
+
+    `vertices[k, i]` é o i-ésimo vértice do obstáculo k no sentido anti-horário;
+    `proximos` e `anteriores` são os seus vizinhos no contorno, `validos`
+    marca as posições que não são preenchimento e `caixas` guarda
+    (xmin, ymin, xmax, ymax) de cada obstáculo.
+    """
+
+    def __init__(self, obstaculos):
+        aneis = []
+        for obst in obstaculos:
+            anel = [v for k, v in enumerate(obst) if v != obst[k - 1]]
+            if len(anel) >= 3:
+                aneis.append(anti_horario(anel))
+
+        n = len(aneis)
+        tam = max((len(anel) for anel in aneis), default=0)
+        self.vertices = np.zeros((n, tam, 2))
+        self.validos = np.zeros((n, tam), dtype=bool)
+        for k, anel in enumerate(aneis):
+            self.vertices[k, :len(anel)] = anel
+            self.validos[k, :len(anel)] = True
+
+        # Vizinhos no contorno, respeitando o tamanho de cada polígono
+        tamanhos = self.validos.sum(axis=1)
+        pos = np.arange(tam)
+        linhas = np.arange(n)[:, None]
+        self.proximos = self.vertices[linhas, (pos + 1) % np.maximum(tamanhos, 1)[:, None]]
+        self.anteriores = self.vertices[linhas, (pos - 1) % np.maximum(tamanhos, 1)[:, None]]
+
+        # Tipo de cada vértice: sinal da curva (convexo > 0, reflexo < 0) e se é raso (180°)
+        V, A, B = self.vertices, self.anteriores, self.proximos
+        self.curvas = sinal_orientacao(V[..., 0], V[..., 1], B[..., 0], B[..., 1], A[..., 0], A[..., 1])
+        self.rasos = (self.curvas == 0) & (((B - V) * (A - V)).sum(axis=-1) < 0)
+
+        v = np.where(self.validos[..., None], self.vertices, np.nan)
+        self.caixas = np.column_stack([
+            np.nanmin(v[..., 0], axis=1), np.nanmin(v[..., 1], axis=1),
+            np.nanmax(v[..., 0], axis=1), np.nanmax(v[..., 1], axis=1),
+        ]) if n else np.zeros((0, 4))
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def bloqueia(self, P, Q, k):
+        """Para cada i, diz se o segmento P[i]-Q[i] atravessa o interior do obstáculo k[i]."""
+        # Descartar logo os obstáculos inteiramente de um lado da reta do segmento
+        V, ok = self.vertices[k], self.validos[k]
+        px, py, qx, qy = P[:, 0, None], P[:, 1, None], Q[:, 0, None], Q[:, 1, None]
+        vx, vy = V[..., 0], V[..., 1]
+        s1 = sinal_orientacao(px, py, qx, qy, vx, vy)
+        bloqueado = np.zeros(len(k), dtype=bool)
+        resta = np.nonzero(((s1 <= 0) & ok).any(axis=1) & ((s1 >= 0) & ok).any(axis=1))[0]
+        if len(resta) == 0:
+            return bloqueado
+        if len(resta) < len(k):
+            P, Q, k, V, ok, s1 = P[resta], Q[resta], k[resta], V[resta], ok[resta], s1[resta]
+            px, py, qx, qy = P[:, 0, None], P[:, 1, None], Q[:, 0, None], Q[:, 1, None]
+            vx, vy = V[..., 0], V[..., 1]
+
+        B, A = self.proximos[k], self.anteriores[k]
+        bx, by, ax, ay = B[..., 0], B[..., 1], A[..., 0], A[..., 1]
+        ex, ey = bx - vx, by - vy
+
+        # Arestas v -> b cruzadas propriamente
+        s2 = sinal_orientacao(px, py, qx, qy, bx, by)
+        s3 = sinal_orientacao(vx, vy, bx, by, px, py)
+        s4 = sinal_orientacao(vx, vy, bx, by, qx, qy)
+        cruza = (s1 * s2 < 0) & (s3 * s4 < 0)
+
+        # Vértices na ponta ou no meio do segmento: o segmento entra no cone interior?
+        curva, raso = self.curvas[k], self.rasos[k]
+        para_p = _entra_no_interior_np(curva, raso, s3, sinal_orientacao(vx, vy, px, py, ax, ay))
+        para_q = _entra_no_interior_np(curva, raso, s4, sinal_orientacao(vx, vy, qx, qy, ax, ay))
+        em_p = (vx == px) & (vy == py)
+        em_q = (vx == qx) & (vy == qy)
+        entre = (s1 == 0) & ((vx - px) * (qx - px) + (vy - py) * (qy - py) > 0) \
+            & ((vx - qx) * (px - qx) + (vy - qy) * (py - qy) > 0)
+        vertice = ((entre | em_q) & para_p) | ((entre | em_p) & para_q)
+
+        # Ponta do segmento no meio de uma aresta, saindo para o lado de dentro (à esquerda)
+        meio_p = (s3 == 0) & ((px - vx) * ex + (py - vy) * ey > 0) & ((px - bx) * ex + (py - by) * ey < 0)
+        meio_q = (s4 == 0) & ((qx - vx) * ex + (qy - vy) * ey > 0) & ((qx - bx) * ex + (qy - by) * ey < 0)
+        meio = (meio_p & (s4 > 0)) | (meio_q & (s3 > 0))
+
+        bloqueado[resta] = ((cruza | vertice | meio) & ok).any(axis=1) \
+            | _dentro_estrito(px, py, vx, vy, bx, by, s3, ok) \
+            | _dentro_estrito(qx, qy, vx, vy, bx, by, s4, ok)
+        return bloqueado
+
+
+def sinal_orientacao(ax, ay, bx, by, cx, cy):
+    """Sinal exato (-1, 0, 1) de orientacao(a, b, c), elemento a elemento.
+
+    Usa ponto flutuante e só recalcula com frações os elementos em que o
+    determinante fica abaixo do limite de erro (quase colineares).
+    """
+    esquerdo = (bx - ax) * (cy - ay)
+    direito = (by - ay) * (cx - ax)
+    det = esquerdo - direito
+    sinal = np.sign(det).astype(np.int8)
+    idx = np.nonzero(np.abs(det) <= ERRO_ORIENTACAO * (np.abs(esquerdo) + np.abs(direito)))
+    if len(idx[0]):
+        a0, a1, b0, b1, c0, c1 = (np.broadcast_to(c, det.shape)[idx] for c in (ax, ay, bx, by, cx, cy))
+        # Pontos repetidos dão determinante exatamente zero, sem precisar de frações
+        exato = ~(((c0 == b0) & (c1 == b1)) | ((c0 == a0) & (c1 == a1)) | ((a0 == b0) & (a1 == b1)))
+        exato &= (esquerdo[idx] != 0) | (direito[idx] != 0)
+        if exato.any():
+            sub = tuple(i[exato] for i in idx)
+            pontos = zip(*(c[exato].tolist() for c in (a0, a1, b0, b1, c0, c1)))
+            sinal[sub] = [_orientacao_exata((x0, y0), (x1, y1), (x2, y2)) for x0, y0, x1, y1, x2, y2 in pontos]
+    return sinal
+
+def _entra_no_interior_np(curva, raso, c1, c2):
+    # Versão vetorizada de entra_no_interior, a partir dos sinais já calculados
+    convexo = (curva > 0) & (c1 > 0) & (c2 > 0)
+    reflexo = (curva < 0) & ((c1 > 0) | (c2 > 0))
+    return convexo | reflexo | (raso & (c1 > 0))
+
+def _dentro_estrito(x, y, vx, vy, bx, by, s, ok):
+    # Paridade dos cruzamentos de um raio para +x; pontos na borda não contam como dentro.
+    # Aresta subindo: o raio a corta se o ponto está à esquerda dela (s > 0); descendo, à direita
+    corta = ((vy > y) != (by > y)) & np.where(by > vy, s > 0, s < 0)
+    borda = (s == 0) & (np.minimum(vx, bx) <= x) & (x <= np.maximum(vx, bx)) \
+        & (np.minimum(vy, by) <= y) & (y <= np.maximum(vy, by))
+    return ((corta & ok).sum(axis=1) % 2 == 1) & ~(borda & ok).any(axis=1)
+
+def segmentos_livres(inicios, fins, obstaculos, bloco=1_000_000):
+    """Máscara booleana: True onde o segmento inicios[i]-fins[i] está livre.
+
+    Mesma regra de `linha_livre` (tocar a borda pode, entrar no interior não),
+    avaliada para todos os segmentos de uma vez. Só os pares (segmento,
+    obstáculo) cujas caixas envolventes se tocam são testados, em blocos de
+    no máximo `bloco` elementos.
+    """
+    if isinstance(obstaculos, ConjuntoObstaculos):
+        pacote = obstaculos.empacotados()
+    elif isinstance(obstaculos, ObstaculosEmpacotados):
+        pacote = obstaculos
+    else:
+        pacote = ObstaculosEmpacotados(obstaculos)
+
+    P = np.asarray(inicios, dtype=float).reshape(-1, 2)
+    Q = np.asarray(fins, dtype=float).reshape(-1, 2)
+    livres = np.ones(len(P), dtype=bool)
+    if instrumentos.ativo:
+        instrumentos.contar(pares_testados=len(P))
+    if len(pacote) == 0 or len(P) == 0:
+        return livres
+
+    xmin, xmax = np.minimum(P[:, 0], Q[:, 0]), np.maximum(P[:, 0], Q[:, 0])
+    ymin, ymax = np.minimum(P[:, 1], Q[:, 1]), np.maximum(P[:, 1], Q[:, 1])
+    cx0, cy0, cx1, cy1 = pacote.caixas.T
+
+    passo = max(1, bloco // len(pacote))
+    por_par = max(1, bloco // max(1, pacote.vertices.shape[1]))
+    for i0 in range(0, len(P), passo):
+        fatia = slice(i0, i0 + passo)
+        toca = (xmin[fatia, None] <= cx1) & (xmax[fatia, None] >= cx0) \
+            & (ymin[fatia, None] <= cy1) & (ymax[fatia, None] >= cy0)
+        s, k = np.nonzero(toca)
+        s += i0
+        if instrumentos.ativo:
+            instrumentos.contar(testes_intersecao=len(s))
+        for j0 in range(0, len(s), por_par):
+            sj, kj = s[j0:j0 + por_par], k[j0:j0 + por_par]
+            livres[sj[pacote.bloqueia(P[sj], Q[sj], kj)]] = False
+    return livres
@@ -0,0 +1,140 @@
+import math
+import argparse
+import numpy as np
+
+from mapa import salvar_mapa_texto
+
+TIPOS = ('convexo', 'nao_convexo', 'armazem', 'desordenado')
+
+# =====================================================
+# Polígonos
+# =====================================================
+
+def poligono_convexo(rng, centro, raio, n_vertices):
+    """Polígono convexo com `n_vertices` sobre um círculo, em ângulos aleatórios (sentido anti-horário)."""
+    # Ângulos com espaçamento mínimo, para não gerar vértices quase repetidos
+    folgas = rng.uniform(0.5, 1.5, n_vertices)
+    angulos = np.cumsum(folgas) / folgas.sum() * 2 * math.pi + rng.uniform(0, 2 * math.pi)
+    return _pontos(centro, np.full(n_vertices, raio), angulos)
+
+def poligono_nao_convexo(rng, centro, raio, n_vertices):
+    """Polígono em estrela: ângulos igualmente espaçados e raios alternando entre externo e interno."""
+    angulos = np.arange(n_vertices) / n_vertices * 2 * math.pi + rng.uniform(0, 2 * math.pi)
+    raios = np.where(np.arange(n_vertices) % 2 == 0,
+                     rng.uniform(0.8, 1.0, n_vertices), rng.uniform(0.35, 0.6, n_vertices)) * raio
+    return _pontos(centro, raios, angulos)
+
+def _pontos(centro, raios, angulos):
+    x = centro[0] + raios * np.cos(angulos)
+    y = centro[1] + raios * np.sin(angulos)
+    return [(round(a, 6), round(b, 6)) for a, b in zip(x.tolist(), y.tolist())]
+
+# =====================================================
+# Mapas
+# =====================================================
+
+def gerar_mapa(tipo, n_obstaculos, vertices=6, semente=0):
+    """Mapa sintético `(q_start, q_goal, obstaculos)`, reprodutível pela `semente`.
+
+    - 'convexo' / 'nao_convexo': um polígono por célula de uma grade, com
+      centro e tamanho sorteados dentro da célula;
+    - 'armazem': prateleiras retangulares em fileiras, com corredores
+      (sempre 4 vértices por obstáculo);
+    - 'desordenado': polígonos de tamanhos variados, convexos ou não,
+      espalhados ao acaso sem se sobrepor.
+
+    Os obstáculos nunca se tocam e `q_start`/`q_goal` ficam em cantos
+    opostos, fora de todos eles.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de mapa desconhecido: {tipo} (esperado um de {', '.join(TIPOS)})")
+    if vertices < 3:
+        raise ValueError("Cada obstáculo precisa de pelo menos 3 vértices")
+    rng = np.random.default_rng(semente)
+
+    if tipo == 'armazem':
+        obstaculos, largura, altura = _armazem(rng, n_obstaculos)
+    elif tipo == 'desordenado':
+        obstaculos, largura, altura = _desordenado(rng, n_obstaculos, vertices)
+    else:
+        forma = poligono_convexo if tipo == 'convexo' else poligono_nao_convexo
+        obstaculos, largura, altura = _grade(rng, n_obstaculos, vertices, forma)
+
+    # Cantos livres: os obstáculos ocupam [1, largura - 1] x [1, altura - 1]
+    return (0.0, 0.0), (float(largura), float(altura)), obstaculos
+
+def _grade(rng, n_obstaculos, vertices, forma, lado=10.0):
+    colunas = max(1, math.ceil(math.sqrt(n_obstaculos)))
+    linhas = max(1, math.ceil(n_obstaculos / colunas))
+    obstaculos = []
+    for k in range(n_obstaculos):
+        i, j = divmod(k, colunas)
+        raio = rng.uniform(0.25, 0.45) * lado
+        folga = lado / 2 - raio
+        centro = (1 + (j + 0.5) * lado + rng.uniform(-folga, folga),
+                  1 + (i + 0.5) * lado + rng.uniform(-folga, folga))
+        obstaculos.append(forma(rng, centro, raio, vertices))
+    return obstaculos, colunas * lado + 2, linhas * lado + 2
+
+def _armazem(rng, n_obstaculos, comprimento=12.0, profundidade=2.0, corredor=3.0, encosto=0.5):
+    # Prateleiras em pares costas com costas; corredores entre os pares e entre prateleiras da mesma fileira
+    passo_y = 2 * profundidade + encosto + corredor
+    por_fileira = max(1, math.ceil(math.sqrt(n_obstaculos * passo_y / (2 * (comprimento + corredor)))))
+    fileiras = max(1, math.ceil(n_obstaculos / por_fileira))
+    obstaculos = []
+    for k in range(n_obstaculos):
+        i, j = divmod(k, por_fileira)
+        comp = comprimento * rng.uniform(0.7, 1.0)
+        x0 = round(1 + j * (comprimento + corredor) + rng.uniform(0, comprimento - comp), 6)
+        y0 = round(1 + (i // 2) * passo_y + (i % 2) * (profundidade + encosto), 6)
+        x1, y1 = round(x0 + comp, 6), round(y0 + profundidade, 6)
+        obstaculos.append([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+    largura = por_fileira * (comprimento + corredor) - corredor + 2
+    altura = math.ceil(fileiras / 2) * passo_y - corredor + 2
+    return obstaculos, largura, altura
+
+def _desordenado(rng, n_obstaculos, vertices, densidade=0.35, tentativas=200):
+    # Raios variados numa área que dá a fração `densidade` de ocupação (pelos círculos envolventes)
+    raios = np.sort(rng.uniform(0.5, 3.0, n_obstaculos))[::-1]
+    lado_mapa = math.sqrt(math.pi * float((raios ** 2).sum()) / densidade) if n_obstaculos else 1.0
+    celula = 2 * float(raios.max()) + 0.1 if n_obstaculos else 1.0
+    grade = {}
+    colocados = []
+    obstaculos = []
+    # Os maiores primeiro: os pequenos preenchem os vãos
+    for raio in raios.tolist():
+        for _ in range(tentativas):
+            c = rng.uniform(1 + raio, 1 + lado_mapa - raio, 2)
+            cx, cy = int(c[0] // celula), int(c[1] // celula)
+            vizinhos = (colocados[k] for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                        for k in grade.get((cx + dx, cy + dy), ()))
+            if all(math.dist(c, centro) > raio + r + 0.1 for centro, r in vizinhos):
+                break
+        else:
+            # Mapa cheio demais: aumentar a área não vale a pena, este obstáculo fica de fora
+            continue
+        grade.setdefault((cx, cy), []).append(len(colocados))
+        colocados.append((c, raio))
+        n = int(rng.integers(3, 2 * vertices - 2)) if vertices > 3 else 3
+        forma = poligono_convexo if rng.random() < 0.5 else poligono_nao_convexo
+        obstaculos.append(forma(rng, tuple(c.tolist()), raio, n))
+    return obstaculos, lado_mapa + 2, lado_mapa + 2
+
+def salvar_mapa(arquivo, q_start, q_goal, obstaculos):
+    """Grava um mapa `(q_start, q_goal, obstaculos)` no formato de `mapa.txt`."""
+    coords = [v for obst in obstaculos for v in obst]
+    offsets = np.cumsum([0] + [len(obst) for obst in obstaculos])
+    salvar_mapa_texto(arquivo, q_start, q_goal, np.array(coords, dtype=float).reshape(-1, 2), offsets)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um mapa sintético no formato de mapa.txt")
+    parser.add_argument('saida')
+    parser.add_argument('--tipo', choices=TIPOS, default='convexo')
+    parser.add_argument('--obstaculos', type=int, default=100)
+    parser.add_argument('--vertices', type=int, default=6, help="vértices por obstáculo (média, em 'desordenado')")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    q_start, q_goal, obstaculos = gerar_mapa(args.tipo, args.obstaculos, args.vertices, args.semente)
+    salvar_mapa(args.saida, q_start, q_goal, obstaculos)
+    print(f"{args.saida}: {len(obstaculos)} obstáculos, {sum(map(len, obstaculos))} vértices")
@@ -1,17 +1,53 @@
 import math
+import bisect
+import numpy as np
 import itertools
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
 
-from geometria import linha_livre
+import instrumentos
+from compacto import GrafoCompacto
+from indice import IndiceVertices, pares_proximos
+from geometria import linha_livre, segmentos_livres, ConjuntoObstaculos, orientacao, cruza_propriamente, entra_no_interior
+
+METODOS = ('pares', 'varredura', 'vetorizado')
+
+def grafo_visibilidade(q_start, q_goal, obstaculos, max_distancia=None, debug=False, metodo='pares', workers=1,
+                       reduzido=False, compacto=False, k_vizinhos=None):
+    if metodo not in METODOS:
+        raise ValueError(f"Método de construção desconhecido: {metodo} (use um de {METODOS})")
+
+    # Preparar os obstáculos uma única vez (polígonos + índice espacial)
+    if not isinstance(obstaculos, ConjuntoObstaculos):
+        obstaculos = ConjuntoObstaculos(obstaculos)
 
-def grafo_visibilidade(q_start, q_goal, obstaculos, max_distancia=None, debug=False):
     # Coletar todos os vértices
     vertices = [q_start, q_goal]
     for obst in obstaculos:
         vertices.extend(obst)
+
+    if metodo != 'pares' or workers > 1 or reduzido or compacto or max_distancia or k_vizinhos:
+        pontos = list(dict.fromkeys(vertices))
+        if reduzido:
+            # Vértices reflexos nunca estão num caminho mínimo: nem entram no teste
+            cones, bloqueados = obstaculos.cones(pontos)
+            pontos = [v for v in pontos if v in (q_start, q_goal) or vertice_convexo(v, cones, bloqueados)]
+        if k_vizinhos:
+            pares = pares_k_visiveis(pontos, obstaculos, k_vizinhos, max_distancia)
+        elif workers > 1:
+            pares = pares_visiveis_paralelo(pontos, obstaculos, max_distancia, metodo, workers)
+        else:
+            pares = pares_visiveis(metodo, pontos, obstaculos, max_distancia)
+        if reduzido:
+            visiveis = len(pares)
+            pares = [(i, j, d) for i, j, d in pares if bitangente(pontos[i], pontos[j], cones)]
+            if debug:
+                print(f"Grafo reduzido: {len(vertices) - len(pontos)} vértices não convexos "
+                      f"e {visiveis - len(pares)} arestas não tangentes removidos")
+        if compacto:
+            # Direto dos pares para os arrays CSR, sem passar pelo dicionário
+            if debug:
+                print(f"Grafo criado: {len(pontos)} vértices, {len(pares)} arestas")
+            return GrafoCompacto.de_pares(pontos, pares)
+        return montar_grafo(pontos, pares, debug)
     
     # Inicializar o grafo
     G = {v: [] for v in vertices}
@@ -41,12 +77,606 @@ def grafo_visibilidade(q_start, q_goal, obstaculos, max_distancia=None, debug=Fa
                 print(f"bloqueado: {v1} <-> {v2} (dist={distancia:.2f})")
     
     if debug:
-        print(f"Grafo criado: {len(vertices)} vértices, {conexoes} arestas")
-        print(f"Testados {total_pares} pares de vértices")
-        # graus
-        graus = {v: len(adj) for v, adj in G.items()}
-        degs = sorted(graus.items(), key=lambda x: -x[1])
-        print("Top graus (vértice: grau):", degs[:6])
+        imprimir_resumo(G, len(vertices), conexoes, total_pares)
     
     return G
 
+
+def imprimir_resumo(G, num_vertices, conexoes, total_pares):
+    print(f"Grafo criado: {num_vertices} vértices, {conexoes} arestas")
+    print(f"Testados {total_pares} pares de vértices")
+    # graus
+    graus = {v: len(adj) for v, adj in G.items()}
+    degs = sorted(graus.items(), key=lambda x: -x[1])
+    print("Top graus (vértice: grau):", degs[:6])
+
+
+def pares_visiveis(metodo, pontos, obstaculos, max_distancia=None, fontes=None, varredura=None):
+    """Pares visíveis (i, j, dist), com i em `fontes` (todos, por padrão) e i < j.
+
+    `pontos` não deve ter repetições; o resultado sai na ordem de
+    `itertools.combinations(pontos, 2)` quando todas as fontes são pedidas.
+    Com `max_distancia`, só os pares da grade de `pares_proximos` são testados.
+    A varredura só vale para obstáculos disjuntos; se algum se sobrepõe (ou
+    se cruza), os pares saem do kernel vetorizado, que dá o mesmo resultado;
+    a troca é contada em `varredura_substituida` (ver `instrumentos`).
+    """
+    if metodo == 'varredura' and not obstaculos.disjuntos():
+        metodo = 'vetorizado'
+        instrumentos.contar(varredura_substituida=1)
+    if max_distancia:
+        return pares_visiveis_no_raio(metodo, pontos, obstaculos, max_distancia, fontes)
+    if metodo == 'varredura':
+        return pares_visiveis_varredura(pontos, obstaculos, max_distancia, fontes, varredura)
+    if metodo == 'vetorizado':
+        return pares_visiveis_vetorizado(pontos, obstaculos, max_distancia, fontes)
+    return pares_visiveis_forca_bruta(pontos, obstaculos, max_distancia, fontes)
+
+def pares_visiveis_forca_bruta(pontos, obstaculos, max_distancia=None, fontes=None):
+    pares = []
+    for i in (range(len(pontos)) if fontes is None else fontes):
+        for j in range(i + 1, len(pontos)):
+            distancia = math.dist(pontos[i], pontos[j])
+            if max_distancia and distancia > max_distancia:
+                continue
+            if linha_livre(pontos[i], pontos[j], obstaculos):
+                pares.append((i, j, distancia))
+    return pares
+
+def pares_visiveis_no_raio(metodo, pontos, obstaculos, max_distancia, fontes=None):
+    # Candidatos só entre células vizinhas da grade; a varredura sempre olharia todos os pontos,
+    # então aqui ela dá lugar ao kernel vetorizado (mesmo resultado, os dois são exatos)
+    coords = np.array(pontos, dtype=float).reshape(-1, 2)
+    selecionadas = None
+    if fontes is not None:
+        selecionadas = np.zeros(len(pontos), dtype=bool)
+        selecionadas[list(fontes)] = True
+
+    pares = []
+    for ii, jj in pares_proximos(coords, max_distancia):
+        if selecionadas is not None:
+            ii, jj = ii[selecionadas[ii]], jj[selecionadas[ii]]
+        candidatos = [(i, j, math.dist(pontos[i], pontos[j])) for i, j in zip(ii.tolist(), jj.tolist())]
+        candidatos = [(i, j, d) for i, j, d in candidatos if d <= max_distancia]
+        if metodo == 'pares':
+            livres = [linha_livre(pontos[i], pontos[j], obstaculos) for i, j, _ in candidatos]
+        else:
+            livres = segmentos_livres(coords[[i for i, _, _ in candidatos]].reshape(-1, 2),
+                                      coords[[j for _, j, _ in candidatos]].reshape(-1, 2), obstaculos).tolist()
+        pares.extend(par for par, livre in zip(candidatos, livres) if livre)
+    pares.sort()
+    return pares
+
+def pares_k_visiveis(pontos, obstaculos, k, max_distancia=None):
+    """Pares (i, j, dist) ligando cada ponto aos `k` mais próximos que ele enxerga.
+
+    A aresta entra se qualquer uma das pontas a escolheu, então o grau fica
+    em pelo menos min(k, visíveis) e costuma ficar perto de k. Os candidatos
+    vêm de uma grade, em ordem de distância, e são testados em lotes com o
+    kernel vetorizado.
+    """
+    indice = IndiceVertices(pontos)
+    posicao = {v: i for i, v in enumerate(pontos)}
+    escolhidos = set()
+    for i, p in enumerate(pontos):
+        achados, vistos, pedir = 0, 0, 2 * k + 1
+        while achados < k and vistos < len(pontos):
+            lote = indice.k_mais_proximos(p, pedir)[vistos:]
+            vistos += len(lote)
+            # Em ordem de distância: passou do raio uma vez, os seguintes também passam
+            fora_do_raio = bool(max_distancia) and bool(lote) and lote[-1][1] > max_distancia
+            candidatos = [w for w, d in lote if w != p and not (max_distancia and d > max_distancia)]
+            if candidatos:
+                livres = segmentos_livres([p] * len(candidatos), candidatos, obstaculos).tolist()
+                for w, livre in zip(candidatos, livres):
+                    if livre and achados < k:
+                        j = posicao[w]
+                        escolhidos.add((min(i, j), max(i, j)))
+                        achados += 1
+            if fora_do_raio:
+                break
+            pedir *= 2
+    return sorted((i, j, math.dist(pontos[i], pontos[j])) for i, j in escolhidos)
+
+def montar_grafo(pontos, pares, debug=False):
+    # Pares (i, j, dist) com i < j -> dicionário de adjacência
+    G = {v: [] for v in pontos}
+    for i, j, distancia in pares:
+        G[pontos[i]].append((pontos[j], distancia))
+        G[pontos[j]].append((pontos[i], distancia))
+
+    if debug:
+        imprimir_resumo(G, len(pontos), len(pares), len(pontos) * (len(pontos) - 1) // 2)
+
+    return G
+
+
+# =====================================================
+# Grafo de visibilidade reduzido
+# =====================================================
+
+def vertice_convexo(v, cones, bloqueados):
+    # Convexo em todos os polígonos de que faz parte (e fora de qualquer obstáculo)
+    return v not in bloqueados and all(orientacao(v, prox, ant) > 0 for ant, prox in cones.get(v, []))
+
+def bitangente(v, w, cones):
+    # A reta v-w só apoia nos polígonos das duas pontas: os vizinhos no contorno
+    # ficam todos do mesmo lado dela, tanto em v quanto em w
+    for a, b in ((v, w), (w, v)):
+        for ant, prox in cones.get(a, []):
+            o1, o2 = orientacao(a, b, ant), orientacao(a, b, prox)
+            if (o1 > 0 and o2 < 0) or (o1 < 0 and o2 > 0):
+                return False
+    return True
+
+def reduzir_grafo(G, obstaculos, preservar=()):
+    """Reduz um grafo de visibilidade já construído às arestas que podem estar num caminho mínimo.
+
+    Remove os vértices não convexos dos obstáculos (exceto os de `preservar`,
+    ex.: q_start e q_goal) e as arestas que não são tangentes aos obstáculos
+    nas duas pontas. Devolve `(grafo_reduzido, arestas_removidas)`.
+    """
+    if not isinstance(obstaculos, ConjuntoObstaculos):
+        obstaculos = ConjuntoObstaculos(obstaculos)
+    cones, bloqueados = obstaculos.cones(list(G))
+
+    manter = {v for v in G if v in preservar or vertice_convexo(v, cones, bloqueados)}
+    reduzido = {v: [] for v in G if v in manter}
+    removidas = 0
+    for v, vizinhos in G.items():
+        for w, peso in vizinhos:
+            if v in manter and w in manter and bitangente(v, w, cones):
+                reduzido[v].append((w, peso))
+            else:
+                removidas += 1
+    return reduzido, removidas // 2
+
+
+# =====================================================
+# Kernel vetorizado (NumPy)
+# =====================================================
+
+def pares_visiveis_vetorizado(pontos, obstaculos, max_distancia=None, fontes=None, bloco=200_000):
+    # Todos os pares candidatos testados em poucas operações de arrays, em blocos de linhas
+    coords = np.array(pontos, dtype=float).reshape(-1, 2)
+    n = len(pontos)
+    colunas = np.arange(n)
+    fontes = colunas if fontes is None else np.asarray(fontes, dtype=int)
+
+    pares = []
+    linhas = max(1, bloco // max(n, 1))
+    for f0 in range(0, len(fontes), linhas):
+        bloco_fontes = fontes[f0:f0 + linhas]
+        ii, jj = np.nonzero(bloco_fontes[:, None] < colunas)
+        ii = bloco_fontes[ii]
+        if max_distancia:
+            d = np.hypot(*(coords[jj] - coords[ii]).T)
+            perto = d <= max_distancia * (1 + 1e-9)
+            ii, jj = ii[perto], jj[perto]
+        livres = segmentos_livres(coords[ii], coords[jj], obstaculos)
+        for i, j in zip(ii[livres].tolist(), jj[livres].tolist()):
+            distancia = math.dist(pontos[i], pontos[j])
+            if max_distancia and distancia > max_distancia:
+                continue
+            pares.append((i, j, distancia))
+    return pares
+
+
+# =====================================================
+# Varredura rotacional (algoritmo de Lee)
+# =====================================================
+
+def pares_visiveis_varredura(pontos, obstaculos, max_distancia=None, fontes=None, varredura=None):
+    # Uma varredura angular por fonte; cada par é registrado pela fonte de menor índice
+    indice = {v: i for i, v in enumerate(pontos)}
+    if varredura is None:
+        varredura = Varredura(pontos, obstaculos)
+
+    pares = []
+    for i in (range(len(pontos)) if fontes is None else fontes):
+        p = pontos[i]
+        for w in varredura.visiveis(p):
+            j = indice.get(w, -1)
+            if j < i:
+                continue
+            distancia = math.dist(p, w)
+            if max_distancia and distancia > max_distancia:
+                continue
+            pares.append((i, j, distancia))
+    pares.sort()
+    return pares
+
+
+class Varredura:
+    """Arestas e cones dos obstáculos, prontos para varreduras a partir de vários pontos."""
+
+    def __init__(self, pontos, obstaculos):
+        # Todo vértice de obstáculo é um evento da varredura, mesmo que não seja um dos pontos pedidos
+        self.pontos = list(dict.fromkeys(list(pontos) + [v for obst in obstaculos for v in obst]))
+        self.arestas = obstaculos.arestas()
+        self.cones, self.bloqueados = obstaculos.cones(self.pontos)
+        self.vizinhos = {}
+        for a, b in self.arestas:
+            self.vizinhos.setdefault(a, []).append(b)
+            self.vizinhos.setdefault(b, []).append(a)
+
+    def adicionar(self, p, obstaculos):
+        """Inclui o ponto avulso `p` nos eventos das próximas varreduras."""
+        if p in self.vizinhos or p in self.pontos:
+            return
+        dentro, extras = obstaculos.contato(p)
+        if dentro:
+            self.bloqueados.add(p)
+        if extras:
+            self.cones[p] = extras
+        self.pontos.append(p)
+
+    def remover(self, p):
+        """Retira um ponto avulso incluído antes; vértices de obstáculos ficam."""
+        if p in self.vizinhos:
+            return
+        self.pontos.remove(p)
+        self.bloqueados.discard(p)
+        self.cones.pop(p, None)
+
+    def visiveis(self, p):
+        """Pontos visíveis a partir de `p`, numa única varredura angular em torno dele."""
+        if p in self.bloqueados:
+            return []
+
+        # Ordem anti-horária a partir do eixo +x; no mesmo raio, o mais perto primeiro
+        chaves = sorted((_angulo(p, w), w) for w in self.pontos if w != p)
+        if instrumentos.ativo:
+            instrumentos.contar(pares_testados=len(chaves))
+        ordem = [w for _, w in chaves]
+        angulos = [a for (a, _), _ in chaves]
+        for k in range(1, len(ordem)):
+            # atan2 erra por alguns ulps: nos quase empates, reordenar com a orientação exata
+            i = k
+            while i > 0 and angulos[i] - angulos[i - 1] < 1e-9 and _inverter(p, ordem[i - 1], ordem[i]):
+                ordem[i - 1], ordem[i] = ordem[i], ordem[i - 1]
+                angulos[i - 1], angulos[i] = angulos[i], angulos[i - 1]
+                i -= 1
+
+        # Raio atual: de p na direção d, passando pelo ponto w
+        d, w = (1.0, 0.0), None
+
+        def chave(aresta):
+            # Distância (em múltiplos de d) até a aresta ao longo do raio atual
+            a, b = aresta
+            den = d[0] * (b[1] - a[1]) - d[1] * (b[0] - a[0])
+            if den == 0:
+                return (math.inf, 0.0)
+            if w in aresta:
+                # Arestas que partem do próprio w (t = 1): a mais aberta em relação ao raio fica mais perto
+                x = b if a == w else a
+                u = (x[0] - w[0], x[1] - w[1])
+                return (1.0, -math.atan2(abs(d[0] * u[1] - d[1] * u[0]), d[0] * u[0] + d[1] * u[1]))
+            t = ((a[0] - p[0]) * (b[1] - a[1]) - (a[1] - p[1]) * (b[0] - a[0])) / den
+            return (t, 0.0)
+
+        # Arestas que o raio inicial (eixo +x) já atravessa
+        ativas = []
+        for a, b in self.arestas:
+            if p in (a, b):
+                continue
+            ya, yb = a[1] - p[1], b[1] - p[1]
+            if (ya < 0 < yb and orientacao(a, b, p) > 0) or (yb < 0 < ya and orientacao(b, a, p) > 0) \
+                    or (ya == 0 and a[0] > p[0] and yb < 0) or (yb == 0 and b[0] > p[0] and ya < 0):
+                ativas.append(_canonica(a, b))
+        ativas.sort(key=chave)
+
+        visiveis = []
+        anterior, visivel_anterior = None, False
+        for w in ordem:
+            d = (w[0] - p[0], w[1] - p[1])
+            visivel = self._visivel(p, w, anterior, visivel_anterior, ativas, chave)
+            if visivel:
+                visiveis.append(w)
+
+            # Sai quem ficou para trás do raio, entra quem começa em w
+            novas = []
+            for x in self.vizinhos.get(w, []):
+                if x == p:
+                    continue
+                o = orientacao(p, w, x)
+                if o < 0:
+                    try:
+                        ativas.remove(_canonica(w, x))
+                    except ValueError:
+                        pass
+                elif o > 0:
+                    novas.append(_canonica(w, x))
+            for aresta in novas:
+                bisect.insort(ativas, aresta, key=chave)
+
+            anterior, visivel_anterior = w, visivel
+
+        return visiveis
+
+    def _visivel(self, p, w, anterior, visivel_anterior, ativas, chave):
+        if w in self.bloqueados:
+            return False
+
+        # O segmento não pode entrar no polígono de w (nem no de p) logo na ponta
+        if any(entra_no_interior(w, cone, p) for cone in self.cones.get(w, [])):
+            return False
+        if any(entra_no_interior(p, cone, w) for cone in self.cones.get(p, [])):
+            return False
+
+        # Vértice anterior no mesmo raio: w só é visível se ele também for
+        # e se o trecho entre os dois não entrar no polígono dele
+        if anterior is not None and orientacao(p, anterior, w) == 0 \
+                and (anterior[0] - p[0]) * (w[0] - p[0]) + (anterior[1] - p[1]) * (w[1] - p[1]) > 0:
+            if not visivel_anterior:
+                return False
+            if any(entra_no_interior(anterior, cone, w) for cone in self.cones.get(anterior, [])):
+                return False
+
+        # Só as arestas ativas antes de w (t < 1) podem bloquear
+        for aresta in ativas:
+            if chave(aresta)[0] >= 1:
+                break
+            if cruza_propriamente(p, w, *aresta):
+                return False
+        return True
+
+
+def _angulo(p, a):
+    # (ângulo em [0, 2π), distância) de a visto de p
+    dx, dy = a[0] - p[0], a[1] - p[1]
+    ang = math.atan2(dy, dx)
+    return (ang + 2 * math.pi if ang < 0 else ang, math.hypot(dx, dy))
+
+def _inverter(p, a, b):
+    # a está depois de b na ordem angular exata em torno de p?
+    o = orientacao(p, a, b)
+    if o:
+        return o < 0
+    return math.dist(p, a) > math.dist(p, b)
+
+def _canonica(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+# =====================================================
+# Arestas em fluxo
+# =====================================================
+
+def pontos_visibilidade(q_start, q_goal, obstaculos):
+    """Vértices do grafo de visibilidade, sem repetições, na ordem de `grafo_visibilidade`."""
+    return list(dict.fromkeys([q_start, q_goal] + [v for obst in obstaculos for v in obst]))
+
+def arestas_em_fluxo(pontos, obstaculos, metodo='vetorizado', max_distancia=None, fontes_por_bloco=256):
+    """Gera as arestas visíveis em blocos `(i, j, pesos)` de arrays, sem montar o grafo.
+
+    Cada bloco traz os pares (i < j) de `fontes_por_bloco` fontes seguidas,
+    uma vez só cada aresta; a memória fica no tamanho de um bloco mais as
+    estruturas dos obstáculos (com 'varredura', montada uma única vez), não no
+    número total de arestas. Para gravar num arquivo, ver `arestas.gravar_arestas`.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de construção desconhecido: {metodo} (use um de {METODOS})")
+    if not isinstance(obstaculos, ConjuntoObstaculos):
+        obstaculos = ConjuntoObstaculos(obstaculos)
+    varredura = Varredura(pontos, obstaculos) \
+        if metodo == 'varredura' and not max_distancia and obstaculos.disjuntos() else None
+    for f0 in range(0, len(pontos), fontes_por_bloco):
+        fontes = range(f0, min(f0 + fontes_por_bloco, len(pontos)))
+        pares = pares_visiveis(metodo, pontos, obstaculos, max_distancia, fontes, varredura)
+        if pares:
+            i, j, d = zip(*pares)
+            yield np.array(i, dtype=np.int64), np.array(j, dtype=np.int64), np.array(d, dtype=float)
+
+# =====================================================
+# Construção paralela
+# =====================================================
+
+# Estado de cada processo do pool: recebido uma única vez, no início do worker
+_contexto_worker = {}
+
+def _iniciar_worker(metodo, pontos, obstaculos, max_distancia):
+    obstaculos = ConjuntoObstaculos(obstaculos)
+    _contexto_worker.update(
+        metodo=metodo,
+        pontos=pontos,
+        obstaculos=obstaculos,
+        max_distancia=max_distancia,
+        varredura=Varredura(pontos, obstaculos) if metodo == 'varredura' and obstaculos.disjuntos() else None,
+    )
+
+def _pares_do_bloco(fontes):
+    c = _contexto_worker
+    return pares_visiveis(c['metodo'], c['pontos'], c['obstaculos'], c['max_distancia'], fontes, c['varredura'])
+
+def pares_visiveis_paralelo(pontos, obstaculos, max_distancia, metodo, workers, blocos_por_worker=4):
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Fontes intercaladas entre os blocos: a fonte i tem n - i pares, então blocos contíguos ficariam desbalanceados
+    num_blocos = max(1, min(len(pontos), workers * blocos_por_worker))
+    blocos = [range(r, len(pontos), num_blocos) for r in range(num_blocos)]
+
+    dados = (metodo, pontos, [list(obst) for obst in obstaculos], max_distancia)
+    with ProcessPoolExecutor(workers, initializer=_iniciar_worker, initargs=dados) as pool:
+        pares = [par for parte in pool.map(_pares_do_bloco, blocos) for par in parte]
+
+    # Mesma ordem da construção serial, independente de quem terminou primeiro
+    pares.sort()
+    return pares
+
+
+# =====================================================
+# Grafo de visibilidade incremental
+# =====================================================
+
+class GrafoVisibilidade:
+    """Grafo de visibilidade que acompanha mudanças no mapa sem ser refeito do zero.
+
+    `grafo` é o mesmo dicionário de adjacência de `grafo_visibilidade`.
+    Pontos de consulta entram e saem com uma varredura a partir deles
+    (O(n log n)) ou, com `metodo='vetorizado'` (o padrão, que também aceita
+    obstáculos sobrepostos), com uma chamada do kernel; obstáculos novos só derrubam as arestas que cortam e ligam
+    os próprios vértices, e obstáculos removidos só reabrem os pares que
+    eles bloqueavam. Obstáculos são identificados pelo número devolvido em
+    `adicionar_obstaculo` (os iniciais recebem 0, 1, 2, ...).
+    """
+
+    def __init__(self, obstaculos=(), pontos=(), max_distancia=None, metodo='vetorizado'):
+        if metodo not in ('varredura', 'vetorizado'):
+            raise ValueError("O grafo incremental usa os métodos exatos: 'varredura' ou 'vetorizado'")
+        self.max_distancia = max_distancia
+        self.metodo = metodo
+        self.obstaculos = {}
+        for obst in obstaculos:
+            self.obstaculos[len(self.obstaculos)] = [tuple(v) for v in obst]
+        self._proximo_id = len(self.obstaculos)
+        self.livres = list(dict.fromkeys(tuple(p) for p in pontos))
+        self._preparar()
+
+        pontos = self._pontos()
+        pares = pares_visiveis(metodo, pontos, self.conjunto, max_distancia, varredura=self.varredura)
+        self.grafo = montar_grafo(pontos, pares)
+
+    def _pontos(self):
+        return list(dict.fromkeys(self.livres + [v for obst in self.obstaculos.values() for v in obst]))
+
+    def _preparar(self):
+        # Índices dos obstáculos (STRtree, cones, arestas) são imutáveis: refeitos a cada mudança, em O(n log n)
+        self.conjunto = ConjuntoObstaculos(list(self.obstaculos.values()))
+        self.vertices_obstaculos = {v for obst in self.obstaculos.values() for v in obst}
+        # A varredura só é montada se for usada (e só vale para obstáculos disjuntos)
+        self.varredura = Varredura(self._pontos(), self.conjunto) \
+            if self.metodo == 'varredura' and self.conjunto.disjuntos() else None
+
+    def _ligar(self, u, w):
+        distancia = math.dist(u, w)
+        if self.max_distancia and distancia > self.max_distancia:
+            return
+        self.grafo[u].append((w, distancia))
+        self.grafo[w].append((u, distancia))
+
+    def _desligar(self, u, w):
+        self.grafo[u] = [(x, d) for x, d in self.grafo[u] if x != w]
+        self.grafo[w] = [(x, d) for x, d in self.grafo[w] if x != u]
+
+    def _remover_vertice(self, v):
+        for w, _ in self.grafo.pop(v):
+            self.grafo[w] = [(x, d) for x, d in self.grafo[w] if x != v]
+
+    def _ligar_novos(self, novos):
+        # Uma varredura (ou uma chamada do kernel) por vértice novo; pares entre dois novos são ligados só uma vez
+        ordem = {v: k for k, v in enumerate(novos)}
+        for k, v in enumerate(novos):
+            if self.varredura is not None:
+                visiveis = self.varredura.visiveis(v)
+            else:
+                candidatos = [w for w in self.grafo if w != v]
+                livres = segmentos_livres(np.tile(v, (len(candidatos), 1)),
+                                          np.array(candidatos, dtype=float).reshape(-1, 2), self.conjunto)
+                visiveis = [w for w, livre in zip(candidatos, livres.tolist()) if livre]
+            for w in visiveis:
+                if ordem.get(w, k) < k:
+                    continue
+                if w in self.grafo:
+                    self._ligar(v, w)
+
+    def adicionar_ponto(self, p):
+        """Inclui um ponto de consulta (início, objetivo, ...) e liga-o aos pontos visíveis."""
+        p = tuple(p)
+        if p in self.livres:
+            return
+        self.livres.append(p)
+        if p in self.grafo:
+            # Já é vértice de um obstáculo
+            return
+        if self.varredura is not None:
+            self.varredura.adicionar(p, self.conjunto)
+        self.grafo[p] = []
+        self._ligar_novos([p])
+
+    def remover_ponto(self, p):
+        """Retira um ponto de consulta e as arestas dele."""
+        p = tuple(p)
+        if p not in self.livres:
+            raise ValueError(f"O ponto {p} não é um ponto de consulta do grafo")
+        self.livres.remove(p)
+        if p in self.vertices_obstaculos:
+            return
+        if self.varredura is not None:
+            self.varredura.remover(p)
+        self._remover_vertice(p)
+
+    def adicionar_obstaculo(self, obstaculo):
+        """Inclui um obstáculo e devolve o número que o identifica."""
+        obst = [tuple(v) for v in obstaculo]
+
+        # Só as arestas existentes que o novo obstáculo corta deixam de valer
+        arestas = [(u, w) for u in self.grafo for w, _ in self.grafo[u] if u < w]
+        if arestas:
+            livres = segmentos_livres([u for u, _ in arestas], [w for _, w in arestas], [obst])
+            for (u, w), livre in zip(arestas, livres.tolist()):
+                if not livre:
+                    self._desligar(u, w)
+
+        id_obst = self._proximo_id
+        self._proximo_id += 1
+        self.obstaculos[id_obst] = obst
+        self._preparar()
+
+        novos = [v for v in dict.fromkeys(obst) if v not in self.grafo]
+        for v in novos:
+            self.grafo[v] = []
+        self._ligar_novos(novos)
+        return id_obst
+
+    def remover_obstaculo(self, id_obst):
+        """Retira o obstáculo `id_obst` e devolve a lista de vértices dele."""
+        if id_obst not in self.obstaculos:
+            raise ValueError(f"Obstáculo {id_obst} não existe no grafo")
+        obst = self.obstaculos.pop(id_obst)
+        self._preparar()
+
+        restantes = set(self._pontos())
+        for v in dict.fromkeys(obst):
+            if v not in restantes and v in self.grafo:
+                self._remover_vertice(v)
+
+        # Pares reabertos: bloqueados pelo obstáculo retirado e livres entre os que sobraram.
+        # Só os pares cuja caixa envolvente toca a do obstáculo podiam estar bloqueados por ele
+        pontos = list(self.grafo)
+        coords = np.array(pontos, dtype=float).reshape(-1, 2)
+        caixa = np.array(obst, dtype=float).reshape(-1, 2)
+        for ii, jj in _pares_na_caixa(coords, caixa.min(axis=0), caixa.max(axis=0)):
+            if self.max_distancia:
+                perto = np.hypot(*(coords[jj] - coords[ii]).T) <= self.max_distancia * (1 + 1e-9)
+                ii, jj = ii[perto], jj[perto]
+            bloqueados = ~segmentos_livres(coords[ii], coords[jj], [obst])
+            ii, jj = ii[bloqueados], jj[bloqueados]
+            livres = segmentos_livres(coords[ii], coords[jj], self.conjunto)
+            for i, j in zip(ii[livres].tolist(), jj[livres].tolist()):
+                self._ligar(pontos[i], pontos[j])
+        return obst
+
+
+def _pares_na_caixa(coords, minimo, maximo, bloco=200_000):
+    """Blocos `(ii, jj)` dos pares i < j cujo segmento tem caixa envolvente tocando a caixa [minimo, maximo].
+
+    Cada ponto cai numa das 9 regiões em torno da caixa (antes, dentro ou
+    depois, em x e em y); a caixa do segmento só fica longe da caixa quando
+    as duas pontas estão antes (ou depois) dela no mesmo eixo. Os pares são
+    gerados direto das combinações de regiões, sem passar pelos demais.
+    """
+    lado_x = np.where(coords[:, 0] < minimo[0], 0, np.where(coords[:, 0] > maximo[0], 2, 1))
+    lado_y = np.where(coords[:, 1] < minimo[1], 0, np.where(coords[:, 1] > maximo[1], 2, 1))
+    regioes = [np.flatnonzero(lado_x * 3 + lado_y == r) for r in range(9)]
+    for a, b in itertools.combinations_with_replacement(range(9), 2):
+        (ax, ay), (bx, by) = divmod(a, 3), divmod(b, 3)
+        if (ax == bx != 1) or (ay == by != 1) or not len(regioes[a]) or not len(regioes[b]):
+            continue
+        linhas = max(1, bloco // len(regioes[b]))
+        for k in range(0, len(regioes[a]), linhas):
+            ii, jj = np.meshgrid(regioes[a][k:k + linhas], regioes[b], indexing='ij')
+            ii, jj = ii.ravel(), jj.ravel()
+            if a == b:
+                ii, jj = ii[ii < jj], jj[ii < jj]
+            yield np.minimum(ii, jj), np.maximum(ii, jj)
@@ -0,0 +1,328 @@
+import sys
+import math
+import time
+import hashlib
+import argparse
+import numpy as np
+
+from instrumentos import etapa, contar
+from mapa import ler_mapa
+from compacto import GrafoCompacto
+from grafo import pares_visiveis, METODOS
+from geometria import ConjuntoObstaculos, segmentos_livres
+from caminho import MotorCaminhos
+
+# =====================================================
+# Ladrilhos
+# =====================================================
+
+class Ladrilho:
+    """Um retângulo da grade: grafo de visibilidade local e distâncias a partir dos portais.
+
+    Os pontos do grafo são os vértices de obstáculo dentro do retângulo
+    (bordas incluídas) e os portais das suas bordas. Como o retângulo é
+    convexo, um segmento entre dois deles não sai dele, e basta testá-lo
+    contra os obstáculos que tocam o retângulo. `distancias[k, v]` é o
+    menor caminho local do portal `portais[k]` ao vértice `v`.
+    """
+
+    def __init__(self, chave, caixa, obstaculos, portais, grafo, distancias):
+        self.chave = chave
+        self.caixa = caixa
+        self.obstaculos = obstaculos
+        self.portais = portais
+        self.grafo = grafo
+        self.distancias = distancias
+        self._conjunto = None
+        self._motor = None
+
+    @property
+    def conjunto(self):
+        # Preparados só quando o ladrilho recebe a primeira consulta
+        if self._conjunto is None:
+            self._conjunto = ConjuntoObstaculos(self.obstaculos)
+        return self._conjunto
+
+    @property
+    def motor(self):
+        if self._motor is None:
+            self._motor = MotorCaminhos(self.grafo)
+        return self._motor
+
+    def visiveis(self, p):
+        """{id: distância} dos vértices locais que o ponto `p` (dentro do ladrilho) enxerga."""
+        coords = self.grafo.coords
+        if not len(coords):
+            return {}
+        livres = np.flatnonzero(segmentos_livres(np.tile(p, (len(coords), 1)), coords, self.conjunto))
+        d = np.hypot(coords[livres, 0] - p[0], coords[livres, 1] - p[1])
+        return dict(zip(livres.tolist(), d.tolist()))
+
+    def ate_portais(self, visiveis):
+        """Menor distância de um ponto (pelo que ele enxerga) a cada portal, e o vértice de saída."""
+        if not visiveis or not self.portais:
+            return np.full(len(self.portais), math.inf), np.zeros(len(self.portais), dtype=np.int64)
+        ids = np.fromiter(visiveis, dtype=np.int64, count=len(visiveis))
+        d = np.fromiter(visiveis.values(), dtype=float, count=len(visiveis))
+        total = self.distancias[:, ids] + d
+        melhor = np.argmin(total, axis=1)
+        return total[np.arange(len(self.portais)), melhor], ids[melhor]
+
+def _construir_ladrilho(pontos, portais, obstaculos, metodo):
+    # Roda num processo do pool (ou direto, com workers=1): grafo local e Dijkstra de cada portal
+    conjunto = ConjuntoObstaculos(obstaculos)
+    grafo = GrafoCompacto.de_pares(pontos, pares_visiveis(metodo, pontos, conjunto))
+    motor = MotorCaminhos(grafo, max_arvores=1)
+    distancias = np.full((len(portais), len(grafo)), math.inf)
+    for k, p in enumerate(portais):
+        for v, d in motor.distancias(p).items():
+            distancias[k, grafo.ids[v]] = d
+    return grafo, distancias
+
+# =====================================================
+# Planejador hierárquico
+# =====================================================
+
+class PlanejadorHierarquico:
+    """Planejamento em dois níveis para mapas grandes demais para um único grafo de visibilidade.
+
+    O mapa é dividido numa grade de ladrilhos de lado `tamanho`. Cada
+    ladrilho tem o seu grafo de visibilidade local (construídos em paralelo
+    com `workers > 1`), e os ladrilhos vizinhos se ligam por portais:
+    pontos espaçados de até `passo_portal` nos trechos livres de cada borda
+    compartilhada. O grafo abstrato tem os portais como vértices e, como
+    arestas, os menores caminhos locais entre portais de um mesmo ladrilho.
+
+    Uma consulta liga início e fim aos portais dos seus ladrilhos, busca no
+    grafo abstrato, expande cada aresta abstrata no caminho local do seu
+    ladrilho e encurta o resultado com atalhos visíveis. O caminho é válido
+    mas não necessariamente o mínimo: ele cruza as bordas só pelos portais.
+
+    `atualizar(obstaculos)` reconstrói só os ladrilhos cujo conteúdo
+    (obstáculos que os tocam e portais das bordas) mudou.
+    """
+
+    def __init__(self, q_start, q_goal, obstaculos, tamanho=None, passo_portal=None, metodo='vetorizado', workers=1):
+        if metodo not in METODOS:
+            raise ValueError(f"Método de construção desconhecido: {metodo} (use um de {METODOS})")
+        pontos = np.array([q_start, q_goal] + [v for obst in obstaculos for v in obst], dtype=float)
+        (self.x0, self.y0), (x1, y1) = pontos.min(axis=0), pontos.max(axis=0)
+        extensao = max(x1 - self.x0, y1 - self.y0) or 1.0
+        self.tamanho = tamanho or extensao / 4
+        self.passo_portal = passo_portal or self.tamanho / 4
+        # A grade cobre a caixa do mapa; caminhos mínimos entre pontos dela nunca saem dela
+        self.nx = max(1, math.ceil((x1 - self.x0) / self.tamanho))
+        self.ny = max(1, math.ceil((y1 - self.y0) / self.tamanho))
+        self.metodo = metodo
+        self.workers = workers
+        self.ladrilhos = {}
+        self._assinaturas = {}
+        self.atualizar(obstaculos)
+
+    @classmethod
+    def de_arquivo(cls, arquivo, **parametros):
+        q_start, q_goal, obstaculos = ler_mapa(arquivo)
+        return cls(q_start, q_goal, obstaculos, **parametros)
+
+    # ---------- construção ----------
+
+    def _caixa(self, i, j):
+        # Calculada pelos índices das duas bordas: ladrilhos vizinhos têm exatamente a mesma borda
+        t = self.tamanho
+        return self.x0 + i * t, self.y0 + j * t, self.x0 + (i + 1) * t, self.y0 + (j + 1) * t
+
+    def _ladrilho_de(self, p):
+        x, y = p
+        x1, y1 = self.x0 + self.nx * self.tamanho, self.y0 + self.ny * self.tamanho
+        if not (self.x0 <= x <= x1 and self.y0 <= y <= y1):
+            raise ValueError(f"Ponto fora da grade do mapa: {p}")
+        i = min(int((x - self.x0) // self.tamanho), self.nx - 1)
+        j = min(int((y - self.y0) // self.tamanho), self.ny - 1)
+        return i, j
+
+    def _portais_da_borda(self, borda, livre):
+        # Pontos no interior de cada trecho livre da borda; as pontas dos trechos tocam obstáculos
+        (ax, ay), (bx, by) = borda
+        portais = []
+        for trecho in livre:
+            (px, py), (qx, qy) = trecho.coords[0], trecho.coords[-1]
+            n = max(1, math.ceil(trecho.length / self.passo_portal))
+            for k in range(n):
+                t = (k + 0.5) / n
+                x, y = px + t * (qx - px), py + t * (qy - py)
+                # Exatamente sobre a reta da borda: o mesmo ponto nos dois ladrilhos
+                portais.append((ax, y) if ax == bx else (x, ay))
+        return portais
+
+    def _bordas(self):
+        # {(ladrilho, ladrilho vizinho): segmento da borda compartilhada}
+        bordas = {}
+        for i in range(self.nx):
+            for j in range(self.ny):
+                x0, y0, x1, y1 = self._caixa(i, j)
+                if i + 1 < self.nx:
+                    bordas[(i, j), (i + 1, j)] = ((x1, y0), (x1, y1))
+                if j + 1 < self.ny:
+                    bordas[(i, j), (i, j + 1)] = ((x0, y1), (x1, y1))
+        return bordas
+
+    def atualizar(self, obstaculos):
+        """Troca os obstáculos e reconstrói só os ladrilhos afetados; devolve as chaves deles."""
+        import shapely
+        import shapely.geometry
+
+        self.obstaculos = [list(map(tuple, obst)) for obst in obstaculos]
+        self.conjunto = ConjuntoObstaculos(self.obstaculos)
+        poligonos = [shapely.geometry.Polygon(obst) for obst in self.obstaculos]
+        arvore = shapely.STRtree(poligonos)
+
+        with etapa('portais'):
+            portais = {(i, j): [] for i in range(self.nx) for j in range(self.ny)}
+            for (a, b), borda in self._bordas().items():
+                linha = shapely.geometry.LineString(borda)
+                tocados = [poligonos[k] for k in arvore.query(linha, predicate='intersects')]
+                livre = linha.difference(shapely.union_all(tocados)) if tocados else linha
+                trechos = [g for g in getattr(livre, 'geoms', [livre]) if g.geom_type == 'LineString' and g.length > 0]
+                novos = self._portais_da_borda(borda, trechos)
+                portais[a] += novos
+                portais[b] += novos
+
+        vertices = np.array([v for obst in self.obstaculos for v in obst], dtype=float).reshape(-1, 2)
+        tarefas = {}
+        for chave in portais:
+            x0, y0, x1, y1 = caixa = self._caixa(*chave)
+            tocados = sorted(arvore.query(shapely.geometry.box(*caixa), predicate='intersects').tolist())
+            locais = [self.obstaculos[k] for k in tocados]
+            dentro = (vertices[:, 0] >= x0) & (vertices[:, 0] <= x1) & (vertices[:, 1] >= y0) & (vertices[:, 1] <= y1)
+            pontos = list(dict.fromkeys([tuple(v) for v in vertices[dentro].tolist()] + portais[chave]))
+            assinatura = hashlib.sha256(repr((locais, portais[chave])).encode()).hexdigest()
+            if self._assinaturas.get(chave) != assinatura:
+                self._assinaturas[chave] = assinatura
+                tarefas[chave] = (pontos, portais[chave], locais, self.metodo)
+
+        with etapa('ladrilhos', reconstruidos=len(tarefas)):
+            if self.workers > 1 and len(tarefas) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(self.workers) as pool:
+                    resultados = pool.map(_construir_ladrilho, *zip(*tarefas.values()))
+                    prontos = dict(zip(tarefas, resultados))
+            else:
+                prontos = {chave: _construir_ladrilho(*dados) for chave, dados in tarefas.items()}
+            for chave, (grafo, distancias) in prontos.items():
+                _, portais_locais, locais, _ = tarefas[chave]
+                self.ladrilhos[chave] = Ladrilho(chave, self._caixa(*chave), locais, portais_locais, grafo, distancias)
+            contar(vertices_locais=sum(len(g) for g, _ in prontos.values()))
+
+        with etapa('grafo_abstrato'):
+            self._montar_abstrato()
+        return sorted(tarefas)
+
+    def _montar_abstrato(self):
+        # Arestas portal-portal pelo menor caminho local; um par na borda de dois ladrilhos fica com o menor
+        melhores = {}
+        for chave, ladrilho in self.ladrilhos.items():
+            ids = [ladrilho.grafo.ids[p] for p in ladrilho.portais]
+            for a, p in enumerate(ladrilho.portais):
+                for b in range(a + 1, len(ladrilho.portais)):
+                    d = ladrilho.distancias[a, ids[b]]
+                    par = (p, ladrilho.portais[b]) if p < ladrilho.portais[b] else (ladrilho.portais[b], p)
+                    if d < math.inf and d < melhores.get(par, (math.inf,))[0]:
+                        melhores[par] = (d, chave)
+        portais = sorted({p for ladrilho in self.ladrilhos.values() for p in ladrilho.portais})
+        indice = {p: i for i, p in enumerate(portais)}
+        self._origem = {par: chave for par, (_, chave) in melhores.items()}
+        self.abstrato = GrafoCompacto.de_pares(portais, [(indice[p], indice[q], d) for (p, q), (d, _) in melhores.items()])
+        self._motor = MotorCaminhos(self.abstrato)
+
+    # ---------- consultas ----------
+
+    def _ligar(self, p):
+        # Ladrilho do ponto, vértices locais visíveis e distância/vértice de saída até cada portal
+        ladrilho = self.ladrilhos[self._ladrilho_de(p)]
+        visiveis = ladrilho.visiveis(p)
+        distancias, saidas = ladrilho.ate_portais(visiveis)
+        ids = self.abstrato.ids
+        portais = {ids[q]: d for q, d in zip(ladrilho.portais, distancias.tolist()) if d < math.inf}
+        return ladrilho, visiveis, portais, dict(zip(ladrilho.portais, saidas.tolist()))
+
+    def _trecho_local(self, ladrilho, p, q):
+        caminho, _ = ladrilho.motor.buscar(p, q)
+        return caminho
+
+    def _atalhos(self, caminho):
+        # Do ponto atual, pula direto para o mais distante do caminho que ele enxerga
+        resultado = [caminho[0]]
+        i = 0
+        while i < len(caminho) - 1:
+            resto = caminho[i + 1:]
+            livres = segmentos_livres([caminho[i]] * len(resto), resto, self.conjunto)
+            i += 1 + int(np.flatnonzero(livres)[-1]) if livres.any() else 1
+            resultado.append(caminho[i])
+        return resultado
+
+    def planejar(self, inicio, fim):
+        """Menor caminho aproximado de `inicio` a `fim`: `(caminho, distancia)`, ou `(None, 0)`."""
+        inicio, fim = tuple(map(float, inicio)), tuple(map(float, fim))
+        if segmentos_livres([inicio], [fim], self.conjunto)[0]:
+            return ([inicio] if inicio == fim else [inicio, fim]), math.dist(inicio, fim)
+
+        la, vis_a, saidas, sai_a = self._ligar(inicio)
+        lb, vis_b, chegadas, sai_b = self._ligar(fim)
+        candidatos = []
+        if la is lb:
+            # Mesmo ladrilho: o caminho só por dentro dele também concorre
+            local, d = la.motor.buscar_pontos(inicio, fim, vis_a, vis_b)
+            if local is not None:
+                candidatos.append((d, local))
+
+        abstrato, d = self._motor.buscar_pontos(inicio, fim, saidas, chegadas)
+        if abstrato is not None:
+            # Sem as pontas (a não ser que início ou fim caiam sobre um portal)
+            portais = [p for p in abstrato if p in self.abstrato.ids]
+            refinado = [inicio]
+            refinado += self._trecho_local(la, la.grafo.vertices[sai_a[portais[0]]], portais[0])
+            for p, q in zip(portais, portais[1:]):
+                origem = self.ladrilhos[self._origem[(p, q) if p < q else (q, p)]]
+                refinado += self._trecho_local(origem, p, q)[1:]
+            refinado += self._trecho_local(lb, portais[-1], lb.grafo.vertices[sai_b[portais[-1]]])[1:]
+            refinado.append(fim)
+            candidatos.append((d, [p for k, p in enumerate(refinado) if k == 0 or p != refinado[k - 1]]))
+
+        if not candidatos:
+            return None, 0
+        _, caminho = min(candidatos, key=lambda c: c[0])
+        caminho = self._atalhos(caminho)
+        return caminho, sum(math.dist(a, b) for a, b in zip(caminho, caminho[1:]))
+
+    def planejar_lote(self, consultas):
+        """Lista de `(caminho, distancia)`, uma por par (início, fim), como em `lote.Planejador`."""
+        return [self.planejar(inicio, fim) for inicio, fim in consultas]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Planejamento hierárquico por ladrilhos")
+    parser.add_argument('mapa')
+    parser.add_argument('--tamanho', type=float, help="lado de cada ladrilho (padrão: 1/4 da extensão do mapa)")
+    parser.add_argument('--passo-portal', type=float, help="espaçamento máximo dos portais (padrão: tamanho / 4)")
+    parser.add_argument('--metodo', default='vetorizado', help="método dos grafos locais (ver grafo.METODOS)")
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    q_start, q_goal, obstaculos = ler_mapa(args.mapa)
+    inicio = time.perf_counter()
+    planejador = PlanejadorHierarquico(q_start, q_goal, obstaculos, args.tamanho, args.passo_portal,
+                                       args.metodo, args.workers)
+    construcao = time.perf_counter() - inicio
+    vertices = sum(len(l.grafo) for l in planejador.ladrilhos.values())
+    print(f"{len(planejador.ladrilhos)} ladrilhos ({planejador.nx} x {planejador.ny}) em {construcao:.2f} s: "
+          f"{vertices} vértices locais, {len(planejador.abstrato)} portais, "
+          f"{planejador.abstrato.num_arestas} arestas abstratas", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    caminho, distancia = planejador.planejar(q_start, q_goal)
+    consulta = time.perf_counter() - inicio
+    if caminho is None:
+        print(f"Nenhum caminho de {q_start} a {q_goal} ({consulta * 1000:.1f} ms)")
+    else:
+        print(f"Caminho de {q_start} a {q_goal}: {len(caminho)} vértices, distância {distancia:.2f} "
+              f"({consulta * 1000:.1f} ms)")
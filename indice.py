@@ -0,0 +1,281 @@
+import math
+import heapq
+import numpy as np
+
+from geometria import ConjuntoObstaculos, segmentos_livres
+
+class IndiceVertices:
+    """Vértices de um grafo ou árvore numa grade uniforme, para buscas por proximidade.
+
+    Construído uma vez (O(n)) a partir do dicionário de adjacência, de uma
+    lista de arestas (u, v, peso) ou de uma lista de pontos. As consultas
+    olham só as células em volta do ponto, em anéis cada vez maiores, até
+    que nenhuma célula ainda não vista possa ter algo mais perto.
+
+    Com `obstaculos`, `mais_proximo(p, visivel=True)` devolve o vértice mais
+    próximo que `p` enxerga em linha reta.
+    """
+
+    def __init__(self, vertices, obstaculos=None, por_celula=2):
+        if isinstance(vertices, dict):
+            vertices = list(vertices)
+        elif vertices and len(vertices[0]) == 3:
+            vertices = [v for (a, b, _) in vertices for v in (a, b)]
+        self.vertices = list(dict.fromkeys(tuple(v) for v in vertices))
+        if not self.vertices:
+            raise ValueError("Nenhum vértice para indexar")
+        coords = np.array(self.vertices, dtype=float).reshape(-1, 2)
+
+        if obstaculos is not None and not isinstance(obstaculos, ConjuntoObstaculos):
+            obstaculos = ConjuntoObstaculos(obstaculos)
+        self.obstaculos = obstaculos
+
+        # Célula com ~por_celula vértices em média
+        n = len(self.vertices)
+        self.origem = coords.min(axis=0)
+        extensao = coords.max(axis=0) - self.origem
+        area = extensao[0] * extensao[1]
+        if area > 0:
+            self.lado = math.sqrt(area * por_celula / n)
+        else:
+            self.lado = max(extensao.max() * por_celula / n, 1e-9) if extensao.max() > 0 else 1.0
+
+        celulas = np.floor((coords - self.origem) / self.lado).astype(np.int64)
+        self.minimo = (0, 0)
+        self.maximo = tuple(celulas.max(axis=0).tolist())
+        self.celulas = {}
+        self._grade_lote = None
+        for i, (cx, cy) in enumerate(celulas.tolist()):
+            self.celulas.setdefault((cx, cy), []).append(i)
+
+    def adicionar(self, v):
+        """Inclui um vértice novo no índice (O(1)); devolve o índice dele em `vertices`."""
+        v = tuple(v)
+        cx, cy = self._celula(v)
+        self.vertices.append(v)
+        self.celulas.setdefault((cx, cy), []).append(len(self.vertices) - 1)
+        self.minimo = (min(self.minimo[0], cx), min(self.minimo[1], cy))
+        self.maximo = (max(self.maximo[0], cx), max(self.maximo[1], cy))
+        return len(self.vertices) - 1
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def _celula(self, p):
+        return (math.floor((p[0] - self.origem[0]) / self.lado),
+                math.floor((p[1] - self.origem[1]) / self.lado))
+
+    def _aneis(self, p):
+        # (r, índices) dos anéis de células a distância de Chebyshev r da célula de p, só os que cruzam a grade
+        cx, cy = self._celula(p)
+        (x0, y0), (x1, y1) = self.minimo, self.maximo
+        r = max(0, x0 - cx, cx - x1, y0 - cy, cy - y1)
+        r_max = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+        while r <= r_max:
+            indices = []
+            for dx in range(-r, r + 1):
+                passo = 1 if abs(dx) == r else 2 * r
+                for dy in range(-r, r + 1, max(passo, 1)):
+                    indices += self.celulas.get((cx + dx, cy + dy), ())
+            yield r, indices
+            r += 1
+
+    def _k_indices(self, p, k):
+        # [(distância, índice)] dos k mais próximos, em ordem crescente
+        k = min(k, len(self.vertices))
+        # (-distância, -índice): o pior dos k melhores no topo; empates decididos pelo índice, para
+        # que os k mais próximos sejam sempre o começo da lista dos k + 1 mais próximos
+        heap = []
+        for r, indices in self._aneis(p):
+            for i in indices:
+                x, y = self.vertices[i]
+                d = math.hypot(x - p[0], y - p[1])
+                if len(heap) < k:
+                    heapq.heappush(heap, (-d, -i))
+                elif (-d, -i) > heap[0]:
+                    heapq.heapreplace(heap, (-d, -i))
+            # Células a partir do próximo anel ficam a pelo menos r * lado de p
+            if len(heap) == k and -heap[0][0] < r * self.lado:
+                break
+        return sorted((-d, -i) for d, i in heap)
+
+    def k_mais_proximos(self, p, k=1):
+        """Os `k` vértices mais próximos de `p`: lista de (vértice, distância), do mais perto ao mais longe."""
+        return [(self.vertices[i], d) for d, i in self._k_indices(p, k)]
+
+    def no_raio(self, p, raio):
+        """Vértices a no máximo `raio` de `p`: lista de (vértice, distância), do mais perto ao mais longe."""
+        (x0, y0), (x1, y1) = self._celula((p[0] - raio, p[1] - raio)), self._celula((p[0] + raio, p[1] + raio))
+        indices = []
+        for cx in range(max(x0, self.minimo[0]), min(x1, self.maximo[0]) + 1):
+            for cy in range(max(y0, self.minimo[1]), min(y1, self.maximo[1]) + 1):
+                indices += self.celulas.get((cx, cy), ())
+        if not indices:
+            return []
+        indices = np.array(indices)
+        coords = np.array([self.vertices[i] for i in indices.tolist()])
+        d = np.hypot(coords[:, 0] - p[0], coords[:, 1] - p[1])
+        dentro = np.flatnonzero(d <= raio)
+        dentro = dentro[np.argsort(d[dentro], kind='stable')]
+        return [(self.vertices[i], float(d[j])) for i, j in zip(indices[dentro].tolist(), dentro.tolist())]
+
+    def mais_proximo(self, p, visivel=False):
+        """Vértice mais próximo de `p`; com `visivel`, o mais próximo sem obstáculo no caminho (ou None)."""
+        if not visivel:
+            return self.k_mais_proximos(p, 1)[0][0]
+        if self.obstaculos is None:
+            raise ValueError("Busca com visibilidade exige os obstáculos no índice")
+
+        # Candidatos em ordem de distância, testados em lotes cada vez maiores
+        testados, k = 0, 8
+        while testados < len(self.vertices):
+            candidatos = [v for v, _ in self.k_mais_proximos(p, k)[testados:]]
+            livres = segmentos_livres([p] * len(candidatos), candidatos, self.obstaculos)
+            if livres.any():
+                return candidatos[int(np.argmax(livres))]
+            testados, k = testados + len(candidatos), 2 * k
+        return None
+
+    def _grade(self):
+        # Vértices ordenados por célula (estilo CSR), para as consultas em lote; refeita se o índice cresceu
+        if self._grade_lote is None or self._grade_lote[0] != len(self.vertices):
+            coords = np.array(self.vertices, dtype=float).reshape(-1, 2)
+            celulas = np.floor((coords - self.origem) / self.lado).astype(np.int64)
+            (x0, y0), (_, y1) = self.minimo, self.maximo
+            chaves = (celulas[:, 0] - x0) * (y1 - y0 + 1) + (celulas[:, 1] - y0)
+            ordem = np.argsort(chaves, kind='stable')
+            ocupadas, inicio, quantos = np.unique(chaves[ordem], return_index=True, return_counts=True)
+            self._grade_lote = (len(self.vertices), coords, ordem, ocupadas, inicio, quantos)
+        return self._grade_lote[1:]
+
+    def consultar_lote(self, pontos, k=1):
+        """k vizinhos de cada ponto: arrays (distancias, indices) de forma (m, k), índices em `self.vertices`.
+
+        A mesma busca em anéis de `k_mais_proximos`, vetorizada: a cada
+        rodada, todos os pontos ainda em aberto olham o seu próximo anel de
+        uma vez, e os candidatos são incorporados aos k melhores com uma
+        única ordenação.
+        """
+        k = min(k, len(self.vertices))
+        pontos = np.asarray(pontos, dtype=float).reshape(-1, 2)
+        m = len(pontos)
+        coords, ordem, ocupadas, inicio, quantos = self._grade()
+        (x0, y0), (x1, y1) = self.minimo, self.maximo
+        largura = y1 - y0 + 1
+
+        celulas = np.floor((pontos - self.origem) / self.lado).astype(np.int64)
+        cx, cy = celulas[:, 0], celulas[:, 1]
+        # Primeiro anel que cruza a grade e último que ainda tem células dela, como em _aneis
+        r = np.maximum.reduce([np.zeros(m, dtype=np.int64), x0 - cx, cx - x1, y0 - cy, cy - y1])
+        r_max = np.maximum.reduce([cx - x0, x1 - cx, cy - y0, y1 - cy])
+        distancias = np.full((m, k), np.inf)
+        indices = np.full((m, k), -1, dtype=np.int64)
+
+        abertos = np.flatnonzero(r <= r_max)
+        while len(abertos):
+            # Células dos anéis de todos os pontos em aberto (pares ponto, célula), agrupados pelo raio
+            donos, gx, gy = [], [], []
+            for raio in np.unique(r[abertos]).tolist():
+                grupo = abertos[r[abertos] == raio]
+                dx, dy = _anel(raio)
+                donos.append(np.repeat(grupo, len(dx)))
+                gx.append((cx[grupo, None] + dx).ravel())
+                gy.append((cy[grupo, None] + dy).ravel())
+            donos, gx, gy = np.concatenate(donos), np.concatenate(gx), np.concatenate(gy)
+            na_grade = (gx >= x0) & (gx <= x1) & (gy >= y0) & (gy <= y1)
+            donos, chaves = donos[na_grade], (gx[na_grade] - x0) * largura + (gy[na_grade] - y0)
+            pos = np.minimum(np.searchsorted(ocupadas, chaves), max(len(ocupadas) - 1, 0))
+            achou = ocupadas[pos] == chaves
+            donos, pos = donos[achou], pos[achou]
+
+            # Um par (ponto, vértice) para cada vértice das células encontradas
+            n = quantos[pos]
+            donos = np.repeat(donos, n)
+            deslocamento = np.arange(len(donos)) - np.repeat(np.cumsum(n) - n, n)
+            candidatos = ordem[np.repeat(inicio[pos], n) + deslocamento]
+            d = np.hypot(coords[candidatos, 0] - pontos[donos, 0], coords[candidatos, 1] - pontos[donos, 1])
+            # Quem já fica atrás do k-ésimo melhor atual não entra na ordenação
+            perto = d <= distancias[donos, k - 1]
+            donos, candidatos, d = donos[perto], candidatos[perto], d[perto]
+
+            # Junta com os k melhores atuais e fica com os k primeiros por (distância, índice) de cada ponto
+            atuais = indices[abertos] >= 0
+            donos = np.concatenate([np.broadcast_to(abertos[:, None], atuais.shape)[atuais], donos])
+            d = np.concatenate([distancias[abertos][atuais], d])
+            candidatos = np.concatenate([indices[abertos][atuais], candidatos])
+            ordem_lote = np.lexsort((candidatos, d, donos))
+            donos, d, candidatos = donos[ordem_lote], d[ordem_lote], candidatos[ordem_lote]
+            primeiro = np.searchsorted(donos, donos, side='left')
+            posicao = np.arange(len(donos)) - primeiro
+            fica = posicao < k
+            distancias[donos[fica], posicao[fica]] = d[fica]
+            indices[donos[fica], posicao[fica]] = candidatos[fica]
+
+            # Células a partir do próximo anel ficam a pelo menos r * lado do ponto
+            completo = distancias[abertos, k - 1] < r[abertos] * self.lado
+            r[abertos] += 1
+            abertos = abertos[~completo & (r[abertos] <= r_max[abertos])]
+        return distancias, indices
+
+def _anel(r):
+    # Deslocamentos (dx, dy) das células a distância de Chebyshev exatamente r
+    if r == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    lado = np.arange(-r, r + 1)
+    meio = np.arange(-r + 1, r)
+    dx = np.concatenate([lado, lado, np.full(len(meio), -r), np.full(len(meio), r)])
+    dy = np.concatenate([np.full(len(lado), -r), np.full(len(lado), r), meio, meio])
+    return dx, dy
+
+# Células vizinhas visitadas a partir de cada célula: metade do entorno, para cada par de células sair uma vez só
+_METADE_VIZINHANCA = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+def pares_proximos(pontos, raio, bloco=1_000_000):
+    """Pares (i, j), i < j, com pontos a no máximo `raio`, em blocos de arrays (ii, jj).
+
+    Os pontos vão para uma grade de lado `raio`: só pares na mesma célula ou
+    em células vizinhas são gerados, então o custo acompanha o número de
+    pares próximos, não V². A distância é filtrada com uma pequena folga
+    (1e-9 relativo); quem usa confere a distância exata.
+    """
+    coords = np.asarray(pontos, dtype=float).reshape(-1, 2)
+    if len(coords) < 2:
+        return
+    celulas = np.floor((coords - coords.min(axis=0)) / raio).astype(np.int64) + 1
+    largura = int(celulas[:, 1].max()) + 2
+    chave = celulas[:, 0] * largura + celulas[:, 1]
+    ordem = np.argsort(chave, kind='stable')
+    ocupadas, inicio, quantos = np.unique(chave[ordem], return_index=True, return_counts=True)
+
+    # Pares de células (a, b) ocupadas e vizinhas
+    ca, cb = [], []
+    for dx, dy in _METADE_VIZINHANCA:
+        alvo = ocupadas + dx * largura + dy
+        pos = np.minimum(np.searchsorted(ocupadas, alvo), len(ocupadas) - 1)
+        existe = ocupadas[pos] == alvo
+        ca.append(np.flatnonzero(existe))
+        cb.append(pos[existe])
+    ca, cb = np.concatenate(ca), np.concatenate(cb)
+    total = quantos[ca] * quantos[cb]
+
+    # Blocos de pares de células com no máximo ~`bloco` pares de pontos cada
+    limites = np.searchsorted(np.cumsum(total), np.arange(bloco, total.sum() + bloco, bloco), side='right')
+    anterior = 0
+    for limite in np.unique(np.append(limites, len(ca))):
+        if limite <= anterior:
+            continue
+        a, b, t = ca[anterior:limite], cb[anterior:limite], total[anterior:limite]
+        anterior = limite
+        par = np.repeat(np.arange(len(a)), t)
+        local = np.arange(t.sum()) - np.repeat(np.cumsum(t) - t, t)
+        ia = ordem[inicio[a][par] + local // quantos[b][par]]
+        ib = ordem[inicio[b][par] + local % quantos[b][par]]
+
+        # Na mesma célula cada par aparece duas vezes (e cada ponto consigo mesmo)
+        mesma = a[par] == b[par]
+        ok = ~mesma | (ia < ib)
+        ia, ib = ia[ok], ib[ok]
+        d = np.hypot(coords[ia, 0] - coords[ib, 0], coords[ia, 1] - coords[ib, 1])
+        perto = d <= raio * (1 + 1e-9)
+        ia, ib = ia[perto], ib[perto]
+        yield np.minimum(ia, ib), np.maximum(ia, ib)
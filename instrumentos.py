@@ -0,0 +1,165 @@
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Desligado enquanto ninguém registra um gancho: `etapa` e `contar` voltam logo na primeira linha,
+# e os laços internos só consultam este flag depois de terminar, nunca a cada iteração
+ativo = False
+
+_ganchos = []
+_memoria = 0
+_local = threading.local()
+
+def registrar(gancho, memoria=False):
+    """Passa a chamar `gancho(nome, dados)` ao fim de cada etapa.
+
+    `dados` traz `tempo_s`, `rss_max_bytes` (pico do processo até ali), os
+    contadores da etapa e, com `memoria=True`, `pico_bytes`: o pico
+    alocado durante a etapa, pelo tracemalloc (que deixa o código bem mais
+    lento; só enquanto algum gancho pedir).
+    """
+    global ativo, _memoria
+    _ganchos.append((gancho, memoria))
+    _memoria += memoria
+    ativo = True
+
+def remover(gancho):
+    global ativo, _memoria
+    for k, (g, memoria) in enumerate(_ganchos):
+        if g is gancho:
+            del _ganchos[k]
+            _memoria -= memoria
+            break
+    ativo = bool(_ganchos)
+
+@contextmanager
+def coletando(gancho=None, memoria=False):
+    """Registra `gancho` (um `Relatorio` novo, por padrão) durante o bloco e o devolve."""
+    gancho = Relatorio() if gancho is None else gancho
+    registrar(gancho, memoria)
+    try:
+        yield gancho
+    finally:
+        remover(gancho)
+
+def contar(**valores):
+    """Soma os valores aos contadores da etapa aberta mais interna (nada, se não houver)."""
+    if not ativo:
+        return
+    abertas = getattr(_local, 'abertas', None)
+    if abertas:
+        contadores = abertas[-1]['contadores']
+        for nome, valor in valores.items():
+            contadores[nome] = contadores.get(nome, 0) + valor
+
+@contextmanager
+def etapa(nome, **info):
+    """Mede o bloco como a etapa `nome`; `info` vai junto para os ganchos.
+
+    Etapas podem ser aninhadas: cada uma é reportada ao terminar, com os
+    contadores feitos enquanto era a mais interna e `pai` com o nome da de
+    fora. Trabalho feito em outros processos (ex.: `workers > 1`) não é contado.
+    """
+    if not ativo:
+        yield
+        return
+
+    abertas = getattr(_local, 'abertas', None)
+    if abertas is None:
+        abertas = _local.abertas = []
+
+    # Memória: picos absolutos do tracemalloc; ao abrir uma etapa o pico é zerado,
+    # então o que já se viu até ali fica guardado na etapa de fora
+    memoria = _memoria > 0
+    iniciou = False
+    base = 0
+    if memoria:
+        if tracemalloc.is_tracing():
+            base, pico = tracemalloc.get_traced_memory()
+            if abertas and abertas[-1]['maior'] is not None:
+                abertas[-1]['maior'] = max(abertas[-1]['maior'], pico)
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+            iniciou = True
+
+    atual = {'nome': nome, 'contadores': {}, 'maior': base if memoria else None}
+    abertas.append(atual)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempo = time.perf_counter() - inicio
+        abertas.pop()
+        dados = {'tempo_s': tempo, **info, **atual['contadores']}
+        if abertas:
+            dados['pai'] = abertas[-1]['nome']
+        if memoria and tracemalloc.is_tracing():
+            _, pico = tracemalloc.get_traced_memory()
+            maior = max(atual['maior'], pico)
+            dados['pico_bytes'] = maior - base
+            if abertas and abertas[-1]['maior'] is not None:
+                abertas[-1]['maior'] = max(abertas[-1]['maior'], maior)
+            if iniciou:
+                tracemalloc.stop()
+        if resource is not None:
+            # ru_maxrss vem em KiB no Linux e em bytes no macOS
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            dados['rss_max_bytes'] = rss if sys.platform == 'darwin' else rss * 1024
+        for gancho, _ in list(_ganchos):
+            gancho(nome, dados)
+
+class Relatorio:
+    """Gancho que guarda as etapas na ordem em que terminam, para virar JSON ou uma tabela."""
+
+    def __init__(self):
+        self.etapas = []
+
+    def __call__(self, nome, dados):
+        self.etapas.append({'etapa': nome, **dados})
+
+    def total(self, nome):
+        """Soma dos tempos das etapas `nome`."""
+        return sum(e['tempo_s'] for e in self.etapas if e['etapa'] == nome)
+
+    def json(self, **extra):
+        return json.dumps({**extra, 'etapas': self.etapas}, indent=2, ensure_ascii=False)
+
+    def salvar(self, arquivo, **extra):
+        with open(arquivo, 'w') as f:
+            f.write(self.json(**extra) + '\n')
+
+    def tabela(self):
+        """Uma linha por etapa: cada uma logo depois da etapa de fora, recuada pelo nível."""
+        # Uma etapa termina depois das de dentro: as já terminadas, ainda sem pai, que apontam para ela são dela
+        soltas, raizes = [], []
+        for e in self.etapas:
+            no = (e, [f for f in soltas if f[0]['pai'] == e['etapa']])
+            soltas = [f for f in soltas if f[0]['pai'] != e['etapa']]
+            (soltas if 'pai' in e else raizes).append(no)
+
+        linhas = []
+        def escrever(no, nivel):
+            e, filhas = no
+            contadores = {k: v for k, v in e.items()
+                          if k not in ('etapa', 'tempo_s', 'pai', 'rss_max_bytes', 'pico_bytes')}
+            memoria = f"  pico {e['pico_bytes'] / 2**20:.1f} MiB" if 'pico_bytes' in e else ''
+            linhas.append(f"{'  ' * nivel + e['etapa']:<24} {e['tempo_s'] * 1000:10.1f} ms{memoria}  "
+                          + "  ".join(f"{k}={v}" for k, v in contadores.items()))
+            for filha in filhas:
+                escrever(filha, nivel + 1)
+
+        # Etapas cuja etapa de fora ainda não terminou ficam no fim, um nível abaixo
+        for no in raizes:
+            escrever(no, 0)
+        for no in soltas:
+            escrever(no, 1)
+        return "\n".join(linhas)
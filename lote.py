@@ -0,0 +1,231 @@
+import sys
+import json
+import math
+import time
+import argparse
+from collections import deque
+import numpy as np
+
+from mapa import ler_mapa
+from cache import CacheGrafos
+from geometria import ConjuntoObstaculos, segmentos_livres, sinal_orientacao
+from caminho import MotorCaminhos, estatisticas_caminho
+
+# =====================================================
+# Planejador: mapa, grafo e índices montados uma vez
+# =====================================================
+
+class Planejador:
+    """Responde consultas (início, fim) com pontos quaisquer sobre um mapa já carregado.
+
+    O grafo de visibilidade vem pronto em `grafo` ou do `CacheGrafos`
+    (construído só na primeira vez que o mapa é visto). Cada ponto de consulta se liga aos vértices
+    que enxerga, todos os pontos de um lote testados numa chamada ao kernel
+    vetorizado, e o caminho sai do A* de `MotorCaminhos.buscar_pontos`: é o
+    menor caminho exato, não o do vértice mais próximo.
+
+    Só entram no teste os vértices em que a reta vinda do ponto tangencia o
+    obstáculo (os dois vizinhos no contorno do mesmo lado, como em
+    `grafo.bitangente`): um caminho mínimo nunca sai do ponto por outro.
+    """
+
+    def __init__(self, q_start, q_goal, obstaculos, cache=None, grafo=None, **parametros):
+        self.obstaculos = ConjuntoObstaculos(obstaculos)
+        if grafo is None:
+            cache = cache if cache is not None else CacheGrafos()
+            grafo, *_ = cache.obter(q_start, q_goal, obstaculos, **parametros)
+        self.grafo = grafo
+        self.motor = MotorCaminhos(self.grafo)
+        self.coords = self.grafo.coords
+
+        # Vizinhos no contorno de cada vértice; sem contorno único (pontas do mapa, vértices
+        # compartilhados por dois obstáculos), o vértice é sempre candidato
+        cones, _ = self.obstaculos.cones(self.grafo.vertices)
+        unico = [len(cones.get(v, ())) == 1 for v in self.grafo.vertices]
+        self._com_cone = np.array(unico, dtype=bool)
+        self._anteriores = np.array([cones[v][0][0] if u else v for v, u in zip(self.grafo.vertices, unico)], dtype=float)
+        self._proximos = np.array([cones[v][0][1] if u else v for v, u in zip(self.grafo.vertices, unico)], dtype=float)
+
+    @classmethod
+    def de_arquivo(cls, arquivo, **parametros):
+        q_start, q_goal, obstaculos = ler_mapa(arquivo)
+        return cls(q_start, q_goal, obstaculos, **parametros)
+
+    def _visiveis(self, pontos):
+        # {id: distância} dos vértices tangentes que cada ponto enxerga, numa única chamada ao kernel
+        pontos = np.asarray(pontos, dtype=float).reshape(-1, 2)
+        px, py = pontos[:, 0, None], pontos[:, 1, None]
+        vx, vy = self.coords[:, 0], self.coords[:, 1]
+        o1 = sinal_orientacao(px, py, vx, vy, self._anteriores[:, 0], self._anteriores[:, 1])
+        o2 = sinal_orientacao(px, py, vx, vy, self._proximos[:, 0], self._proximos[:, 1])
+        tangente = ~self._com_cone | ~(((o1 > 0) & (o2 < 0)) | ((o1 < 0) & (o2 > 0)))
+
+        linha, vertice = np.nonzero(tangente)
+        livres = segmentos_livres(pontos[linha], self.coords[vertice], self.obstaculos)
+        linha, vertice = linha[livres], vertice[livres]
+        d = np.hypot(self.coords[vertice, 0] - pontos[linha, 0], self.coords[vertice, 1] - pontos[linha, 1])
+
+        visiveis = [{} for _ in range(len(pontos))]
+        for k, v, dist in zip(linha.tolist(), vertice.tolist(), d.tolist()):
+            visiveis[k][v] = dist
+        return visiveis
+
+    def planejar_lote(self, consultas):
+        """Lista de `(caminho, distancia)`, uma por par (início, fim) de `consultas`."""
+        if not consultas:
+            return []
+        pontos = [p for par in consultas for p in par]
+        visiveis = self._visiveis(pontos)
+        diretos = segmentos_livres([a for a, _ in consultas], [b for _, b in consultas], self.obstaculos)
+
+        resultados = []
+        for k, (inicio, fim) in enumerate(consultas):
+            inicio, fim = tuple(inicio), tuple(fim)
+            if diretos[k]:
+                # Enxerga o destino: a reta é o menor caminho possível
+                caminho = [inicio] if inicio == fim else [inicio, fim]
+                resultados.append((caminho, math.dist(inicio, fim)))
+            else:
+                resultados.append(self.motor.buscar_pontos(inicio, fim, visiveis[2 * k], visiveis[2 * k + 1]))
+        return resultados
+
+    def planejar(self, inicio, fim):
+        return self.planejar_lote([(inicio, fim)])[0]
+
+# =====================================================
+# Entrada e saída
+# =====================================================
+
+def ler_consultas(linhas):
+    """Consultas `(id, início, fim)` de linhas "x1 y1 x2 y2" (espaços ou vírgulas) ou JSON.
+
+    Em JSON: {"inicio": [x, y], "fim": [x, y]} e, opcionalmente, "id". Sem
+    id, vale o número da consulta (a partir de 0). Linhas vazias e
+    comentários (#) são ignorados.
+    """
+    n = 0
+    for numero, linha in enumerate(linhas, 1):
+        linha = linha.strip()
+        if not linha or linha.startswith('#'):
+            continue
+        try:
+            if linha.startswith('{'):
+                dados = json.loads(linha)
+                id_consulta = dados.get('id', n)
+                inicio, fim = tuple(map(float, dados['inicio'])), tuple(map(float, dados['fim']))
+            else:
+                valores = [float(v) for v in linha.replace(',', ' ').split()]
+                if len(valores) != 4:
+                    raise ValueError(f"esperados 4 números, encontrados {len(valores)}")
+                id_consulta = n
+                inicio, fim = tuple(valores[:2]), tuple(valores[2:])
+            if len(inicio) != 2 or len(fim) != 2:
+                raise ValueError("pontos devem ter 2 coordenadas")
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Consulta inválida na linha {numero}: {e}") from None
+        yield id_consulta, inicio, fim
+        n += 1
+
+def _finito(x):
+    # JSON não tem infinito (razao_caminho de início == fim)
+    return x if not isinstance(x, float) or math.isfinite(x) else None
+
+def registro(id_consulta, inicio, fim, caminho, distancia):
+    """Resultado de uma consulta como dicionário pronto para JSON."""
+    estatisticas = {k: _finito(v) for k, v in estatisticas_caminho(caminho, distancia).items()}
+    return {'id': id_consulta, 'inicio': list(inicio), 'fim': list(fim),
+            'encontrado': caminho is not None,
+            'caminho': [list(p) for p in caminho] if caminho else None,
+            'distancia': distancia if caminho else None,
+            'estatisticas': estatisticas}
+
+def _blocos(consultas, tamanho):
+    bloco = []
+    for consulta in consultas:
+        bloco.append(consulta)
+        if len(bloco) == tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+# =====================================================
+# Processos
+# =====================================================
+
+# Planejador de cada processo do pool, montado uma única vez no início do worker
+_planejador_worker = None
+
+def _iniciar_worker(arquivo, parametros):
+    global _planejador_worker
+    # O grafo já está no cache em disco (o processo principal o montou): só é lido
+    _planejador_worker = Planejador.de_arquivo(arquivo, **parametros)
+
+def _planejar_bloco(bloco):
+    resultados = _planejador_worker.planejar_lote([(inicio, fim) for _, inicio, fim in bloco])
+    return [registro(i, inicio, fim, *r) for (i, inicio, fim), r in zip(bloco, resultados)]
+
+def planejar_fluxo(arquivo, consultas, workers=1, bloco=256, planejador=None, **parametros):
+    """Gera os registros das `consultas` `(id, início, fim)`, na ordem de entrada.
+
+    O mapa e o grafo são montados uma vez (por processo; `planejador` pode
+    vir pronto). Com `workers > 1`, os blocos vão para um pool de
+    processos, com no máximo alguns blocos por worker em andamento, então a
+    entrada é lida aos poucos mesmo que seja infinita.
+    """
+    if planejador is None:
+        planejador = Planejador.de_arquivo(arquivo, **parametros)
+    if workers <= 1:
+        for b in _blocos(consultas, bloco):
+            resultados = planejador.planejar_lote([(inicio, fim) for _, inicio, fim in b])
+            yield from (registro(i, inicio, fim, *r) for (i, inicio, fim), r in zip(b, resultados))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers, initializer=_iniciar_worker, initargs=(arquivo, parametros)) as pool:
+        pendentes = deque()
+        for b in _blocos(consultas, bloco):
+            pendentes.append(pool.submit(_planejar_bloco, b))
+            if len(pendentes) >= 2 * workers:
+                yield from pendentes.popleft().result()
+        while pendentes:
+            yield from pendentes.popleft().result()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Planeja muitos pares início/fim sobre um mesmo mapa")
+    parser.add_argument('mapa')
+    parser.add_argument('consultas', nargs='?', default='-',
+                        help="arquivo com uma consulta por linha (x1 y1 x2 y2 ou JSON); '-' lê da entrada padrão")
+    parser.add_argument('--saida', default='-', help="arquivo JSON lines; '-' escreve na saída padrão")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--bloco', type=int, default=256, help="consultas por tarefa do pool")
+    parser.add_argument('--metodo', default='vetorizado', help="método de construção do grafo (ver grafo.METODOS)")
+    args = parser.parse_args()
+
+    entrada = sys.stdin if args.consultas == '-' else open(args.consultas)
+    saida = sys.stdout if args.saida == '-' else open(args.saida, 'w')
+    try:
+        # Preparo (mapa, grafo do cache ou construído agora) fora da conta da vazão
+        inicio = time.perf_counter()
+        planejador = Planejador.de_arquivo(args.mapa, metodo=args.metodo)
+        preparo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        total = encontrados = 0
+        consultas = ler_consultas(entrada)
+        for r in planejar_fluxo(args.mapa, consultas, args.workers, args.bloco, planejador, metodo=args.metodo):
+            saida.write(json.dumps(r, ensure_ascii=False) + '\n')
+            total += 1
+            encontrados += r['encontrado']
+        tempo = time.perf_counter() - inicio
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+
+    print(f"Preparo do mapa: {preparo:.2f} s ({len(planejador.grafo)} vértices, "
+          f"{planejador.grafo.num_arestas} arestas)", file=sys.stderr)
+    print(f"{total} consultas ({encontrados} com caminho) em {tempo:.2f} s: "
+          f"{total / tempo if tempo > 0 else 0:.1f} consultas/s", file=sys.stderr)
@@ -1,15 +1,47 @@
+import argparse
+
+import instrumentos
+from instrumentos import etapa
 from mapa import ler_mapa
-from grafo import grafo_visibilidade
-from arvore import prim, validar_mst, estatisticas_mst, verticeMaisProximo
-from caminho import buscarCaminho, estatisticas_caminho
+from preprocessamento import preprocessar, resumo
+from cache import CacheGrafos, construir_grafo_e_mst
+from arvore import validar_mst, estatisticas_mst, IndiceAlcance, escolher_metodo_mst
+from caminho import MotorCaminhos, estatisticas_caminho
+from indice import IndiceVertices
 from plots import plotar_grafo, plotar_mst, plotar_caminho
 
+NOMES_MST = {'heap': 'de Prim (heap)', 'denso': 'de Prim denso', 'kruskal': 'de Kruskal'}
+
 if __name__ == "__main__":
-    arquivo_mapa = "mapa.txt"
+    parser = argparse.ArgumentParser(description="Planejamento de caminho por grafo de visibilidade")
+    parser.add_argument('mapa', nargs='?', default="mapa.txt")
+    parser.add_argument('--perfil', metavar='ARQUIVO',
+                        help="grava em JSON o tempo e os contadores de cada etapa")
+    parser.add_argument('--memoria', action='store_true',
+                        help="com --perfil, mede também o pico de memória de cada etapa (mais lento)")
+    parser.add_argument('--preprocessar', action='store_true',
+                        help="une obstáculos sobrepostos e remove vértices repetidos e colineares antes do grafo")
+    parser.add_argument('--raio', type=float, default=0.0,
+                        help="raio do robô: os obstáculos crescem esse tanto (implica --preprocessar)")
+    parser.add_argument('--tolerancia', type=float, default=0.0,
+                        help="tolerância da simplificação dos contornos (implica --preprocessar)")
+    armazenamento = parser.add_mutually_exclusive_group()
+    armazenamento.add_argument('--sem-cache', action='store_true',
+                               help="constrói grafo e MST sempre, sem ler nem gravar o cache em disco")
+    armazenamento.add_argument('--cache', metavar='DIR',
+                               help="diretório do cache de grafos (padrão: $XDG_CACHE_HOME/grafos_visibilidade)")
+    args = parser.parse_args()
+    arquivo_mapa = args.mapa
+
+    relatorio = None
+    if args.perfil:
+        relatorio = instrumentos.Relatorio()
+        instrumentos.registrar(relatorio, memoria=args.memoria)
     
     try:
         # ==================== ETAPA 1: LEITURA DO MAPA ==================== 
-        q_start, q_goal, obstaculos = ler_mapa(arquivo_mapa)
+        with etapa('carregar'):
+            q_start, q_goal, obstaculos = ler_mapa(arquivo_mapa)
         
         print(f"\nConfiguração do mapa carregada com sucesso")
         print(f"\nPonto inicial (q_start): {q_start}")
@@ -21,10 +53,29 @@ if __name__ == "__main__":
         vertices_por_obst = [len(obst) for obst in obstaculos]
         print(f"\nDetalhes dos obstáculos:")
         print(f"Total de vértices: {total_vertices_obs}")
+
+        # Obstáculos limpos (e inflados pelo raio do robô) antes do grafo: menos vértices, grafo bem menor
+        if args.preprocessar or args.raio > 0 or args.tolerancia > 0:
+            with etapa('preprocessar'):
+                obstaculos, relatorio_prep = preprocessar(obstaculos, args.raio, args.tolerancia,
+                                                          q_start=q_start, q_goal=q_goal)
+            print(f"\nPré-processamento: {resumo(relatorio_prep)}")
+            if relatorio_prep['inicio_bloqueado'] or relatorio_prep['objetivo_bloqueado']:
+                print(f"Aviso: q_start ou q_goal ficou dentro de um obstáculo")
         
         # ==================== ETAPA 2: GRAFO DE VISIBILIDADE ====================
         print("\nConstruindo grafo de visibilidade...")
-        grafo = grafo_visibilidade(q_start, q_goal, obstaculos)
+        # Grafo (forma compacta: ids inteiros + arrays CSR) e MST, reaproveitados do cache em disco se o mapa já foi visto
+        with etapa('grafo'):
+            if args.sem_cache:
+                grafo_compacto, mst, total_peso, vertices_alcancados = construir_grafo_e_mst(q_start, q_goal, obstaculos)
+                do_cache = False
+            else:
+                grafo_compacto, mst, total_peso, vertices_alcancados, do_cache = \
+                    CacheGrafos(args.cache).obter(q_start, q_goal, obstaculos)
+        if do_cache:
+            print("Grafo e MST carregados do cache")
+        grafo = grafo_compacto.para_dicionario()
         
         # Estatísticas do grafo
         total_vertices = len(grafo)
@@ -35,20 +86,11 @@ if __name__ == "__main__":
         print(f"Vértices:  {total_vertices}")
         print(f"Arestas:   {total_arestas}")
         
-        # Verificar se existe caminho entre start e goal
-        vertices_alcancaveis_start = set()
-        fila = [q_start]
-        visitados = {q_start}
+        # Verificar se existe caminho entre start e goal (índice de componentes, consulta em O(1))
+        with etapa('alcance'):
+            alcance = IndiceAlcance(grafo_compacto, obstaculos)
         
-        while fila:
-            v = fila.pop(0)
-            vertices_alcancaveis_start.add(v)
-            for (viz, _) in grafo.get(v, []):
-                if viz not in visitados:
-                    visitados.add(viz)
-                    fila.append(viz)
-        
-        if q_goal in vertices_alcancaveis_start:
+        if alcance.conectados(q_start, q_goal):
             print(f"\nExiste caminho entre q_start e q_goal")
         else:
             print(f"\nNão existe caminho entre q_start e q_goal")
@@ -56,14 +98,16 @@ if __name__ == "__main__":
         
         # Visualizar grafo
         print(f"\nGerando visualização do grafo de visibilidade...")
-        plotar_grafo(grafo, obstaculos, q_start, q_goal)
+        with etapa('plot', figura='grafo'):
+            plotar_grafo(grafo, obstaculos, q_start, q_goal)
         
         # ==================== ETAPA 3: ÁRVORE GERADORA MÍNIMA ====================
-        print(f"\nCalculando MST usando o algoritmo de Prim...")
-        
-        mst, total_peso, vertices_alcancados = prim(grafo, q_start)
-        
-        print(f"\nMST calculada com sucesso!")
+        # O cache calcula a MST com o algoritmo que `arvore_geradora_minima` escolhe pela densidade do grafo
+        if do_cache:
+            print(f"\nMST lida do cache")
+        else:
+            print(f"\nCalculando MST usando o algoritmo {NOMES_MST[escolher_metodo_mst(grafo_compacto)]}...")
+            print(f"\nMST calculada com sucesso!")
         
         # Estatísticas da MST
         stats = estatisticas_mst(mst)
@@ -93,22 +137,28 @@ if __name__ == "__main__":
         
         # Visualizar MST
         print(f"\nGerando visualização da MST...")
-        plotar_mst(mst, obstaculos, q_start, q_goal)
+        with etapa('plot', figura='mst'):
+            plotar_mst(mst, obstaculos, q_start, q_goal)
 
         # ==================== ETAPA 4: VÉRTICE MAIS PRÓXIMO ====================
         print(f"\nEncontrando os vértices mais próximo...")
         
-        v_inicio = verticeMaisProximo(q_start, mst)
-        v_fim = verticeMaisProximo(q_goal, mst)
+        with etapa('mais_proximo'):
+            # Um índice da MST para as duas consultas, em vez de varrer todos os vértices a cada uma
+            indice_mst = IndiceVertices(mst)
+            v_inicio = indice_mst.mais_proximo(q_start)
+            v_fim = indice_mst.mais_proximo(q_goal)
         
         # ==================== ETAPA 5: BUSCA DE CAMINHO ====================
         # Só procurar caminho se q_goal estiver na MST
         if q_goal in vertices_alcancados:
             print(f"\nBuscando caminho de {q_start} até {q_goal}...")
-            print(f"   Usando algoritmo: DFS (Depth-First Search)")
+            print(f"   Usando algoritmo: A* (heurística euclidiana) no grafo de visibilidade")
             
             # Buscar caminho
-            caminho, distancia_caminho = buscarCaminho(v_inicio, v_fim, mst)
+            with etapa('caminho'):
+                motor = MotorCaminhos(grafo_compacto)
+                caminho, distancia_caminho = motor.buscar(v_inicio, v_fim)
             
             if caminho:
                 print(f"\nCaminho encontrado com sucesso")
@@ -163,7 +213,8 @@ if __name__ == "__main__":
             
             # Plotar com grafo completo
             print(f"\nCaminho destacado sobre o grafo completo")
-            plotar_caminho(caminho, obstaculos, q_start, q_goal, grafo)
+            with etapa('plot', figura='caminho'):
+                plotar_caminho(caminho, obstaculos, q_start, q_goal, grafo)
         else:
             print(f"\nVisualização não realizada, nenhum caminho disponível")
         
@@ -181,3 +232,10 @@ if __name__ == "__main__":
         print(f"\nTrace completo do erro:")
         import traceback
         traceback.print_exc()
+
+    finally:
+        if relatorio is not None:
+            instrumentos.remover(relatorio)
+            relatorio.salvar(args.perfil, mapa=arquivo_mapa)
+            print(f"\nPerfil das etapas gravado em {args.perfil}:")
+            print(relatorio.tabela())
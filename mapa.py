@@ -1,36 +1,20 @@
+import os
+import sys
+import itertools
+import numpy as np
+
+# Formato binário: cabeçalho de 64 bytes, offsets int64 (K + 1) e vértices float64 (N, 2), tudo little-endian
+MAGICO = b'MAPABIN1'
+TAMANHO_CABECALHO = 64
+
 def ler_mapa(arquivo):
     try:
-        with open(arquivo, 'r') as f:
-            linhas = [linha.strip() for linha in f.readlines() 
-                     if linha.strip() and not linha.strip().startswith('#')]
+        if _binario(arquivo):
+            q_start, q_goal, coords, offsets = abrir_mapa_binario(arquivo)
+        else:
+            q_start, q_goal, coords, offsets = ler_mapa_arrays(arquivo)
         
-        if len(linhas) < 3:
-            raise ValueError("Arquivo de mapa incompleto")
-        
-        q_start = tuple(map(float, linhas[0].split()))
-        q_goal = tuple(map(float, linhas[1].split()))
-        n_obstaculos = int(linhas[2])
-        
-        obstaculos = []
-        i = 3
-        for _ in range(n_obstaculos):
-            if i >= len(linhas):
-                raise ValueError("Número de obstáculos inconsistente")
-            
-            n_quinas = int(linhas[i])
-            i += 1
-            quinas = []
-            
-            for _ in range(n_quinas):
-                if i >= len(linhas):
-                    raise ValueError("Número de vértices inconsistente")
-                x, y = map(float, linhas[i].split())
-                quinas.append((x, y))
-                i += 1
-            
-            obstaculos.append(quinas)
-        
-        return q_start, q_goal, obstaculos
+        return q_start, q_goal, obstaculos_de_arrays(coords, offsets)
     
     except FileNotFoundError:
         print(f"Erro: Arquivo '{arquivo}' não encontrado")
@@ -41,3 +25,175 @@ def ler_mapa(arquivo):
     except Exception as e:
         print(f"Erro inesperado: {e}")
         raise
+
+
+def obstaculos_de_arrays(coords, offsets):
+    # Arrays (coords, offsets) -> lista de obstáculos, cada um uma lista de tuplas
+    pontos = [tuple(p) for p in np.asarray(coords).tolist()]
+    offsets = np.asarray(offsets).tolist()
+    return [pontos[a:b] for a, b in zip(offsets, offsets[1:])]
+
+def _linhas_uteis(f, bloco):
+    # Lê o arquivo em blocos de `bloco` caracteres; cada bloco vira uma lista de linhas sem brancos nem comentários
+    resto = ''
+    while True:
+        pedaco = f.read(bloco)
+        if not pedaco:
+            break
+        linhas = (resto + pedaco).split('\n')
+        resto = linhas.pop()
+        yield [l for l in map(str.strip, linhas) if l and l[0] != '#']
+    resto = resto.strip()
+    if resto and resto[0] != '#':
+        yield [resto]
+
+def ler_mapa_arrays(arquivo, bloco=1 << 20):
+    """Lê um mapa em texto direto para arrays: `(q_start, q_goal, coords, offsets)`.
+
+    `coords` (N, 2) tem os vértices de todos os obstáculos em sequência; os
+    do obstáculo k são `coords[offsets[k]:offsets[k + 1]]`. O arquivo é lido
+    em blocos e os vértices vão para um array pré-alocado, sem uma tupla por
+    vértice no caminho.
+    """
+    with open(arquivo, 'r') as f:
+        blocos = _linhas_uteis(f, bloco)
+        fila = []
+        pos = 0
+
+        def proximas(n):
+            # Até n linhas úteis, atravessando blocos se preciso
+            nonlocal fila, pos
+            if pos + n <= len(fila):
+                pos += n
+                return fila[pos - n:pos]
+            linhas = []
+            while len(linhas) < n:
+                if pos >= len(fila):
+                    fila = next(blocos, None)
+                    pos = 0
+                    if fila is None:
+                        fila = []
+                        break
+                pega = fila[pos:pos + n - len(linhas)]
+                linhas += pega
+                pos += len(pega)
+            return linhas
+
+        cabecalho = proximas(3)
+        if len(cabecalho) < 3:
+            raise ValueError("Arquivo de mapa incompleto")
+
+        q_start = tuple(map(float, cabecalho[0].split()))
+        q_goal = tuple(map(float, cabecalho[1].split()))
+        n_obstaculos = int(cabecalho[2])
+
+        # Capacidade inicial pela estimativa de ~16 bytes por linha de vértice; dobra se faltar
+        coords = np.empty((max(16, os.path.getsize(arquivo) // 16), 2))
+        offsets = np.zeros(max(n_obstaculos, 0) + 1, dtype=np.int64)
+        pendentes = []
+        total = 0
+
+        def descarregar():
+            # Converte de uma vez as linhas de vértices acumuladas (as últimas até `total`)
+            nonlocal coords, pendentes
+            if not pendentes:
+                return
+            valores = _coordenadas(pendentes)
+            if total > len(coords):
+                coords = np.resize(coords, (max(2 * len(coords), total), 2))
+            coords[total - len(valores):total] = valores
+            pendentes = []
+
+        for k in range(n_obstaculos):
+            linha = proximas(1)
+            if not linha:
+                descarregar()
+                raise ValueError("Número de obstáculos inconsistente")
+            try:
+                n_quinas = max(int(linha[0]), 0)
+            except ValueError:
+                # Um vértice mal formado antes desta linha tem prioridade na mensagem
+                descarregar()
+                raise
+
+            linhas = proximas(n_quinas)
+            pendentes += linhas
+            total += len(linhas)
+            if len(linhas) < n_quinas:
+                descarregar()
+                raise ValueError("Número de vértices inconsistente")
+            offsets[k + 1] = total
+            if len(pendentes) >= 65536:
+                descarregar()
+        descarregar()
+
+    return q_start, q_goal, coords[:total].copy(), offsets
+
+def _coordenadas(linhas):
+    # Cada linha precisa ter exatamente "x y": com a contagem por linha conferida, os valores viram floats
+    # de uma vez; linha fora do formato cai no parse linha a linha, que dá o erro
+    partes = [linha.split() for linha in linhas]
+    if any(len(p) != 2 for p in partes):
+        for linha in linhas:
+            x, y = map(float, linha.split())
+    return np.array(list(map(float, itertools.chain.from_iterable(partes)))).reshape(-1, 2)
+
+def _binario(arquivo):
+    with open(arquivo, 'rb') as f:
+        return f.read(len(MAGICO)) == MAGICO
+
+def salvar_mapa_binario(arquivo, q_start, q_goal, coords, offsets):
+    """Grava o mapa no formato binário (ver `abrir_mapa_binario`)."""
+    coords = np.ascontiguousarray(coords, dtype='<f8').reshape(-1, 2)
+    offsets = np.ascontiguousarray(offsets, dtype='<i8')
+    if len(q_start) != 2 or len(q_goal) != 2:
+        raise ValueError("Pontos inicial e objetivo precisam ter duas coordenadas")
+
+    cabecalho = MAGICO + np.array([len(offsets) - 1, len(coords)], dtype='<i8').tobytes() \
+        + np.array([*q_start, *q_goal], dtype='<f8').tobytes()
+    with open(arquivo, 'wb') as f:
+        f.write(cabecalho.ljust(TAMANHO_CABECALHO, b'\0'))
+        f.write(offsets.tobytes())
+        f.write(coords.tobytes())
+
+def abrir_mapa_binario(arquivo):
+    """Abre um mapa binário sem ler os vértices: `coords` e `offsets` são memmaps, em O(1)."""
+    with open(arquivo, 'rb') as f:
+        cabecalho = f.read(TAMANHO_CABECALHO)
+    if len(cabecalho) < TAMANHO_CABECALHO or cabecalho[:len(MAGICO)] != MAGICO:
+        raise ValueError("Arquivo de mapa binário inválido")
+
+    n_obstaculos, n_vertices = np.frombuffer(cabecalho, dtype='<i8', count=2, offset=8).tolist()
+    sx, sy, gx, gy = np.frombuffer(cabecalho, dtype='<f8', count=4, offset=24).tolist()
+    esperado = TAMANHO_CABECALHO + 8 * (n_obstaculos + 1) + 16 * n_vertices
+    if os.path.getsize(arquivo) < esperado:
+        raise ValueError("Arquivo de mapa binário truncado")
+
+    offsets = np.memmap(arquivo, dtype='<i8', mode='r', offset=TAMANHO_CABECALHO, shape=(n_obstaculos + 1,))
+    coords = np.memmap(arquivo, dtype='<f8', mode='r', offset=TAMANHO_CABECALHO + 8 * (n_obstaculos + 1),
+                       shape=(n_vertices, 2)) if n_vertices else np.zeros((0, 2))
+    return (sx, sy), (gx, gy), coords, offsets
+
+def salvar_mapa_texto(arquivo, q_start, q_goal, coords, offsets):
+    """Grava o mapa no formato texto de `mapa.txt`."""
+    coords = np.asarray(coords).tolist()
+    offsets = np.asarray(offsets).tolist()
+    with open(arquivo, 'w') as f:
+        f.write(f"{' '.join(map(str, q_start))}\n{' '.join(map(str, q_goal))}\n{len(offsets) - 1}\n")
+        for a, b in zip(offsets, offsets[1:]):
+            f.write(f"{b - a}\n")
+            f.write(''.join(f"{x} {y}\n" for x, y in coords[a:b]))
+
+def converter_mapa(origem, destino):
+    """Converte texto -> binário ou binário -> texto, conforme o formato de `origem`."""
+    if _binario(origem):
+        salvar_mapa_texto(destino, *abrir_mapa_binario(origem))
+    else:
+        salvar_mapa_binario(destino, *ler_mapa_arrays(origem))
+
+if __name__ == "__main__":
+    # python mapa.py origem destino
+    if len(sys.argv) != 3:
+        print("Uso: python mapa.py <origem> <destino>")
+        sys.exit(1)
+    converter_mapa(sys.argv[1], sys.argv[2])
@@ -1,18 +1,59 @@
+import io
+import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon
+import matplotlib.image
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+
+from compacto import GrafoCompacto
 
 # =====================================================
 # Gerais
 # =====================================================
 
 def plotar_obstaculos(obstaculos, ax, color1, color2, alpha, lw, zorder1, zorder2):
-    for obst in obstaculos:
-        pol = Polygon(obst)
-        x, y = pol.exterior.xy
-        ax.fill(x, y, color=color1, alpha=alpha, zorder=zorder1)
-        ax.plot(x, y, color=color2, linewidth=lw, zorder=zorder2, label="_contorno")
+    # Dois artistas para todos os obstáculos (preenchimento e contorno), não dois por obstáculo
+    aneis = [np.asarray(obst, dtype=float) for obst in obstaculos if len(obst) >= 3]
+    if not aneis:
+        return
+    ax.add_collection(PolyCollection(aneis, facecolors=color1, edgecolors='none', alpha=alpha, zorder=zorder1))
+    ax.add_collection(PolyCollection(aneis, facecolors='none', edgecolors=color2, linewidths=lw,
+                                     zorder=zorder2, label="_contorno"))
+    ax.autoscale_view()
+
+def arestas_unicas(grafo):
+    """Segmentos (m, 2, 2) das arestas de um grafo, cada aresta não dirigida uma vez só.
+
+    Aceita o dicionário de adjacência, um `GrafoCompacto` ou uma lista de
+    arestas (u, v, peso), como a MST.
+    """
+    if isinstance(grafo, GrafoCompacto):
+        origem = np.repeat(np.arange(len(grafo)), np.diff(grafo.indptr))
+        unica = origem < grafo.indices
+        return np.stack([grafo.coords[origem[unica]], grafo.coords[grafo.indices[unica]]], axis=1)
+    if isinstance(grafo, dict):
+        segmentos = [(u, v) for u, vizinhos in grafo.items() for v, _ in vizinhos if u < v]
+    else:
+        segmentos = [(u, v) for u, v, _ in grafo]
+    return np.array(segmentos, dtype=float).reshape(-1, 2, 2)
+
+def plotar_arestas(grafo, ax, **estilo):
+    # Todas as arestas numa única LineCollection
+    segmentos = arestas_unicas(grafo)
+    if len(segmentos):
+        ax.add_collection(LineCollection(segmentos, **estilo))
+        ax.autoscale_view()
 
-def exibicao(ax):
+def figura(saida=None, tamanho=(8, 8)):
+    """`(fig, ax)`: pelo pyplot para exibir na tela ou, com `saida`, uma figura Agg avulsa (sem janela nem display)."""
+    if saida is None:
+        return plt.subplots(figsize=tamanho)
+    fig = Figure(figsize=tamanho)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+def exibicao(ax, saida=None, formato=None, dpi=100):
     # Legenda
     box = ax.get_position()
     ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])  # espaço para legenda
@@ -25,35 +66,31 @@ def exibicao(ax):
 
     # Aspecto e exibição
     ax.set_aspect('equal', 'box')
-    plt.tight_layout()
-    plt.show()
+    if saida is None:
+        plt.tight_layout()
+        plt.show()
+        return
+
+    # Arquivo (PNG, SVG...) ou buffer: o formato vem da extensão ou de `formato`
+    ax.figure.tight_layout()
+    ax.figure.savefig(saida, format=formato, dpi=dpi, bbox_inches='tight')
 
 # =====================================================
 # Plotar grafo de visibilidade
 # =====================================================
-def plotar_grafo(grafo, obstaculos, q_start=None, q_goal=None):
-    fig, ax = plt.subplots(figsize=(8, 8))
+def plotar_grafo(grafo, obstaculos, q_start=None, q_goal=None, saida=None, formato=None):
+    fig, ax = figura(saida)
 
     # Obstáculos
     plotar_obstaculos(obstaculos, ax, "lightgray", "black", 0.8, 2.0, 1, 5)
 
-    # Arestas
-    for v in grafo:
-        for viz, _ in grafo[v]:
-            # garante que v e viz sejam iteráveis com 2 valores (x, y)
-            if isinstance(v, (tuple, list)) and isinstance(viz, (tuple, list)) and len(v) == 2 and len(viz) == 2:
-                ax.plot(
-                    [v[0], viz[0]], [v[1], viz[1]],
-                    color='steelblue', linewidth=1.8, alpha=0.7, zorder=1
-                )
+    # Arestas (cada uma uma vez, numa única coleção)
+    plotar_arestas(grafo, ax, colors='steelblue', linewidths=1.8, alpha=0.7, zorder=1)
 
     # Vértices
-    try:
-        xs, ys = zip(*[v for v in grafo.keys() if isinstance(v, (tuple, list)) and len(v) == 2])
-        ax.scatter(xs, ys, s=20, color='navy', label='Vértices do grafo', zorder=2)
-    except ValueError:
-        # Grafo pode estar vazio — apenas ignora
-        pass
+    vertices = grafo.coords if isinstance(grafo, GrafoCompacto) else np.array(list(grafo), dtype=float).reshape(-1, 2)
+    if len(vertices):
+        ax.scatter(vertices[:, 0], vertices[:, 1], s=20, color='navy', label='Vértices do grafo', zorder=2)
 
     # Ponto inicial e final
     if q_start and isinstance(q_start, (tuple, list)) and len(q_start) == 2:
@@ -69,24 +106,19 @@ def plotar_grafo(grafo, obstaculos, q_start=None, q_goal=None):
     ax.set_ylabel("Y")
     ax.grid(True, linestyle="--", alpha=0.3)
 
-    exibicao(ax)
+    exibicao(ax, saida, formato)
 
 # =====================================================
 # Plotar MST
 # =====================================================
-def plotar_mst(arestas, obstaculos, q_start=None, q_goal=None):
-    fig, ax = plt.subplots(figsize=(8, 8))
+def plotar_mst(arestas, obstaculos, q_start=None, q_goal=None, saida=None, formato=None):
+    fig, ax = figura(saida)
 
     # Obstáculos
     plotar_obstaculos(obstaculos, ax, "gainsboro", "gray", 0.6, 1.0, 1, 2)
 
     # Arestas da MST
-    for u, v, _ in arestas:
-        if isinstance(u, (tuple, list)) and isinstance(v, (tuple, list)) and len(u) == 2 and len(v) == 2:
-            ax.plot(
-                [u[0], v[0]], [u[1], v[1]],
-                color='forestgreen', linewidth=2.5, alpha=0.9, zorder=4
-            )
+    plotar_arestas(arestas, ax, colors='forestgreen', linewidths=2.5, alpha=0.9, zorder=4)
 
     # Vértices
     vertices = set()
@@ -112,51 +144,121 @@ def plotar_mst(arestas, obstaculos, q_start=None, q_goal=None):
     ax.set_ylabel("Y")
     ax.grid(True, linestyle="--", alpha=0.3)
 
-    exibicao(ax)
+    exibicao(ax, saida, formato)
 
 # =====================================================
 # Plotar caminho final
 # =====================================================
-def plotar_caminho(caminho, obstaculos, q_start, q_goal, grafo=None):
-    fig, ax = plt.subplots(figsize=(8, 8))
+def plotar_caminho(caminho, obstaculos, q_start, q_goal, grafo=None, saida=None, formato=None):
+    fig, ax = figura(saida)
+    _fundo_caminho(ax, obstaculos, q_start, q_goal, grafo)
 
-    # Obstáculos
-    plotar_obstaculos(obstaculos, ax, "gainsboro", "gray", 0.7, 2.0, 1, 2)
-
-    # Grafo de visibilidade
-    if grafo:
-        for u in grafo:
-            for v, _ in grafo[u]:
-                ax.plot(
-                    [u[0], v[0]], [u[1], v[1]],
-                    color='lightgray', linewidth=1, alpha=0.8, zorder=1
-                )
-
-    # Caminho final
-    if caminho and len(caminho) > 1:
-        for i in range(len(caminho) - 1):
-            x0, y0 = caminho[i]
-            x1, y1 = caminho[i + 1]
-            ax.plot(
-                [x0, x1], [y0, y1],
-                color='red', linewidth=3.5, alpha=0.95, zorder=5
-            )
-
-    # Vértices do caminho
+    # Caminho final (uma polilinha) e seus vértices
     if caminho:
         xs, ys = zip(*caminho)
+        ax.plot(xs, ys, color='red', linewidth=3.5, alpha=0.95, zorder=5)
         ax.scatter(xs, ys, s=30, color='darkred', zorder=6, label="Caminho")
 
+    exibicao(ax, saida, formato)
+
+def _fundo_caminho(ax, obstaculos, q_start, q_goal, grafo):
+    # Tudo o que não muda de um caminho para outro
+    plotar_obstaculos(obstaculos, ax, "gainsboro", "gray", 0.7, 2.0, 1, 2)
+
+    # Grafo de visibilidade
+    if grafo is not None and len(grafo):
+        plotar_arestas(grafo, ax, colors='lightgray', linewidths=1, alpha=0.8, zorder=1)
+
     # Ponto inicial e final
-    ax.scatter(*q_start, s=120, color='limegreen', marker='o', edgecolors='black',
-               label='Ponto inicial (q_start)', zorder=7)
-    ax.scatter(*q_goal, s=120, color='red', marker='X', edgecolors='black',
-               label='Ponto final (q_goal)', zorder=7)
+    extremos = [ax.scatter(*q_start, s=120, color='limegreen', marker='o', edgecolors='black',
+                           label='Ponto inicial (q_start)', zorder=7),
+                ax.scatter(*q_goal, s=120, color='red', marker='X', edgecolors='black',
+                           label='Ponto final (q_goal)', zorder=7)]
 
     # Aparência geral
     ax.set_title("Caminho Final", fontsize=14, fontweight="bold", pad=12)
     ax.set_xlabel("X")
     ax.set_ylabel("Y")
     ax.grid(True, linestyle="--", alpha=0.25)
+    return extremos
+
+# =====================================================
+# Muitos caminhos sobre o mesmo mapa
+# =====================================================
+class RenderizadorCaminhos:
+    """Desenha muitos caminhos sobre um fundo (obstáculos + grafo) desenhado uma vez só.
+
+    Sem janela: a figura é Agg. Para PNG o fundo rasterizado fica guardado
+    e cada caminho só restaura os pixels e desenha a própria linha por
+    cima; para formatos vetoriais (SVG, PDF) a figura é gravada inteira,
+    mas os artistas do fundo continuam sendo reaproveitados.
+    """
+
+    def __init__(self, obstaculos, q_start, q_goal, grafo=None, tamanho=(10, 8), dpi=100):
+        self.dpi = dpi
+        self.fig, self.ax = figura(saida=True, tamanho=tamanho)
+        self.fig.set_dpi(dpi)
+        self.extremos = _fundo_caminho(self.ax, obstaculos, q_start, q_goal, grafo)
+
+        # Artistas do caminho, desenhados à parte (fora do fundo)
+        self.linha, = self.ax.plot([], [], color='red', linewidth=3.5, alpha=0.95, zorder=5, animated=True)
+        self.pontos = self.ax.scatter([], [], s=30, color='darkred', zorder=6, label="Caminho", animated=True)
+
+        # Legenda e enquadramento fixos, como em `exibicao`; o espaço da legenda é
+        # reservado depois do tight_layout, porque o fundo não pode mudar de tamanho
+        self.ax.set_aspect('equal', 'box')
+        self.fig.tight_layout()
+        box = self.ax.get_position()
+        self.ax.set_position([box.x0, box.y0, box.width * 0.75, box.height])
+        self.ax.legend(loc='center left', bbox_to_anchor=(1.02, 0.5), frameon=True, shadow=True)
+        self._fundo = None
+
+    def _atualizar(self, caminho):
+        coords = np.asarray(caminho if caminho else [], dtype=float).reshape(-1, 2)
+        self.linha.set_data(coords[:, 0], coords[:, 1])
+        self.pontos.set_offsets(coords)
+
+    def imagem(self, caminho):
+        """Array RGBA (altura, largura, 4) com `caminho` sobre o fundo."""
+        canvas = self.fig.canvas
+        if self._fundo is None:
+            canvas.draw()
+            self._fundo = canvas.copy_from_bbox(self.fig.bbox)
+        canvas.restore_region(self._fundo)
+        self._atualizar(caminho)
+        self.ax.draw_artist(self.linha)
+        self.ax.draw_artist(self.pontos)
+        # q_start e q_goal ficam por cima do caminho, como no desenho completo
+        for artista in self.extremos:
+            self.ax.draw_artist(artista)
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+    def renderizar(self, caminho, saida=None, formato=None):
+        """Grava `caminho` em `saida` (arquivo ou buffer); sem `saida`, devolve os bytes do PNG."""
+        buffer = io.BytesIO() if saida is None else None
+        destino = buffer if saida is None else saida
+        if formato is None:
+            formato = 'png' if not isinstance(destino, str) else destino.rsplit('.', 1)[-1].lower()
+
+        if formato == 'png':
+            matplotlib.image.imsave(destino, self.imagem(caminho), format='png', dpi=self.dpi)
+        else:
+            # Vetorial: os artistas do caminho entram no desenho normal só durante a gravação
+            self._atualizar(caminho)
+            self.linha.set_animated(False)
+            self.pontos.set_animated(False)
+            try:
+                self.fig.savefig(destino, format=formato, dpi=self.dpi)
+            finally:
+                self.linha.set_animated(True)
+                self.pontos.set_animated(True)
+        return buffer.getvalue() if buffer is not None else None
 
-    exibicao(ax)
\ No newline at end of file
+    def renderizar_lote(self, caminhos, padrao, formato=None):
+        """Grava cada caminho em `padrao.format(i)` (ex.: 'caminho_{:04d}.png'); devolve os nomes."""
+        arquivos = []
+        for i, caminho in enumerate(caminhos):
+            arquivo = padrao.format(i)
+            self.renderizar(caminho, arquivo, formato)
+            arquivos.append(arquivo)
+        return arquivos
\ No newline at end of file
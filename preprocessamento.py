@@ -0,0 +1,154 @@
+import sys
+import math
+import argparse
+import numpy as np
+
+import instrumentos
+from geometria import orientacao, anti_horario, _shapely
+from mapa import ler_mapa, salvar_mapa_texto
+
+# =====================================================
+# Contornos
+# =====================================================
+
+def limpar_contorno(contorno, colinear=0.0):
+    """Contorno sem vértices repetidos nem colineares (inclui pontas de área zero).
+
+    Sai o vértice a até `colinear` da reta entre os vizinhos; com
+    `colinear=0` o teste é exato (`geometria.orientacao`) e só sai o que não
+    muda o polígono. Devolve [] se sobrar menos de três vértices.
+    """
+    def dispensavel(a, b, c):
+        if colinear <= 0 or a == c:
+            return orientacao(a, b, c) == 0
+        cruzado = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+        return abs(cruzado) <= colinear * math.hypot(c[0] - a[0], c[1] - a[1])
+
+    pontos = []
+    for p in map(tuple, np.asarray(contorno, dtype=float).tolist()):
+        # Pilha: o topo sai enquanto ficar sobre a reta entre o anterior e o novo ponto
+        if pontos and p == pontos[-1]:
+            continue
+        while len(pontos) >= 2 and dispensavel(pontos[-2], pontos[-1], p):
+            pontos.pop()
+        pontos.append(p)
+    while len(pontos) > 1 and pontos[0] == pontos[-1]:
+        pontos.pop()
+    # A pilha não vê a emenda do contorno: primeiro e último vértices voltam a ser testados
+    while len(pontos) >= 3:
+        if dispensavel(pontos[-2], pontos[-1], pontos[0]):
+            pontos.pop()
+        elif dispensavel(pontos[-1], pontos[0], pontos[1]):
+            pontos.pop(0)
+        else:
+            break
+    return pontos if len(pontos) >= 3 else []
+
+def _partes(geometria):
+    # Polígonos simples de um resultado do shapely (Polygon, MultiPolygon ou GeometryCollection)
+    if geometria.is_empty:
+        return []
+    if geometria.geom_type == 'Polygon':
+        return [geometria]
+    if hasattr(geometria, 'geoms'):
+        return [p for g in geometria.geoms for p in _partes(g)]
+    return []
+
+# =====================================================
+# Pré-processamento
+# =====================================================
+
+def preprocessar(obstaculos, raio=0.0, tolerancia=0.0, unir=True, q_start=None, q_goal=None, colinear=1e-9):
+    """Obstáculos prontos para o grafo de visibilidade: `(obstaculos, relatorio)`.
+
+    Na ordem: polígonos inválidos são corrigidos (`make_valid`), os
+    obstáculos crescem `raio` (o tamanho do robô, para planejar com ele como
+    um ponto), os que se sobrepõem ou se tocam viram um só (`unir`), o
+    contorno é simplificado com `tolerancia` (Douglas-Peucker, sem criar
+    auto-interseções) e saem vértices repetidos e colineares (a até
+    `colinear` vezes o tamanho do mapa da reta dos vizinhos, o que pega as
+    subdivisões de arestas arredondadas em ponto flutuante). Buracos de uma
+    união (espaço livre cercado por obstáculos) são preenchidos, já que o
+    formato do mapa não os representa.
+
+    O crescimento usa quinas em esquadria (limitadas a 2 * `raio`), que
+    contêm a soma de Minkowski com o disco sem o arco de vértices da versão
+    redonda. A simplificação pode mover o contorno em até `tolerancia`, para
+    dentro ou para fora.
+
+    `relatorio` traz as contagens de obstáculos e vértices antes e depois,
+    `vertices_removidos`, `buracos_preenchidos` e, se `q_start`/`q_goal`
+    forem dados, se cada um ficou dentro de um obstáculo.
+    """
+    shapely = _shapely()
+    obstaculos = [list(obst) for obst in obstaculos]
+    vertices_antes = sum(len(obst) for obst in obstaculos)
+
+    poligonos = []
+    for obst in obstaculos:
+        if len(obst) < 3:
+            continue
+        pol = shapely.geometry.Polygon(obst)
+        if not pol.is_valid:
+            # Contorno que se cruza (comum em mapas exportados de CAD): vira as suas partes válidas
+            pol = shapely.make_valid(pol)
+        poligonos += [p for p in _partes(pol) if p.area > 0]
+
+    if raio > 0:
+        poligonos = [p for pol in poligonos
+                     for p in _partes(pol.buffer(raio, join_style='mitre', mitre_limit=2.0))]
+    if unir and poligonos:
+        poligonos = _partes(shapely.union_all(poligonos))
+    if tolerancia > 0:
+        poligonos = [p for pol in poligonos for p in _partes(pol.simplify(tolerancia, preserve_topology=True))]
+
+    buracos = sum(len(pol.interiors) for pol in poligonos)
+    if poligonos:
+        x0, y0, x1, y1 = shapely.union_all([pol.envelope for pol in poligonos]).bounds
+        colinear *= max(x1 - x0, y1 - y0)
+    resultado = []
+    for pol in poligonos:
+        contorno = limpar_contorno(pol.exterior.coords, colinear)
+        if contorno:
+            resultado.append(anti_horario(contorno))
+
+    vertices_depois = sum(len(obst) for obst in resultado)
+    relatorio = {'obstaculos_antes': len(obstaculos), 'obstaculos_depois': len(resultado),
+                 'vertices_antes': vertices_antes, 'vertices_depois': vertices_depois,
+                 'vertices_removidos': vertices_antes - vertices_depois,
+                 'buracos_preenchidos': buracos}
+    for nome, ponto in (('inicio_bloqueado', q_start), ('objetivo_bloqueado', q_goal)):
+        if ponto is not None:
+            p = shapely.geometry.Point(ponto)
+            relatorio[nome] = any(shapely.geometry.Polygon(obst).contains(p) for obst in resultado)
+    instrumentos.contar(vertices_removidos=relatorio['vertices_removidos'])
+    return resultado, relatorio
+
+def resumo(relatorio):
+    """Relatório de `preprocessar` em uma linha."""
+    texto = (f"{relatorio['obstaculos_antes']} -> {relatorio['obstaculos_depois']} obstáculos, "
+             f"{relatorio['vertices_antes']} -> {relatorio['vertices_depois']} vértices "
+             f"({relatorio['vertices_removidos']} removidos)")
+    if relatorio['buracos_preenchidos']:
+        texto += f", {relatorio['buracos_preenchidos']} buracos preenchidos"
+    return texto
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Une, limpa, simplifica e infla os obstáculos de um mapa")
+    parser.add_argument('origem')
+    parser.add_argument('destino', help="mapa pré-processado, no formato texto")
+    parser.add_argument('--raio', type=float, default=0.0, help="raio do robô: quanto os obstáculos crescem")
+    parser.add_argument('--tolerancia', type=float, default=0.0, help="tolerância da simplificação dos contornos")
+    parser.add_argument('--sem-uniao', action='store_true', help="não une obstáculos sobrepostos")
+    args = parser.parse_args()
+
+    q_start, q_goal, obstaculos = ler_mapa(args.origem)
+    obstaculos, relatorio = preprocessar(obstaculos, args.raio, args.tolerancia, not args.sem_uniao, q_start, q_goal)
+    coords = np.array([v for obst in obstaculos for v in obst], dtype=float).reshape(-1, 2)
+    offsets = np.concatenate([[0], np.cumsum([len(obst) for obst in obstaculos], dtype=np.int64)])
+    salvar_mapa_texto(args.destino, q_start, q_goal, coords, offsets)
+
+    print(resumo(relatorio), file=sys.stderr)
+    for nome, ponto in (('inicio_bloqueado', 'q_start'), ('objetivo_bloqueado', 'q_goal')):
+        if relatorio[nome]:
+            print(f"Aviso: {ponto} ficou dentro de um obstáculo", file=sys.stderr)
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+
+from mapa import ler_mapa
+from lote import Planejador, registro
+
+# Protocolo: um objeto JSON por linha, nos dois sentidos. Cada pedido tem "op" e, opcionalmente,
+# "id", devolvido na resposta (respostas de uma mesma conexão podem sair fora de ordem)
+#
+#   {"op": "carregar", "mapa": "galpao", "arquivo": "mapa.txt", "parametros": {"metodo": "vetorizado"}}
+#   {"op": "carregar", "mapa": "galpao", "q_start": [x, y], "q_goal": [x, y], "obstaculos": [[[x, y], ...], ...]}
+#   {"op": "caminho", "mapa": "galpao", "inicio": [x, y], "fim": [x, y]}
+#   {"op": "descarregar", "mapa": "galpao"}    {"op": "mapas"}    {"op": "estatisticas"}
+#   {"op": "ping"}    {"op": "encerrar"}
+
+# =====================================================
+# Construção dos mapas (processos do pool)
+# =====================================================
+
+def _construir(arquivo, q_start, q_goal, obstaculos, parametros):
+    # Roda num processo do pool: leitura do mapa, grafo (do cache em disco ou construído agora) e
+    # índices do Planejador (obstáculos preparados, cones), que volta pronto por pickle
+    if arquivo is not None:
+        q_start, q_goal, obstaculos = ler_mapa(arquivo)
+    return Planejador(q_start, q_goal, obstaculos, **parametros)
+
+# =====================================================
+# Latências
+# =====================================================
+
+class Latencias:
+    """Tempos das últimas `limite` operações de cada tipo, para percentis."""
+
+    def __init__(self, limite=10_000):
+        self.limite = limite
+        self.amostras = {}
+        self.totais = {}
+        self.inicio = time.monotonic()
+
+    def registrar(self, op, segundos):
+        self.amostras.setdefault(op, deque(maxlen=self.limite)).append(segundos)
+        self.totais[op] = self.totais.get(op, 0) + 1
+
+    def resumo(self):
+        decorrido = time.monotonic() - self.inicio
+        resumo = {}
+        for op, amostras in self.amostras.items():
+            ms = np.array(amostras) * 1000
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99]).tolist()
+            resumo[op] = {'total': self.totais[op], 'por_segundo': self.totais[op] / decorrido,
+                          'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': float(ms.max())}
+        return resumo
+
+# =====================================================
+# Servidor
+# =====================================================
+
+class ServidorPlanejamento:
+    """Planejador residente: mapas carregados em memória, consultas concorrentes por socket.
+
+    Cada mapa vira um `Planejador` (grafo, índices e motor de caminhos).
+    Construções vão inteiras para um pool de processos, então consultas a
+    outros mapas (e ao mesmo, na versão antiga) seguem respondendo; quando
+    a nova versão fica pronta ela entra no lugar da antiga numa única
+    atribuição. Cargas do mesmo mapa podem terminar fora de ordem: cada uma
+    recebe um número ao começar e só troca o mapa se nenhuma carga mais
+    nova já o trocou; `descarregar` também descarta as cargas em andamento.
+    Consultas que chegam juntas para um mesmo mapa são planejadas em lote
+    (`Planejador.planejar_lote`) numa thread à parte, fora do laço de eventos.
+    """
+
+    def __init__(self, workers=2, lote_maximo=256):
+        self.mapas = {}
+        self.versoes = {}
+        self._cargas = {}
+        self._instaladas = {}
+        self.latencias = Latencias()
+        self.lote_maximo = lote_maximo
+        self._construtores = ProcessPoolExecutor(workers)
+        # Uma thread só: o planejamento é CPU puro (GIL) e o motor guarda cache entre consultas
+        self._planejamento = ThreadPoolExecutor(1)
+        self._filas = {}
+        self._consumidores = {}
+        self._encerrar = None
+        self._conexoes = {}
+
+    # ---------- mapas ----------
+
+    async def carregar(self, nome, arquivo=None, q_start=None, q_goal=None, obstaculos=None, parametros=None):
+        if arquivo is None and obstaculos is None:
+            raise ValueError("Informe 'arquivo' ou 'q_start', 'q_goal' e 'obstaculos'")
+        parametros = dict(parametros or {})
+        parametros.setdefault('metodo', 'vetorizado')
+        loop = asyncio.get_running_loop()
+        if q_start is not None:
+            q_start, q_goal = tuple(q_start), tuple(q_goal)
+            obstaculos = [[tuple(v) for v in obst] for obst in obstaculos]
+        carga = self._cargas[nome] = self._cargas.get(nome, 0) + 1
+        planejador = await loop.run_in_executor(
+            self._construtores, _construir, arquivo, q_start, q_goal, obstaculos, parametros)
+        grafo = planejador.grafo
+        if carga < self._instaladas.get(nome, 0):
+            # Uma carga que começou depois já terminou e trocou o mapa: esta chegou atrasada
+            return {'mapa': nome, 'versao': self.versoes.get(nome, 0), 'vertices': len(grafo),
+                    'arestas': grafo.num_arestas, 'descartada': True}
+        # Troca atômica: consultas já em lote terminam na versão antiga, as próximas usam a nova
+        self.mapas[nome] = planejador
+        self._instaladas[nome] = carga
+        self.versoes[nome] = self.versoes.get(nome, 0) + 1
+        return {'mapa': nome, 'versao': self.versoes[nome], 'vertices': len(grafo), 'arestas': grafo.num_arestas}
+
+    def descarregar(self, nome):
+        # Cargas em andamento ficam velhas: terminam descartadas; só uma que comece depois instala o mapa
+        self._cargas[nome] = self._instaladas[nome] = self._cargas.get(nome, 0) + 1
+        # Consultas ainda na fila (ou no lote em andamento) do mapa falham em vez de esperar para sempre
+        consumidor = self._consumidores.pop(nome, None)
+        if consumidor is not None:
+            consumidor.cancel()
+        fila = self._filas.pop(nome, None)
+        erro = KeyError(f"Mapa não carregado: {nome}")
+        while fila is not None and not fila.empty():
+            _, pronto = fila.get_nowait()
+            if not pronto.done():
+                pronto.set_exception(erro)
+        if self.mapas.pop(nome, None) is None:
+            raise erro
+        return {'mapa': nome}
+
+    # ---------- consultas ----------
+
+    async def caminho(self, nome, inicio, fim):
+        if nome not in self.mapas:
+            raise KeyError(f"Mapa não carregado: {nome}")
+        if nome not in self._filas:
+            self._filas[nome] = asyncio.Queue()
+            self._consumidores[nome] = asyncio.create_task(self._consumir(nome))
+        pronto = asyncio.get_running_loop().create_future()
+        await self._filas[nome].put(((tuple(inicio), tuple(fim)), pronto))
+        return await pronto
+
+    async def _consumir(self, nome):
+        # Junta o que já está na fila num lote e planeja tudo numa chamada
+        fila = self._filas[nome]
+        loop = asyncio.get_running_loop()
+        while True:
+            pedidos = [await fila.get()]
+            while not fila.empty() and len(pedidos) < self.lote_maximo:
+                pedidos.append(fila.get_nowait())
+            planejador = self.mapas.get(nome)
+            try:
+                if planejador is None:
+                    raise KeyError(f"Mapa não carregado: {nome}")
+                consultas = [consulta for consulta, _ in pedidos]
+                resultados = await loop.run_in_executor(self._planejamento, planejador.planejar_lote, consultas)
+            except asyncio.CancelledError:
+                # Mapa descarregado no meio do lote
+                for _, pronto in pedidos:
+                    if not pronto.done():
+                        pronto.set_exception(KeyError(f"Mapa não carregado: {nome}"))
+                raise
+            except Exception as e:
+                for _, pronto in pedidos:
+                    if not pronto.done():
+                        pronto.set_exception(e)
+                continue
+            for ((inicio, fim), pronto), (caminho, distancia) in zip(pedidos, resultados):
+                if not pronto.done():
+                    pronto.set_result(registro(None, inicio, fim, caminho, distancia))
+
+    # ---------- protocolo ----------
+
+    async def responder(self, pedido):
+        op = pedido.get('op')
+        if op == 'caminho':
+            return await self.caminho(pedido['mapa'], pedido['inicio'], pedido['fim'])
+        if op == 'carregar':
+            return await self.carregar(pedido['mapa'], pedido.get('arquivo'), pedido.get('q_start'),
+                                       pedido.get('q_goal'), pedido.get('obstaculos'), pedido.get('parametros'))
+        if op == 'descarregar':
+            return self.descarregar(pedido['mapa'])
+        if op == 'mapas':
+            return {'mapas': {nome: {'versao': self.versoes[nome], 'vertices': len(p.grafo),
+                                     'arestas': p.grafo.num_arestas} for nome, p in self.mapas.items()}}
+        if op == 'estatisticas':
+            return {'latencias': self.latencias.resumo(),
+                    'fila': {nome: fila.qsize() for nome, fila in self._filas.items()}}
+        if op == 'ping':
+            return {}
+        if op == 'encerrar':
+            return {}
+        raise ValueError(f"Operação desconhecida: {op!r}")
+
+    async def _atender(self, pedido, escrever):
+        inicio = time.perf_counter()
+        try:
+            resposta = {'ok': True, **await self.responder(pedido)}
+        except KeyError as e:
+            # str() de KeyError vem entre aspas
+            resposta = {'ok': False, 'erro': str(e.args[0]) if e.args else 'KeyError'}
+        except (ValueError, TypeError) as e:
+            resposta = {'ok': False, 'erro': str(e)}
+        except Exception as e:
+            resposta = {'ok': False, 'erro': f"{type(e).__name__}: {e}"}
+        self.latencias.registrar(str(pedido.get('op')), time.perf_counter() - inicio)
+        if 'id' in pedido:
+            resposta['id'] = pedido['id']
+        await escrever(resposta)
+        if pedido.get('op') == 'encerrar':
+            # Só depois de responder: ao encerrar, as conexões ainda abertas são fechadas
+            self._encerrar.set()
+
+    async def conexao(self, leitor, escritor):
+        trava = asyncio.Lock()
+        tarefas = set()
+        self._conexoes[asyncio.current_task()] = escritor
+
+        async def escrever(resposta):
+            async with trava:
+                escritor.write((json.dumps(resposta, ensure_ascii=False) + '\n').encode())
+                await escritor.drain()
+
+        try:
+            while linha := await leitor.readline():
+                if not linha.strip():
+                    continue
+                try:
+                    pedido = json.loads(linha)
+                    if not isinstance(pedido, dict):
+                        raise ValueError("pedido deve ser um objeto JSON")
+                except ValueError as e:
+                    await escrever({'ok': False, 'erro': f"JSON inválido: {e}"})
+                    continue
+                # Cada pedido em sua tarefa: uma carga demorada não segura as consultas da mesma conexão
+                tarefa = asyncio.create_task(self._atender(pedido, escrever))
+                tarefas.add(tarefa)
+                tarefa.add_done_callback(tarefas.discard)
+            if tarefas:
+                await asyncio.gather(*tarefas, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self._conexoes.pop(asyncio.current_task(), None)
+            escritor.close()
+
+    async def servir(self, socket_unix=None, porta=None, host='127.0.0.1', pronto=None):
+        """Atende até receber `encerrar`; `pronto` (um asyncio.Event) é marcado quando o socket está ouvindo."""
+        self._encerrar = asyncio.Event()
+        if socket_unix is not None:
+            if os.path.exists(socket_unix):
+                os.remove(socket_unix)
+            servidor = await asyncio.start_unix_server(self.conexao, socket_unix, limit=1 << 26)
+        else:
+            servidor = await asyncio.start_server(self.conexao, host, porta, limit=1 << 26)
+        if pronto is not None:
+            pronto.set()
+        async with servidor:
+            await self._encerrar.wait()
+            servidor.close()
+            # Fechar o transporte faz o readline de cada conexão devolver EOF
+            for escritor in list(self._conexoes.values()):
+                escritor.close()
+            await asyncio.gather(*self._conexoes, return_exceptions=True)
+        for tarefa in self._consumidores.values():
+            tarefa.cancel()
+        self._construtores.shutdown(cancel_futures=True)
+        self._planejamento.shutdown()
+        if socket_unix is not None and os.path.exists(socket_unix):
+            os.remove(socket_unix)
+
+# =====================================================
+# Cliente
+# =====================================================
+
+class ClientePlanejamento:
+    """Cliente síncrono do servidor: um pedido por vez, numa conexão persistente."""
+
+    def __init__(self, socket_unix=None, porta=None, host='127.0.0.1', timeout=None):
+        if socket_unix is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(socket_unix)
+        else:
+            self.sock = socket.create_connection((host, porta))
+        self.sock.settimeout(timeout)
+        self.arquivo = self.sock.makefile('rwb')
+        self._proximo = 0
+
+    def pedir(self, op, **campos):
+        """Envia um pedido e devolve a resposta; `RuntimeError` se o servidor respondeu com erro."""
+        self._proximo += 1
+        self.arquivo.write((json.dumps({'op': op, 'id': self._proximo, **campos}) + '\n').encode())
+        self.arquivo.flush()
+        linha = self.arquivo.readline()
+        if not linha:
+            raise ConnectionError("Servidor fechou a conexão")
+        resposta = json.loads(linha)
+        if not resposta.get('ok'):
+            raise RuntimeError(resposta.get('erro'))
+        return resposta
+
+    def carregar(self, mapa, arquivo, **parametros):
+        return self.pedir('carregar', mapa=mapa, arquivo=os.path.abspath(arquivo), parametros=parametros)
+
+    def caminho(self, mapa, inicio, fim):
+        return self.pedir('caminho', mapa=mapa, inicio=list(inicio), fim=list(fim))
+
+    def estatisticas(self):
+        return self.pedir('estatisticas')['latencias']
+
+    def fechar(self):
+        self.arquivo.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor residente de planejamento de caminhos")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument('--socket', help="caminho do socket Unix")
+    grupo.add_argument('--porta', type=int, help="porta TCP em 127.0.0.1")
+    parser.add_argument('--workers', type=int, default=2, help="processos para construir mapas")
+    parser.add_argument('--mapa', action='append', default=[], metavar='NOME=ARQUIVO',
+                        help="mapa carregado na partida (pode repetir)")
+    args = parser.parse_args()
+
+    async def principal():
+        servidor = ServidorPlanejamento(args.workers)
+        for item in args.mapa:
+            nome, _, arquivo = item.partition('=')
+            info = await servidor.carregar(nome, os.path.abspath(arquivo or nome))
+            print(f"Mapa '{nome}': {info['vertices']} vértices, {info['arestas']} arestas", file=sys.stderr)
+        onde = args.socket or f"127.0.0.1:{args.porta}"
+        print(f"Ouvindo em {onde}", file=sys.stderr)
+        await servidor.servir(args.socket, args.porta)
+
+    asyncio.run(principal())
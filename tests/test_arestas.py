@@ -0,0 +1,94 @@
+"""Arquivo de arestas: ordenação externa em vários trechos e Kruskal externo."""
+import math
+
+import numpy as np
+import pytest
+
+import instrumentos
+from arestas import TIPO_ARESTA, abrir_arestas, gravar_arestas, ordenar_arestas
+from arvore import floresta_geradora_minima, kruskal, kruskal_externo
+from gerador import gerar_mapa
+from grafo import arestas_em_fluxo, grafo_visibilidade, pontos_visibilidade
+
+
+def arquivo_do_mapa(tmp_path, semente, max_distancia=None):
+    q_start, q_goal, obstaculos = gerar_mapa('desordenado', 12, vertices=5, semente=semente)
+    pontos = pontos_visibilidade(q_start, q_goal, obstaculos)
+    arquivo = tmp_path / f'mapa{semente}.arestas'
+    gravar_arestas(arquivo, pontos, arestas_em_fluxo(pontos, obstaculos, max_distancia=max_distancia,
+                                                     fontes_por_bloco=16))
+    grafo = grafo_visibilidade(q_start, q_goal, obstaculos, max_distancia=max_distancia, metodo='vetorizado')
+    return arquivo, grafo, q_start
+
+
+def arquivo_com_empates(tmp_path, semente, n=2000):
+    # Pesos inteiros de 1 a 4 e pares repetidos: a ordem depende do desempate por (u, v)
+    rng = np.random.default_rng(semente)
+    pontos = rng.uniform(0, 10, size=(30, 2))
+    i, j = rng.integers(0, 30, size=(2, n))
+    i, j = i[i != j], j[i != j]
+    pesos = rng.integers(1, 5, size=len(i)).astype(float)
+    arquivo = tmp_path / f'empates{semente}.arestas'
+    gravar_arestas(arquivo, pontos, [(i[a:a + 500], j[a:a + 500], pesos[a:a + 500]) for a in range(0, len(i), 500)])
+    return arquivo
+
+
+def conferir_ordenacao(origem, destino, memoria_bytes, max_trechos):
+    with instrumentos.coletando() as relatorio:
+        ordenar_arestas(origem, destino, memoria_bytes, max_trechos=max_trechos)
+    coords, arestas = abrir_arestas(origem)
+    coords_ordenadas, ordenadas = abrir_arestas(destino)
+    esperado = np.asarray(arestas)[np.lexsort((arestas['v'], arestas['u'], arestas['peso']))]
+    assert np.array_equal(coords_ordenadas, coords)
+    assert np.array_equal(np.asarray(ordenadas), esperado)
+    assert np.array_equal(np.sort(ordenadas['peso']), np.sort(arestas['peso']))
+    return {e['etapa']: e for e in relatorio.etapas}
+
+
+@pytest.mark.parametrize('memoria_bytes, max_trechos', [
+    (64 * TIPO_ARESTA.itemsize, 64),      # vários trechos, uma intercalação
+    (50 * TIPO_ARESTA.itemsize, 3),       # trechos demais: várias passadas
+    (TIPO_ARESTA.itemsize, 64),           # trechos de uma aresta, janelas mínimas
+])
+def test_ordenacao_em_varios_trechos(tmp_path, memoria_bytes, max_trechos):
+    origem, _, _ = arquivo_do_mapa(tmp_path, 0)
+    etapas = conferir_ordenacao(origem, tmp_path / 'ordenadas.arestas', memoria_bytes, max_trechos)
+    _, arestas = abrir_arestas(origem)
+    trechos = math.ceil(len(arestas) / (memoria_bytes // TIPO_ARESTA.itemsize))
+    assert etapas['ordenar_trechos']['trechos'] == trechos > 1
+    assert (etapas['intercalar']['passadas'] > 1) == (trechos > max_trechos)
+
+
+@pytest.mark.parametrize('semente', range(3))
+def test_ordenacao_com_empates(tmp_path, semente):
+    origem = arquivo_com_empates(tmp_path, semente)
+    conferir_ordenacao(origem, tmp_path / 'ordenadas.arestas', 37 * TIPO_ARESTA.itemsize, 4)
+
+
+@pytest.mark.parametrize('semente', range(2))
+@pytest.mark.parametrize('max_distancia', [None, 4.0])
+def test_kruskal_externo_igual_ao_kruskal(tmp_path, semente, max_distancia):
+    arquivo, grafo, q_start = arquivo_do_mapa(tmp_path, semente, max_distancia)
+    memoria_bytes = 40 * TIPO_ARESTA.itemsize
+    inicios = [q_start] + list(grafo)[::11]
+    for inicio in inicios:
+        mst, total_peso, visitado = kruskal_externo(arquivo, inicio, memoria_bytes=memoria_bytes)
+        esperado, peso_esperado, visitado_esperado = kruskal(grafo, inicio)
+        assert visitado == visitado_esperado
+        assert len(mst) == len(esperado)
+        assert math.isclose(total_peso, peso_esperado, rel_tol=1e-12)
+
+    # Sem início: a floresta de todas as componentes
+    floresta, total_peso, visitado = kruskal_externo(arquivo, memoria_bytes=memoria_bytes)
+    esperada, peso_esperado, componentes = floresta_geradora_minima(grafo)
+    assert visitado == set(grafo)
+    assert len(floresta) == len(esperada) == len(grafo) - len(set(componentes.values()))
+    assert math.isclose(total_peso, peso_esperado, rel_tol=1e-12)
+
+
+def test_kruskal_externo_ja_ordenado_e_inicio_fora(tmp_path):
+    arquivo, grafo, q_start = arquivo_do_mapa(tmp_path, 0)
+    ordenadas = tmp_path / 'ordenadas.arestas'
+    ordenar_arestas(arquivo, ordenadas, 1 << 10)
+    assert kruskal_externo(ordenadas, q_start, ordenado=True) == kruskal_externo(arquivo, q_start, memoria_bytes=1 << 10)
+    assert kruskal_externo(arquivo, (-99.0, -99.0)) == kruskal(grafo, (-99.0, -99.0)) == ([], 0.0, {(-99.0, -99.0)})
@@ -0,0 +1,142 @@
+"""Algoritmos de MST e a floresta de Borůvka conferidos com o `prim` original sobre o dicionário."""
+import math
+
+import pytest
+
+from arvore import arvore_geradora_minima, estatisticas_mst, floresta_geradora_minima, prim, validar_mst
+from compacto import GrafoCompacto
+from gerador import gerar_mapa
+from grafo import grafo_visibilidade
+
+
+def grafo_de_mapa(tipo, semente, max_distancia=None):
+    q_start, q_goal, obstaculos = gerar_mapa(tipo, 9, vertices=5, semente=semente)
+    return q_start, grafo_visibilidade(q_start, q_goal, obstaculos, max_distancia=max_distancia, metodo='vetorizado')
+
+
+def grade(lado=6):
+    # Reticulado com todas as arestas de peso 1: empates por toda parte
+    G = {(x, y): [] for x in range(lado) for y in range(lado)}
+    for x, y in G:
+        for w in ((x + 1, y), (x, y + 1)):
+            if w in G:
+                G[(x, y)].append((w, 1.0))
+                G[w].append(((x, y), 1.0))
+    return G
+
+
+def conferir_arvore(G, inicio, resultado):
+    mst, total_peso, visitado = resultado
+    esperado, peso_esperado, visitado_esperado = prim(G, inicio)
+    assert visitado == visitado_esperado
+    assert math.isclose(total_peso, peso_esperado, rel_tol=1e-12, abs_tol=1e-12)
+    assert math.isclose(sum(peso for _, _, peso in mst), total_peso, rel_tol=1e-12, abs_tol=1e-12)
+    assert len(mst) == len(esperado)
+
+    # Árvore de verdade sobre `visitado`: arestas do grafo, sem ciclo
+    pai = {v: v for v in visitado}
+
+    def raiz(v):
+        while pai[v] != v:
+            v = pai[v]
+        return v
+
+    for u, v, peso in mst:
+        assert (v, peso) in G[u]
+        assert raiz(u) != raiz(v)
+        pai[raiz(u)] = raiz(v)
+
+
+@pytest.mark.parametrize('metodo', ['heap', 'denso', 'kruskal', 'auto'])
+@pytest.mark.parametrize('tipo', ['convexo', 'armazem', 'desordenado'])
+@pytest.mark.parametrize('max_distancia', [None, 6.0])
+def test_mapas_gerados(metodo, tipo, max_distancia):
+    for semente in range(2):
+        inicio, G = grafo_de_mapa(tipo, semente, max_distancia)
+        conferir_arvore(G, inicio, arvore_geradora_minima(G, inicio, metodo))
+        conferir_arvore(G, inicio, arvore_geradora_minima(GrafoCompacto.de_dicionario(G), inicio, metodo))
+
+
+@pytest.mark.parametrize('metodo', ['heap', 'denso', 'kruskal'])
+def test_grafo_desconexo(metodo):
+    # Com max_distancia curta o grafo se parte: só a componente de cada início entra na árvore
+    _, G = grafo_de_mapa('armazem', 0, max_distancia=4.0)
+    for inicio in list(G)[::7]:
+        conferir_arvore(G, inicio, arvore_geradora_minima(G, inicio, metodo))
+
+
+@pytest.mark.parametrize('metodo', ['heap', 'denso', 'kruskal'])
+def test_pesos_empatados(metodo):
+    G = grade()
+    for inicio in [(0, 0), (3, 2)]:
+        resultado = arvore_geradora_minima(G, inicio, metodo)
+        conferir_arvore(G, inicio, resultado)
+        assert resultado[1] == len(G) - 1
+
+
+@pytest.mark.parametrize('metodo', ['heap', 'denso', 'kruskal'])
+def test_inicio_fora_do_grafo(metodo):
+    G = grade(3)
+    assert arvore_geradora_minima(G, (9, 9), metodo) == ([], 0.0, {(9, 9)})
+    assert arvore_geradora_minima(GrafoCompacto.de_dicionario(G), (9, 9), metodo) == ([], 0.0, {(9, 9)})
+
+
+def componentes_bfs(G):
+    vistos, partes = set(), []
+    for s in G:
+        if s in vistos:
+            continue
+        vistos.add(s)
+        fila = [s]
+        for u in fila:
+            for w, _ in G[u]:
+                if w not in vistos:
+                    vistos.add(w)
+                    fila.append(w)
+        partes.append(frozenset(fila))
+    return partes
+
+
+def fragmentados():
+    # Mapas partidos por max_distancia curta, com um vértice isolado a mais; e a grade de empates
+    for tipo, semente in [('armazem', 0), ('desordenado', 1), ('convexo', 2)]:
+        _, G = grafo_de_mapa(tipo, semente, max_distancia=4.0)
+        G[(-10.0, -10.0)] = []
+        yield G
+    yield grade()
+
+
+@pytest.mark.parametrize('compacto', [False, True])
+def test_floresta_igual_ao_prim_por_componente(compacto):
+    for G in fragmentados():
+        floresta, total_peso, componentes = floresta_geradora_minima(GrafoCompacto.de_dicionario(G) if compacto else G)
+        partes = componentes_bfs(G)
+
+        # Rótulos 0..k-1, um por componente da busca em largura
+        por_rotulo = {}
+        for v, rotulo in componentes.items():
+            por_rotulo.setdefault(rotulo, set()).add(v)
+        assert set(por_rotulo) == set(range(len(partes)))
+        assert {frozenset(p) for p in por_rotulo.values()} == set(partes)
+
+        # Peso de cada árvore igual ao do Prim a partir de um vértice da componente
+        pesos = {rotulo: prim(G, next(iter(p)))[1] for rotulo, p in por_rotulo.items()}
+        assert math.isclose(total_peso, sum(pesos.values()), rel_tol=1e-12, abs_tol=1e-12)
+        for rotulo, stats in estatisticas_mst(floresta, componentes)['por_componente'].items():
+            assert math.isclose(stats['peso_total'], pesos[rotulo], rel_tol=1e-12, abs_tol=1e-12)
+            assert stats['num_arestas'] == len(por_rotulo[rotulo]) - 1
+
+        validacao = validar_mst(G, floresta, set(componentes), componentes)
+        assert validacao['valida']
+        assert validacao['num_componentes'] == len(partes)
+        assert validacao['arestas_na_mst'] == validacao['arestas_esperadas'] == len(G) - len(partes)
+        assert validacao['grafo_conexo'] == (len(partes) == 1)
+
+
+def test_validar_floresta_incompleta():
+    _, G = grafo_de_mapa('armazem', 0, max_distancia=4.0)
+    floresta, _, componentes = floresta_geradora_minima(G)
+    validacao = validar_mst(G, floresta[1:], set(componentes), componentes)
+    assert not validacao['valida']
+    rotulo = componentes[floresta[0][0]]
+    assert not validacao['por_componente'][rotulo]['valida']
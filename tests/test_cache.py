@@ -0,0 +1,83 @@
+"""Cache em disco de grafos e MSTs: acertos, chave normalizada, entradas corrompidas e LRU."""
+import os
+
+import pytest
+
+from cache import CacheGrafos
+from gerador import gerar_mapa
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheGrafos(tmp_path / 'cache')
+
+
+def entradas(cache):
+    return sorted(nome for nome in os.listdir(cache.diretorio) if nome.endswith('.npz'))
+
+
+def test_acerto_e_falta(cache):
+    mapa = gerar_mapa('convexo', 6, semente=0)
+    grafo, mst, total_peso, visitado, do_cache = cache.obter(*mapa)
+    assert not do_cache and len(entradas(cache)) == 1
+
+    grafo2, mst2, total_peso2, visitado2, do_cache = cache.obter(*mapa)
+    assert do_cache
+    assert grafo2.para_dicionario() == grafo.para_dicionario()
+    assert (mst2, total_peso2, visitado2) == (mst, total_peso, visitado)
+
+    # Outro mapa, ou outro parâmetro que muda o grafo: entrada nova
+    assert not cache.obter(*gerar_mapa('convexo', 6, semente=1))[-1]
+    assert not cache.obter(*mapa, max_distancia=5.0)[-1]
+    assert len(entradas(cache)) == 3
+
+
+def test_chave_so_com_o_que_muda_o_resultado(cache):
+    mapa = gerar_mapa('convexo', 4, semente=0)
+    chave = cache.chave(*mapa)
+    assert cache.chave(*mapa, workers=4, debug=True) == chave
+    assert cache.chave(*mapa, metodo='pares', max_distancia=None, reduzido=False) == chave
+    assert cache.chave(*mapa, max_distancia=5) == cache.chave(*mapa, max_distancia=5.0) != chave
+    assert cache.chave(*mapa, metodo='vetorizado') != chave
+    assert cache.chave(*mapa, reduzido=True) != chave
+
+    # Acerto mesmo com os parâmetros neutros diferentes
+    cache.obter(*mapa)
+    assert cache.obter(*mapa, workers=2, metodo='pares')[-1]
+
+
+def test_entrada_corrompida_e_reconstruida(cache):
+    mapa = gerar_mapa('armazem', 6, semente=2)
+    _, mst, total_peso, _, _ = cache.obter(*mapa)
+    arquivo = os.path.join(cache.diretorio, entradas(cache)[0])
+    with open(arquivo, 'r+b') as f:
+        f.truncate(os.path.getsize(arquivo) // 2)
+
+    assert cache.carregar(cache.chave(*mapa)) is None
+    assert not os.path.exists(arquivo)
+    _, mst2, total_peso2, _, do_cache = cache.obter(*mapa)
+    assert not do_cache and (mst2, total_peso2) == (mst, total_peso)
+    assert cache.obter(*mapa)[-1]
+
+
+def test_lru_remove_as_usadas_ha_mais_tempo(cache):
+    mapas = [gerar_mapa('convexo', 6, semente=s) for s in range(3)]
+    chaves = [cache.chave(*mapa) for mapa in mapas]
+    for k, mapa in enumerate(mapas):
+        cache.obter(*mapa)
+        # Gravadas em ordem, com um segundo entre elas
+        os.utime(cache._arquivo(chaves[k]), (1000 + k, 1000 + k))
+
+    # Ler a mais antiga a torna a mais recente
+    assert cache.carregar(chaves[0]) is not None
+    tamanhos = {c: os.path.getsize(cache._arquivo(c)) for c in chaves}
+    cache.limite_bytes = tamanhos[chaves[0]] + tamanhos[chaves[2]]
+    cache.limpar()
+    assert entradas(cache) == sorted(c + '.npz' for c in (chaves[0], chaves[2]))
+
+    # Um temporário antigo, de um processo que morreu gravando, também sai
+    temporario = os.path.join(cache.diretorio, 'perdido.tmp')
+    open(temporario, 'wb').close()
+    os.utime(temporario, (0, 0))
+    cache.limpar()
+    assert not os.path.exists(temporario)
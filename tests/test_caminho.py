@@ -0,0 +1,110 @@
+"""Buscas do `MotorCaminhos` e do `IndiceCaminhosArvore` conferidas com buscas simples."""
+import heapq
+import math
+import random
+
+import pytest
+
+from arvore import floresta_geradora_minima
+from caminho import IndiceCaminhosArvore, MotorCaminhos, buscarCaminho
+from gerador import gerar_mapa
+from grafo import grafo_visibilidade
+
+
+def dijkstra(G, s):
+    dist = {s: 0.0}
+    pq = [(0.0, s)]
+    while pq:
+        d, u = heapq.heappop(pq)
+        if d > dist[u]:
+            continue
+        for w, peso in G[u]:
+            if d + peso < dist.get(w, math.inf):
+                dist[w] = d + peso
+                heapq.heappush(pq, (d + peso, w))
+    return dist
+
+
+def grafo_fragmentado(semente):
+    # Com max_distancia curta o grafo se parte; mais um componente isolado para garantir alvos inalcançáveis
+    q_start, q_goal, obstaculos = gerar_mapa('armazem', 12, semente=semente)
+    G = grafo_visibilidade(q_start, q_goal, obstaculos, max_distancia=6.0, metodo='vetorizado')
+    G[(-50.0, -50.0)] = [((-51.0, -50.0), 1.0)]
+    G[(-51.0, -50.0)] = [((-50.0, -50.0), 1.0)]
+    return G
+
+
+def conferir_caminho(G, caminho, distancia, esperada, s, t):
+    if esperada == math.inf:
+        assert (caminho, distancia) == (None, 0)
+        return
+    assert caminho[0] == s and caminho[-1] == t
+    pesos = [dict(G[u])[w] for u, w in zip(caminho, caminho[1:])]
+    assert math.isclose(sum(pesos), distancia, abs_tol=1e-9)
+    assert math.isclose(distancia, esperada, abs_tol=1e-9)
+
+
+@pytest.mark.parametrize('semente', range(3))
+def test_buscas_iguais_ao_dijkstra(semente):
+    G = grafo_fragmentado(semente)
+    vertices = list(G)
+    rng = random.Random(semente)
+    origens = rng.sample(vertices, 5) + [(-50.0, -50.0)]
+    for metodo in ('astar', 'dijkstra'):
+        # Cada origem é consultada várias vezes: a partir da segunda a resposta vem da árvore em cache
+        motor = MotorCaminhos(G, max_arvores=3)
+        for s in origens * 3:
+            esperado = dijkstra(G, s)
+            for t in rng.sample(vertices, 8):
+                caminho, distancia = motor.buscar(s, t, metodo)
+                conferir_caminho(G, caminho, distancia, esperado.get(t, math.inf), s, t)
+
+
+def test_vertice_desconhecido():
+    motor = MotorCaminhos(grafo_fragmentado(0))
+    assert motor.buscar((1e6, 1e6), (-50.0, -50.0)) == (None, 0)
+    assert motor.buscar((-50.0, -50.0), (1e6, 1e6), 'dijkstra') == (None, 0)
+
+
+def test_metodo_invalido_antes_de_tudo():
+    motor = MotorCaminhos(grafo_fragmentado(0))
+    s, t = (-50.0, -50.0), (-51.0, -50.0)
+    # Nem vértice desconhecido, nem origem repetida, nem árvore em cache escondem o erro
+    with pytest.raises(ValueError):
+        motor.buscar((1e6, 1e6), t, 'bfs')
+    with pytest.raises(ValueError):
+        motor.buscar(s, t, 'bfs')
+    assert not motor._vistas
+    motor.buscar(s, t)
+    motor.buscar(s, t)
+    with pytest.raises(ValueError):
+        motor.buscar(s, t, 'bfs')
+
+
+@pytest.mark.parametrize('semente', range(3))
+def test_indice_da_arvore_igual_a_buscar_caminho(semente):
+    G = grafo_fragmentado(semente)
+    floresta, _, _ = floresta_geradora_minima(G)
+    indice = IndiceCaminhosArvore(floresta)
+    rng = random.Random(semente)
+    # Vértices da floresta e um de fora
+    vertices = sorted({v for u, w, _ in floresta for v in (u, w)}) + [(1e6, 1e6)]
+    pares = [tuple(rng.sample(vertices, 2)) for _ in range(60)] + [(vertices[0], vertices[0])]
+    for u, v in pares:
+        caminho, distancia = indice.caminho(u, v)
+        esperado, esperada = buscarCaminho(u, v, floresta)
+        assert caminho == esperado
+        assert math.isclose(distancia, esperada, abs_tol=1e-9)
+        assert indice.distancia(u, v) == (math.inf if esperado is None else pytest.approx(esperada, abs=1e-9))
+
+    # Em lote, o mesmo que uma a uma
+    lote = indice.distancias(pares)
+    assert lote.tolist() == pytest.approx([indice.distancia(u, v) for u, v in pares], abs=1e-9)
+
+
+def test_indice_raiz_isolada_e_vertices_fora():
+    indice = IndiceCaminhosArvore([], raiz=(0.0, 0.0))
+    assert indice.caminho((0.0, 0.0), (0.0, 0.0)) == ([(0.0, 0.0)], 0.0)
+    assert indice.distancia((0.0, 0.0), (0.0, 0.0)) == 0.0
+    assert indice.caminho((0.0, 0.0), (1.0, 1.0)) == (None, 0)
+    assert indice.distancias([((1.0, 1.0), (2.0, 2.0)), ((0.0, 0.0), (0.0, 0.0))]).tolist() == [math.inf, 0.0]
@@ -0,0 +1,65 @@
+"""O grafo incremental, depois de cada mudança, é igual ao grafo refeito do zero."""
+import math
+import random
+
+import pytest
+
+from gerador import gerar_mapa
+from grafo import GrafoVisibilidade
+from test_visibilidade import sobrepostos
+
+
+def arestas(G):
+    return {(u, w): d for u in G for w, d in G[u]}
+
+
+def conferir(inc):
+    novo = GrafoVisibilidade(list(inc.obstaculos.values()), inc.livres, inc.max_distancia, inc.metodo)
+    assert set(inc.grafo) == set(novo.grafo)
+    esperadas, obtidas = arestas(novo.grafo), arestas(inc.grafo)
+    assert obtidas.keys() == esperadas.keys()
+    assert all(math.isclose(obtidas[a], esperadas[a]) for a in esperadas)
+    # Sem arestas repetidas
+    assert sum(len(vizinhos) for vizinhos in inc.grafo.values()) == len(obtidas)
+
+
+def sequencia(inc, reserva, lado, semente, passos=12):
+    # Sorteia inclusões e remoções de pontos e obstáculos, conferindo o grafo a cada passo
+    rng = random.Random(semente)
+    reserva = list(reserva)
+    for _ in range(passos):
+        acao = rng.choice(['ponto', 'ponto', 'tirar_ponto', 'obstaculo', 'tirar_obstaculo'])
+        if acao == 'ponto':
+            if inc.obstaculos and rng.random() < 0.3:
+                # Ponto de consulta em cima de um vértice de obstáculo
+                inc.adicionar_ponto(rng.choice(rng.choice(list(inc.obstaculos.values()))))
+            else:
+                inc.adicionar_ponto((rng.uniform(0, lado), rng.uniform(0, lado)))
+        elif acao == 'tirar_ponto' and inc.livres:
+            inc.remover_ponto(rng.choice(inc.livres))
+        elif acao == 'obstaculo' and reserva:
+            inc.adicionar_obstaculo(reserva.pop())
+        elif acao == 'tirar_obstaculo' and inc.obstaculos:
+            inc.remover_obstaculo(rng.choice(list(inc.obstaculos)))
+        conferir(inc)
+
+
+@pytest.mark.parametrize('metodo', ['varredura', 'vetorizado'])
+@pytest.mark.parametrize('max_distancia', [None, 12.0])
+@pytest.mark.parametrize('semente', range(4))
+def test_mapas_gerados(metodo, max_distancia, semente):
+    q_start, q_goal, obstaculos = gerar_mapa('desordenado', 10, vertices=5, semente=semente)
+    # Os obstáculos de reserva podem cair por cima dos que já estão no mapa
+    inc = GrafoVisibilidade(obstaculos[:6], [q_start, q_goal], max_distancia, metodo)
+    conferir(inc)
+    sequencia(inc, obstaculos[6:], max(q_goal), semente)
+
+
+@pytest.mark.parametrize('metodo', ['varredura', 'vetorizado'])
+@pytest.mark.parametrize('max_distancia', [None, 5.0])
+@pytest.mark.parametrize('semente', range(4))
+def test_obstaculos_sobrepostos(metodo, max_distancia, semente):
+    obstaculos = sobrepostos(semente)
+    inc = GrafoVisibilidade(obstaculos[:4], [(-1, -1), (16, 16)], max_distancia, metodo)
+    conferir(inc)
+    sequencia(inc, obstaculos[4:], 15, semente)
@@ -0,0 +1,81 @@
+"""Consultas do `IndiceVertices` conferidas com a força bruta."""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from indice import IndiceVertices
+
+
+def nuvem(semente, n=300):
+    # Pontos inteiros (muitos empates de distância) misturados a pontos quaisquer, em aglomerados
+    rng = random.Random(semente)
+    pontos = []
+    for _ in range(n):
+        if rng.random() < 0.5:
+            pontos.append((float(rng.randint(0, 30)), float(rng.randint(0, 30))))
+        else:
+            cx, cy = rng.choice([(5, 5), (25, 8), (12, 27)])
+            pontos.append((cx + rng.gauss(0, 2), cy + rng.gauss(0, 2)))
+    return list(dict.fromkeys(pontos))
+
+
+def consultas(semente, m=40):
+    rng = random.Random(semente + 1000)
+    # Também fora da caixa dos vértices
+    return [(rng.uniform(-20, 50), rng.uniform(-20, 50)) for _ in range(m)]
+
+
+def distancias_bruta(vertices, p):
+    return sorted(math.dist(p, v) for v in vertices)
+
+
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_k_mais_proximos(semente, k):
+    vertices = nuvem(semente)
+    indice = IndiceVertices(vertices)
+    for p in consultas(semente):
+        resposta = indice.k_mais_proximos(p, k)
+        assert [d for _, d in resposta] == pytest.approx(distancias_bruta(vertices, p)[:k])
+        assert all(math.isclose(math.dist(p, v), d) for v, d in resposta)
+        assert len({v for v, _ in resposta}) == k
+
+
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('raio', [0.5, 3.0, 12.0])
+def test_no_raio(semente, raio):
+    vertices = nuvem(semente)
+    indice = IndiceVertices(vertices)
+    for p in consultas(semente):
+        resposta = indice.no_raio(p, raio)
+        assert {v for v, _ in resposta} == {v for v in vertices if math.dist(p, v) <= raio}
+        assert [d for _, d in resposta] == sorted(d for _, d in resposta)
+
+
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('k', [1, 4])
+def test_consultar_lote(semente, k):
+    vertices = nuvem(semente)
+    indice = IndiceVertices(vertices)
+    # Vértices incluídos depois da construção também entram nas consultas em lote
+    for v in nuvem(semente + 50, n=20):
+        if v not in indice.vertices:
+            indice.adicionar(v)
+    pontos = consultas(semente)
+    distancias, indices = indice.consultar_lote(pontos, k)
+    assert distancias.shape == indices.shape == (len(pontos), k)
+    for p, ds, ids in zip(pontos, distancias.tolist(), indices.tolist()):
+        assert ds == pytest.approx(distancias_bruta(indice.vertices, p)[:k])
+        assert ds == pytest.approx([math.dist(p, indice.vertices[i]) for i in ids])
+
+
+def test_pontos_colineares():
+    # Extensão nula num dos eixos: a grade degenera numa linha
+    vertices = [(float(x), 2.0) for x in range(50)]
+    indice = IndiceVertices(vertices)
+    assert indice.mais_proximo((17.2, 40.0)) == (17.0, 2.0)
+    distancias, indices = indice.consultar_lote([(17.2, 40.0), (-5.0, 2.0)], 2)
+    assert np.allclose(distancias, [[math.hypot(0.2, 38), math.hypot(0.8, 38)], [5.0, 6.0]])
+    assert indices.tolist() == [[17, 18], [0, 1]]
@@ -0,0 +1,115 @@
+"""Leitura em blocos, formato binário e conversões de mapa."""
+import os
+
+import numpy as np
+import pytest
+
+from gerador import gerar_mapa, salvar_mapa
+from mapa import (abrir_mapa_binario, converter_mapa, ler_mapa, ler_mapa_arrays, obstaculos_de_arrays,
+                  salvar_mapa_binario)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ler_linha_a_linha(arquivo):
+    # O leitor original, uma tupla por vértice: referência para resultados e mensagens de erro
+    with open(arquivo, 'r') as f:
+        linhas = [linha.strip() for linha in f.readlines()
+                  if linha.strip() and not linha.strip().startswith('#')]
+    if len(linhas) < 3:
+        raise ValueError("Arquivo de mapa incompleto")
+    q_start = tuple(map(float, linhas[0].split()))
+    q_goal = tuple(map(float, linhas[1].split()))
+    obstaculos = []
+    i = 3
+    for _ in range(int(linhas[2])):
+        if i >= len(linhas):
+            raise ValueError("Número de obstáculos inconsistente")
+        n_quinas = int(linhas[i])
+        i += 1
+        quinas = []
+        for _ in range(n_quinas):
+            if i >= len(linhas):
+                raise ValueError("Número de vértices inconsistente")
+            x, y = map(float, linhas[i].split())
+            quinas.append((x, y))
+            i += 1
+        obstaculos.append(quinas)
+    return q_start, q_goal, obstaculos
+
+
+def resultado(leitor, arquivo):
+    try:
+        return leitor(arquivo)
+    except ValueError as e:
+        return type(e), str(e)
+
+
+def ler_em_blocos(bloco):
+    def leitor(arquivo):
+        q_start, q_goal, coords, offsets = ler_mapa_arrays(arquivo, bloco=bloco)
+        return q_start, q_goal, obstaculos_de_arrays(coords, offsets)
+    return leitor
+
+
+def variantes(linhas):
+    # O arquivo cortado em cada linha e cada linha trocada por algo fora do formato
+    for k in range(len(linhas)):
+        yield linhas[:k]
+        for troca in ('1 2 3', 'a b', '7', '-1', '# comentário', ''):
+            yield linhas[:k] + [troca] + linhas[k + 1:]
+
+
+@pytest.fixture
+def mapa_texto(tmp_path):
+    arquivo = tmp_path / 'mapa.txt'
+    salvar_mapa(arquivo, *gerar_mapa('desordenado', 5, vertices=4, semente=3))
+    return arquivo
+
+
+@pytest.mark.parametrize('bloco', [5, 17, 64, 1 << 20])
+def test_mesmas_mensagens_do_leitor_original(tmp_path, bloco):
+    linhas = open(os.path.join(RAIZ, 'mapa.txt')).read().splitlines()[:16]
+    # Só os dois primeiros obstáculos, com a contagem corrigida
+    linhas[2] = '2'
+    for k, variante in enumerate(variantes(linhas)):
+        arquivo = tmp_path / f'variante{k}.txt'
+        arquivo.write_text('\n'.join(variante) + '\n')
+        assert resultado(ler_em_blocos(bloco), arquivo) == resultado(ler_linha_a_linha, arquivo)
+
+
+@pytest.mark.parametrize('bloco', [3, 50, 1 << 20])
+def test_blocos_pequenos(mapa_texto, bloco):
+    assert ler_em_blocos(bloco)(mapa_texto) == ler_linha_a_linha(mapa_texto)
+
+
+def test_ida_e_volta_texto_binario_texto(tmp_path, mapa_texto):
+    q_start, q_goal, coords, offsets = ler_mapa_arrays(mapa_texto)
+
+    binario = tmp_path / 'mapa.bin'
+    salvar_mapa_binario(binario, q_start, q_goal, coords, offsets)
+    b_start, b_goal, b_coords, b_offsets = abrir_mapa_binario(binario)
+    assert (b_start, b_goal) == (q_start, q_goal)
+    assert np.array_equal(b_coords, coords) and np.array_equal(b_offsets, offsets)
+
+    # converter_mapa nos dois sentidos; o texto de volta é lido igual ao original
+    binario2, texto = tmp_path / 'mapa2.bin', tmp_path / 'volta.txt'
+    converter_mapa(mapa_texto, binario2)
+    converter_mapa(binario2, texto)
+    assert binario2.read_bytes() == binario.read_bytes()
+    assert ler_mapa(texto) == ler_mapa(binario) == ler_linha_a_linha(mapa_texto)
+
+
+def test_mapa_sem_obstaculos(tmp_path):
+    texto, binario = tmp_path / 'vazio.txt', tmp_path / 'vazio.bin'
+    texto.write_text('0 0\n5 5\n0\n')
+    converter_mapa(texto, binario)
+    assert ler_mapa(binario) == ((0.0, 0.0), (5.0, 5.0), [])
+
+
+def test_binario_truncado(tmp_path, mapa_texto):
+    binario = tmp_path / 'mapa.bin'
+    converter_mapa(mapa_texto, binario)
+    binario.write_bytes(binario.read_bytes()[:-8])
+    with pytest.raises(ValueError, match='truncado'):
+        abrir_mapa_binario(binario)
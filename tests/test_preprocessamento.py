@@ -0,0 +1,104 @@
+"""Limpeza de contornos e pré-processamento dos obstáculos (união, crescimento, buracos)."""
+import pytest
+import shapely.geometry
+
+from preprocessamento import limpar_contorno, preprocessar
+
+
+def area(contorno):
+    return shapely.geometry.Polygon(contorno).area
+
+
+def mesmo_ciclo(contorno, esperado):
+    # Igualdade a menos do vértice em que o contorno começa
+    k = contorno.index(esperado[0]) if esperado[0] in contorno else 0
+    return contorno[k:] + contorno[:k] == esperado
+
+
+QUADRADO = [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)]
+
+
+@pytest.mark.parametrize('contorno', [
+    QUADRADO,
+    QUADRADO + [(0.0, 0.0)],                                        # fechado, como o shapely devolve
+    [(1.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0), (0.0, 0.0)],    # começa no meio de uma aresta
+    [(2.0, 0.0), (2.0, 2.0), (0.0, 2.0), (0.0, 0.0), (1.0, 0.0)],    # termina no meio de uma aresta
+    [(1.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0), (0.0, 0.0), (0.5, 0.0)],  # os dois lados da emenda
+    [(0.0, 0.0), (2.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0), (0.0, 2.0)],  # repetidos
+    [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (2.0, 5.0), (2.0, 2.0), (0.0, 2.0)],  # ponta de área zero
+])
+def test_limpar_contorno_vira_o_quadrado(contorno):
+    for colinear in (0.0, 1e-9):
+        assert mesmo_ciclo(limpar_contorno(contorno, colinear), QUADRADO)
+
+
+def test_colinear_exato_ou_com_tolerancia():
+    quase = [(0.0, 0.0), (1.0, 1e-12), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)]
+    # Exato: o vértice muda o polígono (por pouco) e fica
+    assert limpar_contorno(quase) == quase
+    assert mesmo_ciclo(limpar_contorno(quase, colinear=1e-9), QUADRADO)
+    # Na emenda, a tolerância também vale
+    assert mesmo_ciclo(limpar_contorno(quase[1:] + quase[:1], colinear=1e-9), QUADRADO)
+
+
+def test_contorno_degenerado():
+    assert limpar_contorno([(0, 0), (1, 1), (2, 2), (3, 3)]) == []
+    assert limpar_contorno([(0, 0), (1, 0), (0, 0)]) == []
+    assert limpar_contorno([(0, 0), (1, 0), (0, 1)]) == [(0.0, 0.0), (1.0, 0.0), (0.0, 1.0)]
+
+
+def test_uniao_de_sobrepostos_e_encostados():
+    sobreposto = [(1.0, 1.0), (3.0, 1.0), (3.0, 3.0), (1.0, 3.0)]
+    encostado = [(2.0, 0.0), (4.0, 0.0), (4.0, 2.0), (2.0, 2.0)]
+    longe = [(10.0, 10.0), (11.0, 10.0), (11.0, 11.0)]
+
+    resultado, relatorio = preprocessar([QUADRADO, sobreposto, longe])
+    assert len(resultado) == 2 and relatorio['obstaculos_depois'] == 2
+    assert sorted(area(c) for c in resultado) == pytest.approx([0.5, 7.0])
+
+    # Encostados viram um retângulo: o vértice no meio da aresta comum some
+    resultado, relatorio = preprocessar([QUADRADO, encostado])
+    assert len(resultado) == 1 and len(resultado[0]) == 4
+    assert area(resultado[0]) == pytest.approx(8.0)
+    assert relatorio['vertices_removidos'] == 4
+
+    resultado, _ = preprocessar([QUADRADO, sobreposto], unir=False)
+    assert len(resultado) == 2
+
+
+def test_crescimento_em_esquadria():
+    resultado, _ = preprocessar([QUADRADO], raio=0.5)
+    assert mesmo_ciclo(resultado[0], [(-0.5, -0.5), (2.5, -0.5), (2.5, 2.5), (-0.5, 2.5)])
+
+    # Dois obstáculos separados por menos de 2 * raio passam a se tocar e viram um só
+    vizinho = [(2.8, 0.0), (4.0, 0.0), (4.0, 2.0), (2.8, 2.0)]
+    assert len(preprocessar([QUADRADO, vizinho])[0]) == 2
+    assert len(preprocessar([QUADRADO, vizinho], raio=0.5)[0]) == 1
+
+
+def test_buraco_preenchido():
+    # Moldura de quatro retângulos em volta de um pátio livre
+    moldura = [[(0, 0), (5, 0), (5, 1), (0, 1)], [(4, 0), (5, 0), (5, 5), (4, 5)],
+               [(0, 4), (5, 4), (5, 5), (0, 5)], [(0, 0), (1, 0), (1, 5), (0, 5)]]
+    resultado, relatorio = preprocessar(moldura, q_start=(2.5, 2.5), q_goal=(6, 6))
+    assert relatorio['buracos_preenchidos'] == 1
+    assert len(resultado) == 1 and area(resultado[0]) == pytest.approx(25.0)
+    assert relatorio['inicio_bloqueado'] and not relatorio['objetivo_bloqueado']
+
+
+def test_inicio_bloqueado_pelo_crescimento():
+    q_start, q_goal = (2.3, 1.0), (3.0, 3.0)
+    _, relatorio = preprocessar([QUADRADO], q_start=q_start, q_goal=q_goal)
+    assert not relatorio['inicio_bloqueado'] and not relatorio['objetivo_bloqueado']
+    _, relatorio = preprocessar([QUADRADO], raio=0.5, q_start=q_start, q_goal=q_goal)
+    assert relatorio['inicio_bloqueado'] and not relatorio['objetivo_bloqueado']
+    # Sem os pontos, o relatório não fala deles
+    assert 'inicio_bloqueado' not in preprocessar([QUADRADO])[1]
+
+
+def test_contorno_invalido_e_orientacao():
+    # Gravata borboleta (contorno que se cruza) vira dois triângulos, ambos anti-horários
+    resultado, _ = preprocessar([[(0, 0), (2, 2), (2, 0), (0, 2)]])
+    assert len(resultado) == 2
+    assert all(shapely.geometry.LinearRing(c).is_ccw for c in resultado)
+    assert sum(area(c) for c in resultado) == pytest.approx(2.0)
@@ -0,0 +1,141 @@
+"""Cargas, descargas e trocas de mapa do servidor, com consultas concorrentes."""
+import asyncio
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import servidor
+from servidor import ServidorPlanejamento
+
+# Duas versões do mesmo mapa: na segunda um quadrado fecha a diagonal
+LONGE = [[(8, 1), (9, 1), (9, 2), (8, 2)]]
+NO_MEIO = [[(4, 4), (6, 4), (6, 6), (4, 6)]]
+CONSULTA = ((0.0, 0.0), (10.0, 10.0))
+
+
+@pytest.fixture
+def com_portoes(monkeypatch, tmp_path):
+    # Construções numa thread, cada uma presa até o teste liberar o seu portão (na ordem de início)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    portoes = []
+    construir = servidor._construir
+
+    def construir_com_portao(*args):
+        portao = threading.Event()
+        portoes.append(portao)
+        portao.wait(10)
+        return construir(*args)
+
+    monkeypatch.setattr(servidor, '_construir', construir_com_portao)
+    return portoes
+
+
+def novo_servidor():
+    srv = ServidorPlanejamento(workers=1)
+    srv._construtores.shutdown()
+    srv._construtores = ThreadPoolExecutor(4)
+    return srv
+
+
+async def esperar_portoes(portoes, n):
+    while len(portoes) < n:
+        await asyncio.sleep(0.001)
+
+
+def carregar(srv, obstaculos):
+    return asyncio.create_task(srv.carregar('m', q_start=CONSULTA[0], q_goal=CONSULTA[1], obstaculos=obstaculos))
+
+
+def test_descarregar_descarta_carga_em_andamento(com_portoes):
+    async def cenario():
+        srv = novo_servidor()
+        primeira = carregar(srv, LONGE)
+        await esperar_portoes(com_portoes, 1)
+        com_portoes[0].set()
+        assert 'descartada' not in await primeira
+
+        # Carga nova começa, o mapa é descarregado e só então a carga termina: não pode reinstalar o mapa
+        atrasada = carregar(srv, NO_MEIO)
+        await esperar_portoes(com_portoes, 2)
+        assert srv.descarregar('m') == {'mapa': 'm'}
+        com_portoes[1].set()
+        assert (await atrasada)['descartada']
+        assert 'm' not in srv.mapas
+        with pytest.raises(KeyError):
+            await srv.caminho('m', *CONSULTA)
+        with pytest.raises(KeyError):
+            srv.descarregar('m')
+
+        # Uma carga que começa depois da descarga vale
+        terceira = carregar(srv, NO_MEIO)
+        await esperar_portoes(com_portoes, 3)
+        com_portoes[2].set()
+        assert 'descartada' not in await terceira
+        resposta = await srv.caminho('m', *CONSULTA)
+        assert resposta['distancia'] > math.dist(*CONSULTA)
+        srv.descarregar('m')
+        srv._construtores.shutdown()
+        srv._planejamento.shutdown()
+
+    asyncio.run(cenario())
+
+
+def test_descarregar_falha_consultas_pendentes(com_portoes):
+    async def cenario():
+        srv = novo_servidor()
+        carga = carregar(srv, LONGE)
+        await esperar_portoes(com_portoes, 1)
+        com_portoes[0].set()
+        await carga
+
+        consultas = [asyncio.create_task(srv.caminho('m', *CONSULTA)) for _ in range(20)]
+        await asyncio.sleep(0)
+        srv.descarregar('m')
+        assert 'm' not in srv._filas and 'm' not in srv._consumidores
+        # Nenhuma fica esperando para sempre: ou foi respondida antes da descarga, ou falha
+        for resultado in await asyncio.wait_for(asyncio.gather(*consultas, return_exceptions=True), 10):
+            assert isinstance(resultado, KeyError) or resultado['encontrado']
+        srv._construtores.shutdown()
+        srv._planejamento.shutdown()
+
+    asyncio.run(cenario())
+
+
+def test_troca_atomica_com_consultas_concorrentes(com_portoes):
+    async def cenario():
+        srv = novo_servidor()
+        carga = carregar(srv, LONGE)
+        await esperar_portoes(com_portoes, 1)
+        com_portoes[0].set()
+        await carga
+        antiga = srv.mapas['m']
+
+        # Consultas chegando sem parar enquanto a versão nova é construída e instalada
+        troca = carregar(srv, NO_MEIO)
+        await esperar_portoes(com_portoes, 2)
+        antes = [asyncio.create_task(srv.caminho('m', *CONSULTA)) for _ in range(30)]
+        await asyncio.sleep(0)
+        com_portoes[1].set()
+        durante = []
+        while not troca.done():
+            durante.append(asyncio.create_task(srv.caminho('m', *CONSULTA)))
+            await asyncio.sleep(0.001)
+        info = await troca
+        assert info['versao'] == 2 and srv.mapas['m'] is not antiga
+        depois = [asyncio.create_task(srv.caminho('m', *CONSULTA)) for _ in range(30)]
+
+        (_, d_antiga), = antiga.planejar_lote([CONSULTA])
+        (_, d_nova), = srv.mapas['m'].planejar_lote([CONSULTA])
+        assert d_nova > d_antiga
+        # Cada resposta é inteira de uma das versões; as pedidas depois da troca, todas da nova
+        for resposta in await asyncio.gather(*antes, *durante):
+            assert resposta['distancia'] in (pytest.approx(d_antiga), pytest.approx(d_nova))
+        for resposta in await asyncio.gather(*depois):
+            assert resposta['distancia'] == pytest.approx(d_nova)
+        srv.descarregar('m')
+        srv._construtores.shutdown()
+        srv._planejamento.shutdown()
+
+    asyncio.run(cenario())
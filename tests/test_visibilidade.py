@@ -0,0 +1,107 @@
+"""A varredura e o kernel vetorizado dão as mesmas arestas que o teste par a par (shapely)."""
+import os
+import random
+
+import pytest
+
+import instrumentos
+
+from geometria import ConjuntoObstaculos, anti_horario
+from gerador import gerar_mapa
+from grafo import pares_visiveis, grafo_visibilidade
+from mapa import ler_mapa
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def arestas_por_metodo(q_start, q_goal, obstaculos):
+    conjunto = ConjuntoObstaculos(obstaculos)
+    pontos = list(dict.fromkeys([q_start, q_goal] + [v for obst in obstaculos for v in obst]))
+    return {metodo: {(pontos[i], pontos[j]) for i, j, _ in pares_visiveis(metodo, pontos, conjunto)}
+            for metodo in ('pares', 'varredura', 'vetorizado')}
+
+
+def conferir(q_start, q_goal, obstaculos):
+    arestas = arestas_por_metodo(q_start, q_goal, obstaculos)
+    assert arestas['varredura'] == arestas['pares']
+    assert arestas['vetorizado'] == arestas['pares']
+
+
+def sobrepostos(semente, n=8):
+    # Triângulos e quadriláteros de coordenadas inteiras, amontoados: sobreposições, cruzamentos e colinearidades
+    rng = random.Random(semente)
+    obstaculos = []
+    while len(obstaculos) < n:
+        cx, cy = rng.randint(0, 12), rng.randint(0, 12)
+        contorno = [(cx + rng.randint(-3, 3), cy + rng.randint(-3, 3)) for _ in range(rng.choice([3, 4]))]
+        if len(set(contorno)) == len(contorno) and ConjuntoObstaculos([contorno]).disjuntos():
+            obstaculos.append(anti_horario(contorno))
+    return obstaculos
+
+
+def encostados(semente):
+    # Retângulos em faixas, lado a lado: arestas em comum e vértices no meio da aresta do vizinho
+    rng = random.Random(semente)
+    obstaculos = []
+    for faixa in range(4):
+        x = rng.randint(0, 2)
+        while x < 12:
+            largura = rng.randint(1, 3)
+            if rng.random() < 0.7:
+                y = 2 * faixa
+                obstaculos.append([(x, y), (x + largura, y), (x + largura, y + 2), (x, y + 2)])
+            x += largura + rng.choice([0, 0, 1])
+    return obstaculos
+
+
+def test_mapa_txt():
+    q_start, q_goal, obstaculos = ler_mapa(os.path.join(RAIZ, 'mapa.txt'))
+    conferir(q_start, q_goal, obstaculos)
+
+
+@pytest.mark.parametrize('tipo', ['convexo', 'nao_convexo', 'armazem', 'desordenado'])
+@pytest.mark.parametrize('semente', range(3))
+def test_mapas_gerados(tipo, semente):
+    conferir(*gerar_mapa(tipo, 9, vertices=5, semente=semente))
+
+
+@pytest.mark.parametrize('semente', range(20))
+def test_obstaculos_sobrepostos(semente):
+    conferir((-1, -1), (16, 16), sobrepostos(semente))
+
+
+@pytest.mark.parametrize('semente', range(20))
+def test_obstaculos_encostados(semente):
+    obstaculos = encostados(semente)
+    # Obstáculos que só se tocam continuam com a varredura de verdade
+    assert ConjuntoObstaculos(obstaculos).disjuntos()
+    conferir((-1, -1), (13, 10), obstaculos)
+
+
+def test_aresta_dentro_de_obstaculo_sobreposto():
+    # O segmento (1, 9)-(-1, -1) passa por dentro do triângulo, que se sobrepõe ao retângulo
+    obstaculos = [[(1, 7), (2, 7), (2, 9), (1, 9)], [(0, 7), (2, 7), (0, 10)]]
+    assert not ConjuntoObstaculos(obstaculos).disjuntos()
+    conferir((-1, -1), (12, 12), obstaculos)
+    for metodo in ('varredura', 'vetorizado'):
+        G = grafo_visibilidade((-1, -1), (12, 12), obstaculos, metodo=metodo)
+        assert (-1, -1) not in [w for w, _ in G[(1, 9)]]
+
+
+def test_disjuntos():
+    assert ConjuntoObstaculos([]).disjuntos()
+    assert ConjuntoObstaculos([[(0, 0), (1, 0), (1, 1)], [(1, 1), (2, 1), (2, 2)]]).disjuntos()
+    # Um dentro do outro e contorno que se cruza (gravata borboleta)
+    assert not ConjuntoObstaculos([[(0, 0), (4, 0), (4, 4), (0, 4)], [(1, 1), (2, 1), (2, 2)]]).disjuntos()
+    assert not ConjuntoObstaculos([[(0, 0), (2, 2), (2, 0), (0, 2)]]).disjuntos()
+
+
+def test_troca_da_varredura_e_contada():
+    obstaculos = [[(1, 7), (2, 7), (2, 9), (1, 9)], [(0, 7), (2, 7), (0, 10)]]
+    with instrumentos.coletando() as relatorio:
+        with instrumentos.etapa('sobrepostos'):
+            grafo_visibilidade((-1, -1), (12, 12), obstaculos, metodo='varredura')
+        with instrumentos.etapa('disjuntos'):
+            grafo_visibilidade((-1, -1), (12, 12), obstaculos[:1], metodo='varredura')
+    contagens = {e['etapa']: e.get('varredura_substituida', 0) for e in relatorio.etapas}
+    assert contagens == {'sobrepostos': 1, 'disjuntos': 0}